@@ -20,6 +20,7 @@ Améliorations par rapport à V1 :
   - Gestion d'erreurs propre
 """
 
+import atexit
 import os
 import sys
 import json
@@ -48,6 +49,22 @@ except ImportError:
 from src.p01_acquisition import fetch_lightcurve
 from src.p02_preprocessing import clean_and_flatten, fold_lightcurve, get_period_hint
 from src.p04_features import run_feature_extraction
+from src.p05_dataset_manager import read_cache_scalars
+from src.p06_feature_store import get_or_compute_features
+from src.p07_flux_stats import FluxSummary, stream_flux_stats
+from src.p09_evaluation import select_operating_point
+from src.p11_batching import MicroBatcher
+from src.p12_model_registry import ModelBundle, ModelRegistry, ShadowScorer
+from src.p13_feature_vector import feature_layout
+from src.p14_catalog_index import CatalogTable
+from src.p15_star_index import StarIndex
+from src.p16_search_index import SearchIndex
+from src.p17_sky_index import ARCSEC_PER_DEG, CombinedSkyIndex, SkyIndex
+from src.p18_catalog_snapshot import load_catalog
+from src.p19_catalog_state import CatalogState, catalog_fingerprint, diff_tables
+from src.p20_catalog_ingest import ingest_toi
+from src.p21_nasa_tap import NasaTapClient
+from src.p23_result_cache import TieredResultCache
 
 
 # =============================================================================
@@ -77,30 +94,44 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 MODEL_PATH = str(BASE_DIR / "models" / "exoplanet_model.json")
 FEATURES_PATH = str(BASE_DIR / "models" / "selected_features.json")
 METRICS_PATH = str(BASE_DIR / "models" / "model_metrics.json")
+REGISTRY_DIR = str(BASE_DIR / "models" / "registry")
 CATALOG_PATH = str(BASE_DIR / "data" / "catalog" / "exoplanet_binary_full.csv")
 TESS_CATALOG_PATH = str(BASE_DIR / "data" / "catalog" / "tess_toi_binary.csv")
+TOI_DOWNLOAD_DIR = str(BASE_DIR / "data" / "catalog" / "_downloads")   # réponse TAP brute + ETag
 USERS_PATH = str(BASE_DIR / "data" / "users.json")
-RESULTS_CACHE_PATH = str(BASE_DIR / "data" / "results_cache.json")
+RESULT_STORE_PATH = str(BASE_DIR / "data" / "result_cache.sqlite")
 HISTORY_PATH = str(BASE_DIR / "data" / "history.json")
+STAR_INFO_CACHE_PATH = str(BASE_DIR / "data" / "star_info_cache.json")
+CATALOG_CACHE_DIR = os.path.join(os.path.dirname(__file__), "data", "cache", "lightkurve_training")
 
 
 # =============================================================================
 # Chargement des ressources
 # =============================================================================
 
-model = None
-selected_features = []
-model_metrics = {}
-catalog_df = None
-tess_catalog_df = None
-results_cache = {}
-
-# Cache in-memory avec TTL (clé → {"result": ..., "ts": float})
-_analysis_cache = {}
-CACHE_TTL = 600  # 10 minutes
+# Modèle servi (src.p12_model_registry.ModelBundle : XGBClassifier, arbres
+# compilés, features, métriques, version). Une seule référence, remplacée en
+# bloc ; chaque requête la lit une fois et passe ce bundle à tout le scoring.
+active_bundle = None
+model_registry = ModelRegistry(REGISTRY_DIR)
+shadow_scorer = None    # ShadowScorer du modèle candidat, si configuré
+_model_lock = threading.Lock()  # sérialise les écrivains (chargement, promotion)
+# Catalogues KOI / TESS et index dérivés (CatalogTable, SkyIndex, StarIndex) :
+# une seule référence, remplacée en bloc à chaque mise à jour
+# (src.p19_catalog_state). Les lecteurs ne prennent aucun verrou.
+_catalog = CatalogState()
+_catalog_write_lock = threading.Lock()  # sérialise les écrivains (chargement, refresh TESS, cache)
+
+# Rayon de recherche des voisins contaminants (~3 pixels : 4"/px Kepler, 21"/px TESS)
+NEIGHBOUR_RADIUS_ARCSEC = {"Kepler": 12.0, "TESS": 63.0}
+SAME_STAR_ARCSEC = 1.0  # en deçà : la cible elle-même (éventuellement vue par l'autre catalogue)
+
+# Résultats de /api/analyze et /api/analyze/stream : mémoire puis SQLite,
+# clés liées au modèle servi et à la version du pipeline (src.p23_result_cache)
+result_cache = TieredResultCache(RESULT_STORE_PATH)
 
 # Catalog index (lightweight, no flux/time arrays)
-_catalog_cache_index = []
+_catalog_rebuild_lock = threading.Lock()
 
 
 def is_finite_number(value):
@@ -143,65 +174,279 @@ def build_chart_data(lc_folded):
     return chart_data
 
 
-def load_results_cache():
-    global results_cache
-    if os.path.exists(RESULTS_CACHE_PATH):
-        with open(RESULTS_CACHE_PATH, "r") as f:
-            results_cache = json.load(f)
-        print(f"[OK] Cache résultats chargé ({len(results_cache)} entrées).")
+def _activate_bundle(bundle):
+    """
+    Publie le modèle servi par une seule affectation. Les requêtes en cours
+    gardent le bundle qu'elles ont lu : features, arbres et importances
+    viennent toujours du même modèle.
+    """
+    global active_bundle
+    with _model_lock:
+        active_bundle = bundle
+        result_cache.set_model(bundle.fingerprint)
+    print(f"[OK] Modèle XGBoost chargé (version {bundle.version or 'models/'}).")
+    if bundle.compiled is not None:
+        print(f"[OK] Modèle compilé ({bundle.compiled.n_trees} arbres).")
+    print(f"[OK] {len(bundle.features)} features chargées.")
+
+
+def _load_shadow():
+    """(Re)démarre le scoring en ombre selon le pointeur SHADOW du registre."""
+    global shadow_scorer
+    version = model_registry.shadow_version()
+    if shadow_scorer is not None and shadow_scorer.bundle.version == version:
+        return
+    previous, shadow_scorer = shadow_scorer, None
+    if previous is not None:
+        previous.stop()
+    if version:
+        try:
+            shadow_scorer = ShadowScorer(model_registry.load(version))
+            print(f"[OK] Modèle shadow {version} chargé.")
+        except Exception as e:
+            print(f"[!] Erreur chargement modèle shadow {version} : {e}")
+
+
+def load_model_files():
+    """
+    Charge (ou recharge après réentraînement / promotion) le modèle, ses
+    features et ses métriques : version ACTIVE du registre si elle existe,
+    sinon les fichiers de models/.
+    """
+    version = model_registry.active_version()
+    try:
+        if version:
+            bundle = model_registry.load(version)
+        elif os.path.exists(MODEL_PATH):
+            bundle = ModelBundle.load(MODEL_PATH, FEATURES_PATH, METRICS_PATH)
+        else:
+            print("[!] Modèle introuvable. Lancez 02_train_model_v2.py d'abord.")
+            return
+    except Exception as e:
+        print(f"[!] Erreur chargement modèle : {e}")
+        return
+    _activate_bundle(bundle)
+    _load_shadow()
+
+
+def _catalog_search_documents(df, tdf):
+    """
+    (clé, champs) par ligne des catalogues (/api/catalog/search) :
+    ("Kepler", position) → kepid, 'kic <kepid>', kepoi_name, kepler_name ;
+    ("TESS", toi)        → tid, 'tic <tid>', toi, 'toi <toi>'.
+    """
+    if df is not None:
+        kepids = df["kepid"].tolist()
+        kepoi = df["kepoi_name"].tolist() if "kepoi_name" in df else [None] * len(df)
+        names = df["kepler_name"].tolist() if "kepler_name" in df else [None] * len(df)
+        for pos, (kepid, koi, name) in enumerate(zip(kepids, kepoi, names)):
+            yield ("Kepler", pos), (str(kepid), f"kic {kepid}",
+                                    koi if isinstance(koi, str) else None,
+                                    name if isinstance(name, str) else None)
+    if tdf is not None:
+        for tid, toi in zip(tdf["tid"].tolist(), tdf["toi"].tolist()):
+            if not (pd.notna(tid) and pd.notna(toi)):
+                continue
+            yield ("TESS", toi), (str(int(tid)), f"tic {int(tid)}", str(toi), f"toi {toi}")
+
+
+# ── Entrées de l'index du catalogue (/api/catalog/stars) ─────────────────────
 
+def _rounded(value, ndigits, scale=1.0):
+    """round(valeur / scale) en float Python, None si absente (NaN)."""
+    return round(float(value) / scale, ndigits) if pd.notna(value) else None
 
-def save_results_cache():
-    os.makedirs(os.path.dirname(RESULTS_CACHE_PATH), exist_ok=True)
-    with open(RESULTS_CACHE_PATH, "w") as f:
-        json.dump(results_cache, f)
+
+def _cache_entries(cache_dir):
+    """
+    Entrées du cache Lightkurve local (vraies stats BLS), lues dans la table
+    des scalaires du cache (src.p05_dataset_manager.read_cache_scalars) sans
+    désérialiser les courbes de lumière.
+    """
+    entries = []
+    if not os.path.isdir(cache_dir):
+        return entries
+    try:
+        stars = read_cache_scalars(cache_dir)
+        if "status" not in stars.columns or "kepid" not in stars.columns:
+            return entries
+        stars = stars[(stars["status"] == "ok") & stars["kepid"].notna()]
+        # Ordre du répertoire, comme l'ancien parcours fichier par fichier
+        order = {name: i for i, name in enumerate(os.listdir(cache_dir))}
+        stars = stars.iloc[np.argsort(stars["file"].map(order).to_numpy(), kind="stable")]
+        columns = {c: (stars[c].tolist() if c in stars.columns else [None] * len(stars))
+                   for c in ("kepid", "label", "n_points", "bls_snr", "bls_depth_ppm",
+                             "bls_duration_days", "bls_score", "period")}
+        for kepid, label, n_points, snr, depth, dur, score, period in zip(*columns.values()):
+            kepid = int(kepid)
+            entries.append({
+                "kepid":            kepid,
+                "target_id":        f"KIC {kepid}",
+                "name":             f"KIC {kepid}",
+                "mission":          "Kepler",
+                "label":            int(label) if pd.notna(label) else 0,
+                "n_points":         int(n_points) if pd.notna(n_points) else 0,
+                "bls_snr":          _rounded(snr, 3),
+                "bls_depth_ppm":    _rounded(depth, 1),
+                "bls_duration_days":_rounded(dur, 4),
+                "bls_score":        _rounded(score, 4),
+                "period":           _rounded(period, 4),
+            })
+    except Exception as e:
+        print(f"[Catalog] Erreur lecture du cache Lightkurve : {e}")
+    return entries
+
+
+def _kepler_entries(kdf, cached_kepids):
+    """Entrées du catalogue KOI (koi_period, koi_depth…) pour les étoiles hors cache, une par kepid."""
+    entries = []
+    if kdf is None:
+        return entries
+    seen = set(cached_kepids)
+    try:
+        col = lambda c: kdf[c].tolist() if c in kdf.columns else [None] * len(kdf)
+        for kepid, name, label, snr, depth, dur, period in zip(
+                col("kepid"), col("kepler_name"), col("target_planet"), col("koi_model_snr"),
+                col("koi_depth"), col("koi_duration"), col("koi_period")):
+            kepid = int(kepid) if pd.notna(kepid) else None
+            if kepid is None or kepid in seen:
+                continue
+            entries.append({
+                "kepid":            kepid,
+                "target_id":        f"KIC {kepid}",
+                "name":             str(name) if pd.notna(name) else f"KIC {kepid}",
+                "mission":          "Kepler",
+                "label":            int(label) if pd.notna(label) else 0,
+                "n_points":         0,
+                "bls_snr":          _rounded(snr, 2),
+                "bls_depth_ppm":    _rounded(depth, 1),
+                "bls_duration_days":_rounded(dur, 4, scale=24.0),   # heures → jours
+                "bls_score":        None,
+                "period":           _rounded(period, 4),
+            })
+            seen.add(kepid)  # éviter doublons si plusieurs KOI pour le même KIC
+    except Exception as e:
+        print(f"[Catalog] Erreur lecture catalogue Kepler : {e}")
+    return entries
+
+
+def _tess_entries(tdf, previous=(), old_positions=None):
+    """
+    Entrées du catalogue TESS TOI, une par ligne de tdf (None si le TIC id
+    manque). old_positions (TableDiff.old_positions) : les lignes inchangées
+    reprennent l'entrée `previous` de la version précédente, seules les
+    lignes ajoutées ou modifiées sont reconstruites.
+    """
+    if tdf is None:
+        return []
+    if old_positions is None:
+        old_positions = np.full(len(tdf), -1, dtype=np.int64)
+    entries = [previous[j] if j >= 0 else None for j in old_positions.tolist()]
+    rows = np.flatnonzero(old_positions < 0)
+    sub = tdf.iloc[rows]
+    col = lambda c: sub[c].tolist() if c in sub.columns else [None] * len(sub)
+    for i, tid, toi, label, depth, dur, period in zip(
+            rows.tolist(), col("tid"), col("toi"), col("target_planet"),
+            col("koi_depth"), col("koi_duration"), col("koi_period")):
+        if not pd.notna(tid):
+            continue
+        tid = int(tid)
+        entries[i] = {
+            "kepid":            tid,   # champ générique, contient TIC id pour TESS
+            "target_id":        f"TIC {tid}",
+            "name":             f"TOI {toi}" if pd.notna(toi) else f"TIC {tid}",
+            "mission":          "TESS",
+            "label":            int(label) if pd.notna(label) else 0,
+            "n_points":         0,
+            "bls_snr":          None,
+            "bls_depth_ppm":    _rounded(depth, 1),
+            "bls_duration_days":_rounded(dur, 4, scale=24.0),
+            "bls_score":        None,
+            "period":           _rounded(period, 4),
+        }
+    return entries
+
+
+def _publish_catalog(state):
+    """
+    Complète `state` par ses index dérivés et le publie en une affectation.
+    L'index du ciel a une partie par catalogue (KD-tree Kepler, KD-tree
+    TESS) : seule celle dont les records ont changé est reconstruite ;
+    l'index des étoiles reprend les colonnes et l'index de recherche publiés
+    pour les entrées inchangées, et l'index de /api/catalog/search est une
+    copie du précédent mise à jour par différence. À appeler sous
+    _catalog_write_lock.
+    """
+    global _catalog
+    previous = _catalog
+    sky = previous.sky_index
+    if (sky is None or state.kepler_sky_records is not previous.kepler_sky_records
+            or state.tess_sky_records is not previous.tess_sky_records):
+        kepler_sky, tess_sky = sky.parts if sky is not None else (None, None)
+        if kepler_sky is None or state.kepler_sky_records is not previous.kepler_sky_records:
+            kepler_sky = SkyIndex(state.kepler_sky_records)
+        if tess_sky is None or state.tess_sky_records is not previous.tess_sky_records:
+            tess_sky = SkyIndex(state.tess_sky_records)
+        sky = CombinedSkyIndex((kepler_sky, tess_sky))
+    fingerprint = previous.fingerprint
+    if (fingerprint is None or state.catalog_df is not previous.catalog_df
+            or state.tess_catalog_df is not previous.tess_catalog_df):
+        fingerprint = catalog_fingerprint(state.catalog_df, state.tess_catalog_df)
+    search = previous.catalog_search
+    if (search is None or state.catalog_df is not previous.catalog_df
+            or state.tess_catalog_df is not previous.tess_catalog_df):
+        search = search.copy() if search is not None else SearchIndex()
+        search.sync(_catalog_search_documents(state.catalog_df, state.tess_catalog_df))
+    star = previous.star_index
+    if (star is None or state.kepler_entries is not previous.kepler_entries
+            or state.tess_entries is not previous.tess_entries):
+        entries = list(state.kepler_entries) + [e for e in state.tess_entries if e is not None]
+        star = StarIndex(sorted(entries, key=lambda x: x.get("bls_snr") or 0, reverse=True),
+                         search_index=star.search_index if star else None, previous=star)
+    # Une seule affectation : les requêtes en cours gardent la version précédente
+    _catalog = state.replace(sky_index=sky, star_index=star, catalog_search=search,
+                             fingerprint=fingerprint, version=previous.version + 1)
+    result_cache.set_catalog(fingerprint)
+    return _catalog
 
 
 def load_resources():
     """Charge le modèle, les features, les métriques et le catalogue au démarrage."""
-    global model, selected_features, model_metrics, catalog_df, tess_catalog_df
-    
-    # Modèle XGBoost
-    if os.path.exists(MODEL_PATH):
-        try:
-            model = xgb.XGBClassifier()
-            model.load_model(MODEL_PATH)
-            print("[OK] Modèle XGBoost chargé.")
-        except Exception as e:
-            print(f"[!] Erreur chargement modèle : {e}")
-    else:
-        print("[!] Modèle introuvable. Lancez 02_train_model_v2.py d'abord.")
-    
-    # Features sélectionnées
-    if os.path.exists(FEATURES_PATH):
-        with open(FEATURES_PATH, "r") as f:
-            selected_features = json.load(f)
-        print(f"[OK] {len(selected_features)} features chargées.")
-    
-    # Métriques
-    if os.path.exists(METRICS_PATH):
-        with open(METRICS_PATH, "r") as f:
-            model_metrics = json.load(f)
-        print("[OK] Métriques du modèle chargées.")
-    
+    load_model_files()
+
+    catalog_df = kepler_catalog = tess_catalog_df = tess_catalog = None
+
     # Catalogue Kepler
     if os.path.exists(CATALOG_PATH):
-        catalog_df = pd.read_csv(CATALOG_PATH)
+        catalog_df = load_catalog(CATALOG_PATH)
+        kepler_catalog = CatalogTable(catalog_df, keys=("kepid",), derived=True)
         print(f"[OK] Catalogue NASA chargé ({len(catalog_df)} entrées).")
     else:
         print("[!] Catalogue NASA introuvable. Les métadonnées stellaires seront limitées.")
 
     # Catalogue TESS TOI
     if os.path.exists(TESS_CATALOG_PATH):
-        tess_catalog_df = pd.read_csv(TESS_CATALOG_PATH)
+        tess_catalog_df = load_catalog(TESS_CATALOG_PATH)
+        tess_catalog = CatalogTable(tess_catalog_df, keys=("tid", "toi"))
         print(f"[OK] Catalogue TESS TOI chargé ({len(tess_catalog_df)} entrées).")
     else:
         print("[!] Catalogue TESS introuvable. Lancez download_tess_toi.py pour le générer.")
 
+    # Les entrées du cache Lightkurve et du KOI sont ajoutées par _build_catalog_index()
+    with _catalog_write_lock:
+        state = _publish_catalog(_catalog.replace(
+            catalog_df=catalog_df, kepler_catalog=kepler_catalog,
+            tess_catalog_df=tess_catalog_df, tess_catalog=tess_catalog,
+            kepler_sky_records=SkyIndex.table_records(kepler_catalog, "kepid", "Kepler"),
+            tess_sky_records=SkyIndex.table_records(tess_catalog, "tid", "TESS"),
+            tess_entries=_tess_entries(tess_catalog_df),
+        ))
+    print(f"[OK] Index spatial construit ({state.sky_index.n} étoiles).")
 
-load_results_cache()
 
 load_resources()
+print(f"[OK] Cache résultats : {result_cache.warm_up()} résultats préchargés.")
+atexit.register(result_cache.flush_hits)
 
 
 # =============================================================================
@@ -217,82 +462,103 @@ _refresh_status = {
     "n_confirmed": None,
     "n_fp":        None,
     "n_total":     None,
+    "retrain":     None,    # état du réentraînement incrémental (si demandé)
+    "changes":     None,    # TOI ajoutés / retirés / modifiés / inchangés au dernier refresh
+    "progress":    None,    # {"stage": download | parse, "done", "total"} pendant le refresh
+    "download":    None,    # {"modified", "download_bytes", ...} du dernier téléchargement
 }
 
+TRAIN_SCRIPT = str(Path(__file__).resolve().parent / "scripts" / "07_kaggle_train.py")
+RETRAIN_TIMEOUT = 3600
 
-def _run_tess_refresh():
+
+def _run_incremental_retrain():
     """
-    Télécharge le catalogue TESS TOI depuis NASA TAP, recharge tess_catalog_df
-    en mémoire et reconstruit l'index du catalogue.
-    Tourne dans un thread séparé pour ne pas bloquer le serveur.
+    Lance 07_kaggle_train.py --incremental dans un processus séparé (le
+    serveur reste réactif) puis recharge le modèle s'il a été accepté.
     """
-    global tess_catalog_df, _refresh_status
-
-    TAP_URL = (
-        "https://exoplanetarchive.ipac.caltech.edu/TAP/sync?"
-        "query=SELECT+tid,toi,tfopwg_disp,"
-        "pl_orbper,pl_orbpererr1,pl_orbpererr2,"
-        "pl_tranmid,pl_tranmiderr1,pl_tranmiderr2,"
-        "pl_trandurh,pl_trandurherr1,pl_trandurherr2,"
-        "pl_trandep,pl_trandeperr1,pl_trandeperr2,"
-        "pl_rade,pl_radeerr1,pl_radeerr2,"
-        "pl_eqt,pl_eqterr1,pl_eqterr2,"
-        "pl_insol,pl_insolerr1,pl_insolerr2,"
-        "st_teff,st_tefferr1,st_tefferr2,"
-        "st_logg,st_loggerr1,st_loggerr2,"
-        "st_rad,st_raderr1,st_raderr2,"
-        "st_tmag,ra,dec"
-        "+FROM+toi&format=csv"
-    )
-    COLUMN_MAP = {
-        "pl_orbper": "koi_period", "pl_orbpererr1": "koi_period_err1",
-        "pl_orbpererr2": "koi_period_err2", "pl_tranmid": "koi_time0bk",
-        "pl_tranmiderr1": "koi_time0bk_err1", "pl_tranmiderr2": "koi_time0bk_err2",
-        "pl_trandurh": "koi_duration", "pl_trandurherr1": "koi_duration_err1",
-        "pl_trandurherr2": "koi_duration_err2", "pl_trandep": "koi_depth",
-        "pl_trandeperr1": "koi_depth_err1", "pl_trandeperr2": "koi_depth_err2",
-        "pl_rade": "koi_prad", "pl_radeerr1": "koi_prad_err1",
-        "pl_radeerr2": "koi_prad_err2", "pl_eqt": "koi_teq",
-        "pl_insol": "koi_insol", "pl_insolerr1": "koi_insol_err1",
-        "pl_insolerr2": "koi_insol_err2", "st_teff": "koi_steff",
-        "st_tefferr1": "koi_steff_err1", "st_tefferr2": "koi_steff_err2",
-        "st_logg": "koi_slogg", "st_loggerr1": "koi_slogg_err1",
-        "st_loggerr2": "koi_slogg_err2", "st_rad": "koi_srad",
-        "st_raderr1": "koi_srad_err1", "st_raderr2": "koi_srad_err2",
-        "st_tmag": "koi_kepmag",
-    }
-    DISPOSITION_MAP = {"CP": 1, "KP": 1, "FP": 0, "FA": 0}
+    import subprocess
+    import tempfile
 
     with _refresh_lock:
-        _refresh_status.update({"state": "running", "started_at": datetime.datetime.utcnow().isoformat(),
-                                 "finished_at": None, "message": "Téléchargement depuis NASA TAP…"})
+        _refresh_status["retrain"] = {"state": "running",
+                                      "started_at": datetime.datetime.utcnow().isoformat()}
+    fd, summary_path = tempfile.mkstemp(suffix=".json")
+    os.close(fd)
     try:
-        df = pd.read_csv(TAP_URL)
-
-        valid = set(DISPOSITION_MAP.keys())
-        df_f = df[df["tfopwg_disp"].isin(valid)].copy()
-        if len(df_f) == 0:
-            raise ValueError("Aucune entrée CP/KP/FP/FA dans la réponse NASA.")
-
-        df_f["target_planet"] = df_f["tfopwg_disp"].map(DISPOSITION_MAP)
-        df_f = df_f.rename(columns=COLUMN_MAP)
-        df_f["mission"] = "TESS"
-
-        kepler_cols = list(COLUMN_MAP.values()) + ["ra", "dec", "target_planet", "mission", "tid", "toi"]
-        existing = [c for c in kepler_cols if c in df_f.columns]
-        df_out = df_f[existing].copy()
+        proc = subprocess.run([sys.executable, TRAIN_SCRIPT, "--incremental", "--summary", summary_path],
+                              capture_output=True, text=True, timeout=RETRAIN_TIMEOUT)
+        if proc.returncode != 0:
+            raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip()
+                               else f"code de sortie {proc.returncode}")
+        with open(summary_path) as f:
+            summary = json.load(f)
+        if summary.get("accepted") or summary.get("mode") == "full":
+            if model_registry.active_version():
+                # Registre en service : le nouveau modèle devient une version promue
+                version = model_registry.register(MODEL_PATH, FEATURES_PATH, METRICS_PATH,
+                                                  source="retrain")
+                model_registry.promote(version)
+            load_model_files()
+        with _refresh_lock:
+            _refresh_status["retrain"] = {**_refresh_status["retrain"], "state": "done",
+                                          "finished_at": datetime.datetime.utcnow().isoformat(),
+                                          "summary": json_safe(summary)}
+        print(f"[Retrain] Terminé : {summary}")
+    except Exception as e:
+        with _refresh_lock:
+            _refresh_status["retrain"] = {**_refresh_status["retrain"], "state": "error",
+                                          "finished_at": datetime.datetime.utcnow().isoformat(),
+                                          "message": f"Erreur : {e}"}
+        print(f"[Retrain] Erreur : {e}")
+    finally:
+        os.remove(summary_path)
+
+
+def _refresh_progress(stage, done, total):
+    """Callback de src.p20_catalog_ingest : avancement du refresh dans _refresh_status."""
+    if stage == "download":
+        size = f"{done / 1e6:.1f} Mo" + (f" / {total / 1e6:.1f} Mo" if total else "")
+        message = f"Téléchargement depuis NASA TAP… {size}"
+    else:
+        message = f"Analyse du catalogue… {done} lignes"
+    with _refresh_lock:
+        _refresh_status.update({"message": message,
+                                "progress": {"stage": stage, "done": done, "total": total}})
 
-        num_cols = [c for c in df_out.columns if c not in ("mission", "tid", "toi", "target_planet")]
-        for col in num_cols:
-            df_out[col] = pd.to_numeric(df_out[col], errors="coerce")
-            if df_out[col].isna().any():
-                df_out[col] = df_out[col].fillna(df_out[col].median())
 
-        df_out.to_csv(TESS_CATALOG_PATH, index=False)
+def _run_tess_refresh(retrain=False):
+    """
+    Télécharge le catalogue TESS TOI depuis NASA TAP (src.p20_catalog_ingest :
+    flux compressé, requête conditionnelle, analyse par blocs) et applique au
+    catalogue publié la différence avec la version précédente
+    (_apply_tess_catalog).
+    retrain : enchaîne un réentraînement incrémental du modèle sur les
+              lignes nouvelles ou modifiées.
+    Tourne dans un thread séparé pour ne pas bloquer le serveur.
+    """
+    global _refresh_status
 
-        # Recharger en mémoire
-        tess_catalog_df = df_out
-        _build_catalog_index()
+    with _refresh_lock:
+        _refresh_status.update({"state": "running", "started_at": datetime.datetime.utcnow().isoformat(),
+                                 "finished_at": None, "message": "Téléchargement depuis NASA TAP…",
+                                 "progress": None})
+    try:
+        df_out, info = ingest_toi(TESS_CATALOG_PATH, TOI_DOWNLOAD_DIR, progress=_refresh_progress)
+
+        if df_out is None:
+            # 304 : la table TOI n'a pas changé depuis le dernier téléchargement
+            df_out = _catalog.tess_catalog_df
+            if df_out is None:
+                df_out = load_catalog(TESS_CATALOG_PATH)
+                _apply_tess_catalog(df_out)
+            changes = {"added": 0, "removed": 0, "changed": 0, "unchanged": len(df_out)}
+            summary = "source inchangée depuis le dernier téléchargement"
+        else:
+            # Recharger en mémoire (nouvel instantané typé de la version écrite)
+            df_out = load_catalog(TESS_CATALOG_PATH)
+            changes = _apply_tess_catalog(df_out).summary()
+            summary = f"{changes['added']} TOI ajoutés, {changes['removed']} retirés, {changes['changed']} modifiés"
 
         n_confirmed = int((df_out["target_planet"] == 1).sum())
         n_fp        = int((df_out["target_planet"] == 0).sum())
@@ -301,12 +567,17 @@ def _run_tess_refresh():
             _refresh_status.update({
                 "state":       "done",
                 "finished_at": datetime.datetime.utcnow().isoformat(),
-                "message":     f"Catalogue mis à jour : {len(df_out)} entrées ({n_confirmed} confirmées, {n_fp} faux positifs).",
+                "message":     f"Catalogue mis à jour : {len(df_out)} entrées ({n_confirmed} confirmées, {n_fp} faux positifs)"
+                               f" — {summary}.",
                 "n_confirmed": n_confirmed,
                 "n_fp":        n_fp,
                 "n_total":     len(df_out),
+                "changes":     changes,
+                "download":    info,
             })
-        print(f"[Refresh] TESS TOI mis à jour : {len(df_out)} entrées")
+        print(f"[Refresh] TESS TOI mis à jour : {len(df_out)} entrées ({summary})")
+        if retrain:
+            _run_incremental_retrain()
 
     except Exception as e:
         with _refresh_lock:
@@ -318,112 +589,73 @@ def _run_tess_refresh():
         print(f"[Refresh] Erreur : {e}")
 
 
+def _apply_tess_catalog(tdf):
+    """
+    Publie une nouvelle version du catalogue TESS. La différence avec la
+    version publiée (TOI ajoutés, retirés, modifiés) est appliquée à une
+    copie : seules les entrées des lignes touchées sont reconstruites, les
+    entrées KOI / cache, la CatalogTable KOI et le KD-tree Kepler sont
+    repris tels quels, puis le nouvel état remplace l'ancien en une
+    affectation. Restent en O(taille du catalogue TESS) : la CatalogTable
+    et le KD-tree TESS ; l'index des étoiles retrie toutes les entrées
+    (NumPy). Retourne le TableDiff.
+    """
+    with _catalog_write_lock:
+        previous = _catalog
+        diff = diff_tables(previous.tess_catalog_df, tdf, key="toi")
+        if diff.empty:
+            return diff
+        tess_catalog = CatalogTable(tdf, keys=("tid", "toi"))
+        _publish_catalog(previous.replace(
+            tess_catalog_df=tdf,
+            tess_catalog=tess_catalog,
+            tess_sky_records=SkyIndex.table_records(tess_catalog, "tid", "TESS"),
+            tess_entries=_tess_entries(tdf, previous.tess_entries, diff.old_positions),
+        ))
+    return diff
+
+
 def _build_catalog_index():
     """
-    Construit l'index du catalogue en 3 passes :
+    Reconstruit les entrées Kepler de l'index du catalogue :
     1. Cache Lightkurve local (vraies stats BLS) — priorité maximale
-    2. Catalogue Kepler CSV (koi_period, koi_depth…) pour les étoiles hors cache
-    3. Catalogue TESS TOI CSV (toutes les entrées avec leur TIC id)
+    2. Catalogue Kepler (koi_period, koi_depth…) pour les étoiles hors cache
+    Les entrées TESS TOI (une par ligne, avec leur TIC id) sont reprises de
+    la version publiée ; le nouvel état la remplace en une affectation.
     """
-    global _catalog_cache_index
+    with _catalog_write_lock:
+        previous = _catalog
+        cache_entries = _cache_entries(CATALOG_CACHE_DIR)
+        # Après read_cache_scalars, qui peut réécrire son index dans le répertoire
+        cache_mtime = os.stat(CATALOG_CACHE_DIR).st_mtime_ns if os.path.isdir(CATALOG_CACHE_DIR) else None
+        kepler_entries = cache_entries + _kepler_entries(previous.catalog_df, {e["kepid"] for e in cache_entries})
+        state = _publish_catalog(previous.replace(kepler_entries=kepler_entries, cache_mtime=cache_mtime))
 
-    # ── Passe 1 : cache local (données BLS réelles) ──────────────────────────
-    cache_dir = os.path.join(os.path.dirname(__file__), "data", "cache", "lightkurve_training")
-    entries = []
-    cached_kepids = set()
+    index = state.star_index
+    print(f"[Catalog] Index built: {index.n} étoiles ({index.n_kepler} Kepler, {index.n_tess} TESS)"
+          f" — recherche : {index.search_changed} ajoutées/modifiées, {index.search_removed} retirées")
 
-    if os.path.isdir(cache_dir):
-        for fname in os.listdir(cache_dir):
-            if not fname.startswith("star_") or not fname.endswith(".json"):
-                continue
-            try:
-                with open(os.path.join(cache_dir, fname)) as f:
-                    d = json.load(f)
-                if d.get("status") != "ok":
-                    continue
-                kepid = d["kepid"]
-                cached_kepids.add(kepid)
-                entries.append({
-                    "kepid":            kepid,
-                    "target_id":        f"KIC {kepid}",
-                    "name":             f"KIC {kepid}",
-                    "mission":          "Kepler",
-                    "label":            d.get("label", 0),
-                    "n_points":         d.get("n_points", 0),
-                    "bls_snr":          round(d["bls_snr"], 3) if d.get("bls_snr") is not None else None,
-                    "bls_depth_ppm":    round(d["bls_depth_ppm"], 1) if d.get("bls_depth_ppm") is not None else None,
-                    "bls_duration_days":round(d["bls_duration_days"], 4) if d.get("bls_duration_days") is not None else None,
-                    "bls_score":        round(d["bls_score"], 4) if d.get("bls_score") is not None else None,
-                    "period":           round(d["period"], 4) if d.get("period") is not None else None,
-                })
-            except Exception:
-                continue
 
-    # ── Passe 2 : catalogue Kepler CSV (hors cache) ──────────────────────────
-    kepler_csv = os.path.join(os.path.dirname(__file__), "..", "data", "catalog", "exoplanet_binary_full.csv")
-    if os.path.exists(kepler_csv):
-        try:
-            kdf = pd.read_csv(kepler_csv)
-            for _, row in kdf.iterrows():
-                kepid = int(row["kepid"]) if pd.notna(row.get("kepid")) else None
-                if kepid is None or kepid in cached_kepids:
-                    continue
-                period = row.get("koi_period")
-                depth  = row.get("koi_depth")
-                dur    = row.get("koi_duration")  # heures
-                snr    = row.get("koi_model_snr")
-                name   = str(row["kepler_name"]) if pd.notna(row.get("kepler_name")) else f"KIC {kepid}"
-                entries.append({
-                    "kepid":            kepid,
-                    "target_id":        f"KIC {kepid}",
-                    "name":             name,
-                    "mission":          "Kepler",
-                    "label":            int(row["target_planet"]) if pd.notna(row.get("target_planet")) else 0,
-                    "n_points":         0,
-                    "bls_snr":          round(float(snr), 2) if pd.notna(snr) else None,
-                    "bls_depth_ppm":    round(float(depth), 1) if pd.notna(depth) else None,
-                    "bls_duration_days":round(float(dur) / 24.0, 4) if pd.notna(dur) else None,
-                    "bls_score":        None,
-                    "period":           round(float(period), 4) if pd.notna(period) else None,
-                })
-                cached_kepids.add(kepid)  # éviter doublons si plusieurs KOI pour le même KIC
-        except Exception as e:
-            print(f"[Catalog] Erreur lecture Kepler CSV : {e}")
+def _rebuild_catalog_index_if_stale():
+    """
+    Le cache Lightkurve est alimenté par les scripts d'entraînement : si son
+    répertoire a changé depuis la dernière construction, l'index (et l'index
+    de recherche, par différence) est reconstruit en tâche de fond.
+    """
+    try:
+        mtime = os.stat(CATALOG_CACHE_DIR).st_mtime_ns
+    except OSError:
+        return
+    if mtime == _catalog.cache_mtime or not _catalog_rebuild_lock.acquire(blocking=False):
+        return
 
-    # ── Passe 3 : catalogue TESS TOI CSV ─────────────────────────────────────
-    tess_csv = os.path.join(os.path.dirname(__file__), "..", "data", "catalog", "tess_toi_binary.csv")
-    if os.path.exists(tess_csv):
+    def _rebuild():
         try:
-            tdf = pd.read_csv(tess_csv)
-            for _, row in tdf.iterrows():
-                tid = int(row["tid"]) if pd.notna(row.get("tid")) else None
-                toi = row.get("toi")
-                if tid is None:
-                    continue
-                period = row.get("koi_period")
-                depth  = row.get("koi_depth")
-                dur    = row.get("koi_duration")  # heures
-                name   = f"TOI {toi}" if pd.notna(toi) else f"TIC {tid}"
-                entries.append({
-                    "kepid":            tid,   # champ générique, contient TIC id pour TESS
-                    "target_id":        f"TIC {tid}",
-                    "name":             name,
-                    "mission":          "TESS",
-                    "label":            int(row["target_planet"]) if pd.notna(row.get("target_planet")) else 0,
-                    "n_points":         0,
-                    "bls_snr":          None,
-                    "bls_depth_ppm":    round(float(depth), 1) if pd.notna(depth) else None,
-                    "bls_duration_days":round(float(dur) / 24.0, 4) if pd.notna(dur) else None,
-                    "bls_score":        None,
-                    "period":           round(float(period), 4) if pd.notna(period) else None,
-                })
-        except Exception as e:
-            print(f"[Catalog] Erreur lecture TESS CSV : {e}")
+            _build_catalog_index()
+        finally:
+            _catalog_rebuild_lock.release()
 
-    _catalog_cache_index = sorted(entries, key=lambda x: x.get("bls_snr") or 0, reverse=True)
-    n_kepler = sum(1 for e in entries if e["mission"] == "Kepler")
-    n_tess   = sum(1 for e in entries if e["mission"] == "TESS")
-    print(f"[Catalog] Index built: {len(_catalog_cache_index)} étoiles ({n_kepler} Kepler, {n_tess} TESS)")
+    threading.Thread(target=_rebuild, daemon=True).start()
 
 
 _build_catalog_index()
@@ -687,11 +919,13 @@ def root():
 @app.route('/api/status', methods=['GET'])
 def get_status():
     """État du système (pas besoin d'auth)."""
+    catalog_df = _catalog.catalog_df
+    features = active_bundle.features if active_bundle is not None else []
     return jsonify({
         "status": "online",
-        "ai_loaded": model is not None,
-        "features_count": len(selected_features),
-        "features_sync": len(selected_features) > 0,
+        "ai_loaded": active_bundle is not None,
+        "features_count": len(features),
+        "features_sync": len(features) > 0,
         "catalog_loaded": catalog_df is not None,
         "catalog_size": len(catalog_df) if catalog_df is not None else 0,
         "dataset_ready": catalog_df is not None
@@ -702,9 +936,10 @@ def get_status():
 # Routes : API protégée (nécessite JWT)
 # =============================================================================
 
-def run_full_analysis(target_id, mission, username):
+def run_full_analysis(target_id, mission, username, bundle):
     """
     Pipeline complète d'analyse. Appelée dans un thread séparé avec timeout global.
+    bundle : ModelBundle lu par la requête (None : pas de modèle, score 0.5).
     Retourne un dict JSON-serializable ou lève une exception.
     """
     t0 = time.time()
@@ -735,60 +970,37 @@ def run_full_analysis(target_id, mission, username):
     log(f"Prétraitement OK ({len(lc_clean)} points après nettoyage)")
 
     log("BLS - recherche de période...")
-    period, bls_stats = get_period_hint(lc_clean)
+    flux_summary = FluxSummary(lc_clean)
+    period, bls_stats, features_df = get_or_compute_features(
+        lc_clean, _feature_store_key(target_id, mission, resolved_kepid),
+        flux_summary=flux_summary, with_features=needs_lc_features(bundle))
     lc_folded = fold_lightcurve(lc_clean, period=period)
     log(f"BLS OK - période = {period:.4f} j")
 
     log("Extraction features + prédiction XGBoost...")
     score = 0.5
     feature_importances = []
-
-    if model and selected_features:
-        # Déterminer si le modèle utilise les features BLS physiques (nouveau) ou TSFRESH (ancien)
-        _BLS_FEATURES = {"bls_snr", "bls_depth_ppm", "bls_transit_fraction",
-                         "bls_power", "bls_duration_days", "bls_score",
-                         "period", "star_radius_solar", "star_temperature_k"}
-        _uses_bls_model = all(f in _BLS_FEATURES for f in selected_features)
-
-        if _uses_bls_model:
-            # Nouveau modèle Kepler+TESS : vecteur BLS direct
-            from src.p02_preprocessing import compute_transit_score
-            bls_score_val = compute_transit_score(bls_stats)
-
-            # Données stellaires depuis catalogue KOI si disponible
-            cat_feats = get_catalog_features_dict(target_id, kepid=resolved_kepid)
-            srad  = cat_feats.get("koi_srad",  1.0) or 1.0
-            steff = cat_feats.get("koi_steff", 5500.0) or 5500.0
-
-            row_vals = {
-                "bls_snr":              float(bls_stats.get("bls_snr", 0)),
-                "bls_depth_ppm":        float(bls_stats.get("bls_depth_ppm", 0)),
-                "bls_transit_fraction": float(bls_stats.get("bls_transit_fraction", 0)),
-                "bls_power":            float(bls_stats.get("bls_power", 0)),
-                "bls_duration_days":    float(bls_stats.get("bls_duration_days", 0)),
-                "bls_score":            float(bls_score_val),
-                "period":               float(period),
-                "star_radius_solar":    float(srad),
-                "star_temperature_k":   float(steff),
-            }
-            input_data = pd.DataFrame([row_vals])[selected_features].astype(float)
-        else:
-            # Ancien modèle TSFRESH/KOI
-            features_df = run_feature_extraction(lc_clean, target_id, bls_stats=bls_stats)
-            input_data = build_input_vector(features_df, target_id, selected_features, resolved_kepid=resolved_kepid, mission=mission, bls_stats=bls_stats, period=period, lc_stellar_params=lc_stellar_params)
-
-        score = float(model.predict_proba(input_data)[0][1])
-        if hasattr(model, 'feature_importances_'):
-            imp = model.feature_importances_
-            top_idx = np.argsort(imp)[::-1][:5]
-            feature_importances = [
-                {"name": selected_features[i], "weight": float(imp[i])}
-                for i in top_idx
-            ]
+    input_data = None
+
+    if bundle is not None and bundle.features:
+        def build_row(b):
+            return build_model_input(b, features_df, target_id, bls_stats, period,
+                                     resolved_kepid=resolved_kepid, mission=mission,
+                                     lc_stellar_params=lc_stellar_params)
+
+        input_data = build_row(bundle)
+        score = predict_score(bundle, input_data, build_row)
+        feature_importances = [
+            {"name": name, "weight": weight} for name, weight in top_feature_importances(bundle)
+        ]
     log(f"Prédiction OK - score = {score:.4f}")
 
-    characterization = compute_characterization(lc_clean, lc_folded, period, score)
+    characterization = compute_characterization(lc_clean, lc_folded, period, score,
+                                                flux_summary=flux_summary)
     metadata = get_real_metadata(target_id, resolved_kepid=resolved_kepid)
+    neighbours = catalog_neighbours(target_id, mission, resolved_kepid=resolved_kepid)
+    if neighbours is not None:
+        metadata["neighbours"] = neighbours
 
     if not is_finite_number(score):
         score = 0.5
@@ -811,7 +1023,7 @@ def run_full_analysis(target_id, mission, username):
         ),
     }
 
-    score_ci = compute_score_confidence(model, input_data) if model else None
+    score_ci = compute_score_confidence(bundle, input_data) if input_data is not None else None
 
     result = json_safe({
         "target": target_id,
@@ -855,18 +1067,8 @@ def analyze_target():
         return jsonify({"error": "Paramètre 'id' requis (ex: ?id=Kepler-10)"}), 400
 
     username = g.current_user
-    cache_key = target_id.lower()
-
-    # Cache in-memory avec TTL
-    cached = _analysis_cache.get(cache_key)
-    if cached and (time.time() - cached["ts"]) < CACHE_TTL:
-        age = int(time.time() - cached["ts"])
-        print(f"[Cache hit] {target_id} ({age}s ago)")
-        result = dict(cached["result"])
-        result["analyzed_by"] = username
-        return jsonify(result)
-
-    print(f"[Cache miss] {target_id} — lancement analyse (par {username})")
+    bundle = active_bundle  # lu une fois : toute l'analyse utilise ce modèle
+    catalog_fp = _catalog.fingerprint
     if any(x in target_id.upper() for x in ["TIC", "TOI", "WASP"]):
         mission = "TESS"
     elif any(x in target_id for x in ["Kepler-", "KIC", "KOI"]):
@@ -874,16 +1076,28 @@ def analyze_target():
     else:
         mission = "Kepler"  # défaut
 
+    # Cache mémoire → SQLite, pour le modèle et les catalogues de cette requête
+    cache_key = result_cache.key("analyze", target_id, mission, bundle.fingerprint if bundle else None,
+                                 catalog_fp)
+    cached = result_cache.get(cache_key)
+    if cached is not None:
+        print(f"[Cache hit] {target_id}")
+        result = dict(cached)
+        result["analyzed_by"] = username
+        return jsonify(result)
+
+    print(f"[Cache miss] {target_id} — lancement analyse (par {username})")
+
     try:
         with ThreadPoolExecutor(max_workers=1) as executor:
-            future = executor.submit(run_full_analysis, target_id, mission, username)
+            future = executor.submit(run_full_analysis, target_id, mission, username, bundle)
             try:
                 result = future.result(timeout=90)
             except FuturesTimeout:
                 return jsonify({"error": "Analyse trop longue (>90s). Réessayez."}), 504
 
         # Mise en cache
-        _analysis_cache[cache_key] = {"result": result, "ts": time.time()}
+        result_cache.put(cache_key, result)
         return jsonify(result)
 
     except ValueError as e:
@@ -903,16 +1117,21 @@ def analyze_stream():
         return jsonify({"error": "Paramètre 'id' requis"}), 400
 
     username = g.current_user
+    bundle = active_bundle  # lu une fois : toute l'analyse utilise ce modèle
+    catalog_fp = _catalog.fingerprint
 
     def generate():
         def evt(name, data):
             return f"event: {name}\ndata: {json.dumps(data)}\n\n"
 
         # Résultat en cache → réponse instantanée
-        cache_key = target_id.lower()
-        if cache_key in results_cache:
+        mission = "TESS" if any(x in target_id for x in ["TIC", "TOI", "WASP"]) else "Kepler"
+        cache_key = result_cache.key("stream", target_id, mission, bundle.fingerprint if bundle else None,
+                                     catalog_fp)
+        cached = result_cache.get(cache_key)
+        if cached is not None:
             print(f"[Cache] Résultat servi pour {target_id}")
-            cached = results_cache[cache_key]
+            cached = dict(cached)
             cached["analyzed_by"] = username
             yield evt("progress", {"step": "acquisition", "message": "Chargement depuis le cache...", "percent": 50})
             yield evt("progress", {"step": "done", "message": "Résultat disponible.", "percent": 100})
@@ -920,8 +1139,6 @@ def analyze_stream():
             return
 
         try:
-            mission = "TESS" if any(x in target_id for x in ["TIC", "TOI", "WASP"]) else "Kepler"
-
             yield evt("progress", {"step": "acquisition", "message": "Téléchargement de la courbe de lumière...", "percent": 10})
             lc_raw = fetch_lightcurve(target_id, mission=mission)
             if lc_raw is None:
@@ -938,50 +1155,31 @@ def analyze_stream():
                 return
 
             yield evt("progress", {"step": "bls", "message": "Recherche de période (BLS)...", "percent": 50})
-            period, bls_stats = get_period_hint(lc_clean)
+            flux_summary = FluxSummary(lc_clean)
+            period, bls_stats, features_df = get_or_compute_features(
+                lc_clean, _feature_store_key(target_id, mission, resolved_kepid),
+                flux_summary=flux_summary, with_features=needs_lc_features(bundle))
             lc_folded = fold_lightcurve(lc_clean, period=period)
 
             yield evt("progress", {"step": "prediction", "message": "Prédiction par le modèle IA...", "percent": 70})
             score = 0.5
             top_features = []
             input_data = None
-            if model and selected_features:
-                _BLS_FEATURES = {"bls_snr", "bls_depth_ppm", "bls_transit_fraction",
-                                 "bls_power", "bls_duration_days", "bls_score",
-                                 "period", "star_radius_solar", "star_temperature_k"}
-                _uses_bls_model = all(f in _BLS_FEATURES for f in selected_features)
-                if _uses_bls_model:
-                    from src.p02_preprocessing import compute_transit_score
-                    bls_score_val = compute_transit_score(bls_stats)
-                    cat_feats = get_catalog_features_dict(target_id, kepid=resolved_kepid)
-                    srad  = cat_feats.get("koi_srad",  1.0) or 1.0
-                    steff = cat_feats.get("koi_steff", 5500.0) or 5500.0
-                    row_vals = {
-                        "bls_snr":              float(bls_stats.get("bls_snr", 0)),
-                        "bls_depth_ppm":        float(bls_stats.get("bls_depth_ppm", 0)),
-                        "bls_transit_fraction": float(bls_stats.get("bls_transit_fraction", 0)),
-                        "bls_power":            float(bls_stats.get("bls_power", 0)),
-                        "bls_duration_days":    float(bls_stats.get("bls_duration_days", 0)),
-                        "bls_score":            float(bls_score_val),
-                        "period":               float(period),
-                        "star_radius_solar":    float(srad),
-                        "star_temperature_k":   float(steff),
-                    }
-                    input_data = pd.DataFrame([row_vals])[selected_features].astype(float)
-                else:
-                    features_df = run_feature_extraction(lc_clean, target_id, bls_stats=bls_stats)
-                    input_data = build_input_vector(features_df, target_id, selected_features, resolved_kepid=resolved_kepid, mission=mission, bls_stats=bls_stats, period=period, lc_stellar_params=lc_stellar_params)
-                score = float(model.predict_proba(input_data)[0][1])
-                if hasattr(model, 'feature_importances_'):
-                    imp = model.feature_importances_
-                    top_idx = np.argsort(imp)[::-1][:5]
-                    top_features = [
-                        {"name": selected_features[i], "importance": float(imp[i])}
-                        for i in top_idx
-                    ]
+            if bundle is not None and bundle.features:
+                def build_row(b):
+                    return build_model_input(b, features_df, target_id, bls_stats, period,
+                                             resolved_kepid=resolved_kepid, mission=mission,
+                                             lc_stellar_params=lc_stellar_params)
+
+                input_data = build_row(bundle)
+                score = predict_score(bundle, input_data, build_row)
+                top_features = [
+                    {"name": name, "importance": weight} for name, weight in top_feature_importances(bundle)
+                ]
 
             yield evt("progress", {"step": "formatting", "message": "Formatage des résultats...", "percent": 90})
-            characterization = compute_characterization(lc_clean, lc_folded, period, score)
+            characterization = compute_characterization(lc_clean, lc_folded, period, score,
+                                                        flux_summary=flux_summary)
             if not is_finite_number(score):
                 score = 0.5
 
@@ -1001,7 +1199,7 @@ def analyze_stream():
                 ),
             }
 
-            score_ci = compute_score_confidence(model, input_data) if model and input_data is not None else None
+            score_ci = compute_score_confidence(bundle, input_data) if input_data is not None else None
 
             result = json_safe({
                 "target": target_id,
@@ -1018,8 +1216,7 @@ def analyze_stream():
                 "analyzed_by": username,
             })
             # Sauvegarde dans le cache pour les prochaines fois
-            results_cache[cache_key] = result
-            save_results_cache()
+            result_cache.put(cache_key, result)
             print(f"[Cache] Résultat sauvegardé pour {target_id}")
             yield evt("result", result)
 
@@ -1121,21 +1318,35 @@ def delete_history_item(idx):
 @app.route('/api/metrics', methods=['GET'])
 @token_required
 def get_metrics():
-    """Retourne les métriques du modèle entraîné."""
+    """
+    Retourne les métriques du modèle entraîné.
+    Si les courbes par seuil sont disponibles, ajoute le point de fonctionnement
+    choisi : ?threshold=0.4, ?min_precision=0.95 ou ?min_recall=0.9
+    (par défaut, le seuil maximisant l'accuracy).
+    """
+    model_metrics = active_bundle.metrics if active_bundle is not None else {}
     if not model_metrics:
         return jsonify({"error": "Aucune métrique disponible. Entraînez le modèle d'abord."}), 404
-    
-    return jsonify(model_metrics)
+
+    curves = model_metrics.get("threshold_curves")
+    if not curves:
+        return jsonify(model_metrics)
+    try:
+        picks = {k: float(request.args[k]) for k in ("threshold", "min_precision", "min_recall")
+                 if request.args.get(k) not in (None, "")}
+    except ValueError:
+        return jsonify({"error": "threshold, min_precision et min_recall doivent être numériques."}), 400
+    return jsonify({**model_metrics, "operating_point": select_operating_point(curves, **picks)})
 
 
 @app.route('/api/catalog/search', methods=['GET'])
 @token_required
 def search_catalog():
     """
-    Recherche dans le catalogue Kepler KOI.
+    Recherche dans les catalogues Kepler KOI et TESS TOI.
     
     Paramètres :
-        q (str) : terme de recherche (nom ou KIC ID)
+        q (str) : terme de recherche (nom, KIC ID, TIC ID ou TOI)
         limit (int) : nombre max de résultats (défaut: 20)
     """
     query = request.args.get('q', '').strip()
@@ -1144,23 +1355,39 @@ def search_catalog():
     if not query:
         return jsonify({"error": "Paramètre 'q' requis."}), 400
     
-    if catalog_df is None:
+    state = _catalog
+    if state.catalog_search is None or (state.kepler_catalog is None and state.tess_catalog is None):
         return jsonify({"error": "Catalogue non chargé."}), 503
     
-    # Recherche par KIC ID
-    results = catalog_df[
-        catalog_df['kepid'].astype(str).str.contains(query, case=False, na=False)
-    ].head(limit)
-    
+    def num(row, col, ndigits):
+        return round(float(row[col]), ndigits) if pd.notna(row.get(col)) else None
+
+    # Index n-grammes : KIC / TIC ID, 'KIC xxx' / 'TIC xxx', kepoi_name, kepler_name, TOI — résultats classés
     entries = []
-    for _, row in results.iterrows():
+    for doc_id in state.catalog_search.search(query, limit):
+        mission, key = state.catalog_search.key(doc_id)
+        if mission == "TESS":
+            row = state.tess_catalog.row(state.tess_catalog.position("toi", key))
+            entries.append({
+                "mission": "TESS",
+                "tid": int(row['tid']),
+                "toi": float(row['toi']),
+                "target_name": f"TIC {int(row['tid'])}",
+                "disposition": "CONFIRMED" if row.get('target_planet') == 1 else "FALSE POSITIVE",
+                "period_days": num(row, 'koi_period', 4),
+                "depth_ppm": num(row, 'koi_depth', 1),
+                "planet_radius_earth": num(row, 'koi_prad', 2),
+            })
+            continue
+        row = state.kepler_catalog.row(key)
         entries.append({
+            "mission": "Kepler",
             "kepid": int(row['kepid']),
             "target_name": f"KIC {int(row['kepid'])}",
             "disposition": row.get('koi_disposition', 'UNKNOWN'),
-            "period_days": round(float(row['koi_period']), 4) if pd.notna(row.get('koi_period')) else None,
-            "depth_ppm": round(float(row['koi_depth']), 1) if pd.notna(row.get('koi_depth')) else None,
-            "planet_radius_earth": round(float(row['koi_prad']), 2) if pd.notna(row.get('koi_prad')) else None
+            "period_days": num(row, 'koi_period', 4),
+            "depth_ppm": num(row, 'koi_depth', 1),
+            "planet_radius_earth": num(row, 'koi_prad', 2),
         })
     
     return jsonify({
@@ -1170,6 +1397,67 @@ def search_catalog():
     })
 
 
+@app.route('/api/catalog/sky', methods=['GET'])
+@token_required
+def sky_query():
+    """
+    Requête positionnelle sur les catalogues KOI + TESS.
+
+    Paramètres :
+        ra, dec (deg) ou target (ex: "KIC 11904151") : centre du cône
+        radius (deg, défaut 0.1, max 180)            : rayon du cône
+        glat_min, glat_max (deg)                     : bande de latitude galactique
+        limit (défaut 100, max 1000)
+    Avec un centre : étoiles du cône (et de la bande) triées par distance.
+    Sans centre : étoiles de la bande triées par latitude galactique.
+    """
+    def _float(name, default=None):
+        v = request.args.get(name)
+        return float(v) if v not in (None, "") else default
+
+    try:
+        ra, dec = _float('ra'), _float('dec')
+        radius = _float('radius', 0.1)
+        glat_min, glat_max = _float('glat_min'), _float('glat_max')
+        limit = min(int(request.args.get('limit', 100)), 1000)
+    except ValueError:
+        return jsonify({"error": "Paramètres numériques invalides."}), 400
+
+    target = request.args.get('target', '').strip()
+    if target:
+        position = catalog_position(target)
+        if position is None:
+            return jsonify({"error": f"Position de '{target}' introuvable dans les catalogues."}), 404
+        ra, dec = position
+
+    index = _catalog.sky_index
+    if index is None:
+        return jsonify({"error": "Catalogue non chargé."}), 503
+
+    if ra is not None and dec is not None:
+        if not (0 < radius <= 180):
+            return jsonify({"error": "radius doit être dans ]0, 180] degrés."}), 400
+        idx, dist = index.cone(ra, dec, radius, glat_min=glat_min, glat_max=glat_max)
+        total = len(idx)
+        stars = [{**index.records[i], "distance_deg": round(d, 6),
+                  "distance_arcsec": round(d * ARCSEC_PER_DEG, 2)}
+                 for i, d in zip(idx[:limit].tolist(), dist[:limit].tolist())]
+    elif glat_min is not None or glat_max is not None:
+        idx = index.band(glat_min, glat_max)
+        total = len(idx)
+        stars = [index.records[i] for i in idx[:limit].tolist()]
+    else:
+        return jsonify({"error": "Indiquez ra/dec, target, ou glat_min/glat_max."}), 400
+
+    return jsonify(json_safe({
+        "center": {"ra": ra, "dec": dec, "radius_deg": radius} if ra is not None and dec is not None else None,
+        "band": {"glat_min": glat_min, "glat_max": glat_max} if glat_min is not None or glat_max is not None else None,
+        "total": total,
+        "count": len(stars),
+        "stars": stars,
+    }))
+
+
 @app.route('/api/catalog/stars', methods=['GET'])
 @token_required
 def get_catalog_stars():
@@ -1185,46 +1473,17 @@ def get_catalog_stars():
     max_period = request.args.get('max_period', None)
     mission_filter = request.args.get('mission', None)
 
-    data = _catalog_cache_index[:]
-
-    # filters
-    if mission_filter:
-        data = [s for s in data if s.get('mission', '').lower() == mission_filter.lower()]
-    if search:
-        q = search.lower()
-        data = [s for s in data if
-                q in str(s.get('kepid', '')).lower() or
-                q in s.get('target_id', '').lower() or
-                q in s.get('name', '').lower()]
-    if label == '1':
-        data = [s for s in data if s['label'] == 1]
-    elif label == '0':
-        data = [s for s in data if s['label'] == 0]
-    if min_snr is not None:
-        data = [s for s in data if s.get('bls_snr') is not None and s['bls_snr'] >= float(min_snr)]
-    if max_snr is not None:
-        data = [s for s in data if s.get('bls_snr') is not None and s['bls_snr'] <= float(max_snr)]
-    if min_period is not None:
-        data = [s for s in data if s.get('period') is not None and s['period'] >= float(min_period)]
-    if max_period is not None:
-        data = [s for s in data if s.get('period') is not None and s['period'] <= float(max_period)]
-
-    # sort
-    sort_key_map = {'snr': 'bls_snr', 'period': 'period', 'depth': 'bls_depth_ppm', 'score': 'bls_score'}
-    key = sort_key_map.get(sort_by, 'bls_snr')
-    reverse = sort_dir != 'asc'
-    data = sorted(data, key=lambda x: (x.get(key) is None, x.get(key) or 0), reverse=reverse)
-
-    total = len(data)
-    n_planets_filtered = sum(1 for s in data if s['label'] == 1)
-    offset = (page - 1) * limit
-    page_data = data[offset:offset + limit]
-
-    # summary stats from full dataset
-    all_ok = _catalog_cache_index
-    n_planets = sum(1 for s in all_ok if s['label'] == 1)
-    snrs = [s['bls_snr'] for s in all_ok if s.get('bls_snr') is not None]
-    avg_snr = round(sum(snrs) / len(snrs), 2) if snrs else 0
+    def _float(v):
+        return float(v) if v is not None else None
+
+    _rebuild_catalog_index_if_stale()
+    index = _catalog.star_index
+    page_data, total, n_planets_filtered = index.query(
+        page=page, limit=limit, search=search, label=label, sort_by=sort_by, sort_dir=sort_dir,
+        min_snr=_float(min_snr), max_snr=_float(max_snr),
+        min_period=_float(min_period), max_period=_float(max_period),
+        mission=mission_filter,
+    )
 
     return jsonify({
         "total": total,
@@ -1233,12 +1492,7 @@ def get_catalog_stars():
         "pages": (total + limit - 1) // limit,
         "limit": limit,
         "stars": page_data,
-        "stats": {
-            "total_stars": len(all_ok),
-            "n_planets": n_planets,
-            "n_non_planets": len(all_ok) - n_planets,
-            "avg_snr": avg_snr,
-        }
+        "stats": index.stats,
     })
 
 
@@ -1294,7 +1548,8 @@ def upload_custom_star():
         from src.p02_preprocessing import clean_and_flatten, get_period_hint, fold_lightcurve
         from src.p04_features import run_feature_extraction
 
-        if model is None:
+        bundle = active_bundle
+        if bundle is None:
             return jsonify({"error": "Modèle IA non chargé."}), 503
 
         lc_raw = lk.LightCurve(time=time_arr, flux=flux_arr)
@@ -1309,11 +1564,14 @@ def upload_custom_star():
         lc_folded = fold_lightcurve(lc_clean, best_period)
 
         features_df = run_feature_extraction(lc_clean, target_id, bls_stats=bls_stats)
-        input_data = build_input_vector(
-            features_df, target_id, selected_features,
-            mission="Custom", bls_stats=bls_stats, period=best_period
-        )
-        score = float(model.predict_proba(input_data)[0][1])
+
+        def build_row(b):
+            return build_input_vector(
+                features_df, target_id, b.features,
+                mission="Custom", bls_stats=bls_stats, period=best_period
+            )
+
+        score = predict_score(bundle, build_row(bundle), build_row)
 
         verdict = "Planète probable" if score >= 0.7 else "Signal ambigu" if score >= 0.35 else "Non planétaire"
 
@@ -1348,13 +1606,107 @@ def upload_custom_star():
 @app.route('/api/admin/refresh-catalog', methods=['POST'])
 @token_required
 def start_catalog_refresh():
-    """Lance un rafraichissement du catalogue TESS TOI en arriere-plan."""
+    """
+    Lance un rafraichissement du catalogue TESS TOI en arriere-plan.
+    ?retrain=1 (ou {"retrain": true}) : reentrainement incremental du modele ensuite.
+    """
+    body = request.get_json(silent=True) or {}
+    retrain = str(request.args.get("retrain", body.get("retrain", ""))).lower() in ("1", "true", "yes", "incremental")
     with _refresh_lock:
-        if _refresh_status["state"] == "running":
+        if _refresh_status["state"] == "running" or (_refresh_status.get("retrain") or {}).get("state") == "running":
             return jsonify({"error": "Mise a jour deja en cours."}), 409
-    t = threading.Thread(target=_run_tess_refresh, daemon=True)
+    t = threading.Thread(target=_run_tess_refresh, kwargs={"retrain": retrain}, daemon=True)
     t.start()
-    return jsonify({"status": "started", "message": "Mise a jour du catalogue TESS lancee en arriere-plan."})
+    message = "Mise a jour du catalogue TESS lancee en arriere-plan."
+    if retrain:
+        message += " Le modele sera reentraine de facon incrementale ensuite."
+    return jsonify({"status": "started", "retrain": retrain, "message": message})
+
+
+@app.route('/api/admin/inference', methods=['GET', 'POST'])
+@token_required
+def inference_batching():
+    """
+    GET  : histogrammes d'attente et de taille de lot du micro-batching.
+    POST : {"window_ms": 2, "max_batch": 64} reconfigure à chaud (window_ms=0 : désactivé).
+    """
+    if request.method == 'POST':
+        body = request.get_json(silent=True) or {}
+        try:
+            inference_batcher.configure(
+                window_ms=float(body["window_ms"]) if "window_ms" in body else None,
+                max_batch=int(body["max_batch"]) if "max_batch" in body else None,
+            )
+        except (TypeError, ValueError):
+            return jsonify({"error": "window_ms et max_batch doivent être numériques."}), 400
+    return jsonify(inference_batcher.stats())
+
+
+@app.route('/api/admin/caches', methods=['GET'])
+@token_required
+def cache_stats():
+    """
+    Mémoire occupée (octets estimés) et compteurs hit / miss / éviction des
+    caches LRU, plus le niveau disque du cache de résultats.
+    """
+    caches = (result_cache.memory, _star_info.cache.lru)
+    for cache in caches:
+        cache.purge_expired()
+    stats = [cache.stats() for cache in caches]
+    return jsonify({"caches": stats, "total_bytes": sum(s["bytes"] for s in stats),
+                    "results": result_cache.stats()})
+
+
+@app.route('/api/admin/models', methods=['GET'])
+@token_required
+def list_models():
+    """Versions du registre, version active / shadow et comparaison shadow en cours."""
+    shadow, bundle = shadow_scorer, active_bundle
+    return jsonify({
+        "active": bundle.version if bundle is not None else None,
+        "shadow": shadow.bundle.version if shadow is not None else None,
+        "versions": model_registry.list_versions(),
+        "shadow_stats": shadow.stats() if shadow is not None else None,
+    })
+
+
+@app.route('/api/admin/models/register', methods=['POST'])
+@token_required
+def register_model():
+    """Enregistre les fichiers actuels de models/ comme nouvelle version (sans la promouvoir)."""
+    if not os.path.exists(MODEL_PATH):
+        return jsonify({"error": "Aucun modèle dans models/."}), 404
+    version = model_registry.register(MODEL_PATH, FEATURES_PATH, METRICS_PATH, source="models/")
+    return jsonify({"version": version})
+
+
+@app.route('/api/admin/models/promote', methods=['POST'])
+@token_required
+def promote_model():
+    """{"version": "..."} : bascule atomique du modèle servi, sans redémarrage."""
+    version = (request.get_json(silent=True) or {}).get("version")
+    if not version:
+        return jsonify({"error": "Paramètre 'version' requis."}), 400
+    try:
+        bundle = model_registry.load(version)  # chargé avant la bascule
+    except (FileNotFoundError, OSError, ValueError) as e:
+        return jsonify({"error": f"Version inutilisable : {e}"}), 404
+    model_registry.promote(version)
+    _activate_bundle(bundle)
+    return jsonify({"active": version})
+
+
+@app.route('/api/admin/models/shadow', methods=['POST'])
+@token_required
+def set_shadow_model():
+    """{"version": "..."} : score les mêmes vecteurs en ombre ; {"version": null} l'arrête."""
+    version = (request.get_json(silent=True) or {}).get("version")
+    try:
+        model_registry.set_shadow(version)
+    except (KeyError, ValueError) as e:
+        return jsonify({"error": str(e)}), 404
+    _load_shadow()
+    return jsonify({"shadow": version})
 
 
 @app.route('/api/admin/refresh-catalog', methods=['GET'])
@@ -1457,22 +1809,33 @@ def _extract_kepid_from_lc(lc):
     return None
 
 
-def _resolve_tess_row(target_id):
+def _feature_store_key(target_id, mission, resolved_kepid=None):
     """
-    Résout une cible TESS vers une ligne du tess_catalog_df.
+    Clé canonique du feature store : 'KIC <id>' / 'TIC <id>' quand l'identifiant
+    a été résolu depuis la courbe, pour partager les features entre alias
+    (Kepler-10, KIC 11904151…) et avec les scripts d'entraînement.
+    """
+    if resolved_kepid:
+        return f"{'TIC' if mission == 'TESS' else 'KIC'} {resolved_kepid}"
+    return target_id
+
+
+def _resolve_tess_position(target_id):
+    """
+    Résout une cible TESS vers une ligne de tess_catalog (index de hachage / trié).
     Accepte : 'TIC 231670397', 'TOI 104.01', 'TOI 104' (premier candidat).
-    Retourne une Series pandas ou None.
+    Retourne (CatalogTable, position) ou (None, None).
     """
-    if tess_catalog_df is None:
-        return None
+    table = _catalog.tess_catalog
+    if table is None:
+        return None, None
     tid = str(target_id).upper()
 
     # Format TIC XXXXXXX
     if "TIC" in tid:
         try:
             tic_id = int(tid.replace("TIC", "").strip())
-            m = tess_catalog_df[tess_catalog_df['tid'] == tic_id]
-            return m.iloc[0] if len(m) > 0 else None
+            return table, table.position("tid", tic_id)
         except (ValueError, TypeError):
             pass
 
@@ -1481,19 +1844,30 @@ def _resolve_tess_row(target_id):
         try:
             toi_str = tid.replace("TOI", "").strip()
             toi_val = float(toi_str)
-            m = tess_catalog_df[tess_catalog_df['toi'] == toi_val]
-            if len(m) > 0:
-                return m.iloc[0]
+            pos = table.position("toi", toi_val)
+            if pos is not None:
+                return table, pos
             # Fallback : chercher par numéro de système (ex: TOI 104 → 104.01, 104.02…)
             toi_system = float(int(toi_val))
-            m2 = tess_catalog_df[
-                (tess_catalog_df['toi'] >= toi_system) &
-                (tess_catalog_df['toi'] < toi_system + 1)
-            ]
-            return m2.iloc[0] if len(m2) > 0 else None
-        except (ValueError, TypeError):
+            return table, table.first_in_range("toi", toi_system, toi_system + 1)
+        except (ValueError, TypeError, OverflowError):
             pass
 
+    return None, None
+
+
+def _resolve_tess_row(target_id):
+    """Ligne du catalogue TESS (dict colonne → valeur) pour une cible TIC / TOI, ou None."""
+    table, pos = _resolve_tess_position(target_id)
+    return table.row(pos) if pos is not None else None
+
+
+def _kepid_from_target(target_id):
+    if "KIC" in str(target_id).upper():
+        try:
+            return int(str(target_id).upper().replace("KIC", "").strip())
+        except ValueError:
+            pass
     return None
 
 
@@ -1502,91 +1876,102 @@ def get_catalog_features_dict(target_id, kepid=None):
     Retourne un dict des features physiques du catalogue KOI ou TESS TOI pour une cible.
     Accepte soit un kepid entier (prioritaire), soit un target_id string.
     Retourne {} si la cible est introuvable (les features seront mis à 0).
+    Colonnes numériques, glon/glat et features dérivées KOI sont précalculées
+    au chargement du catalogue (CatalogTable).
     """
     # --- Lookup TESS TOI (TIC XXXXXXX ou TOI XXX.XX) ---
     tid_upper = str(target_id).upper()
     if "TIC" in tid_upper or "TOI" in tid_upper:
-        row = _resolve_tess_row(target_id)
-        if row is not None:
-            feats = {}
-            for col in tess_catalog_df.columns:
-                v = row.get(col)
-                if pd.notna(v) and isinstance(v, (int, float, np.number)):
-                    feats[col] = float(v)
-            if 'ra' in row and 'dec' in row and pd.notna(row.get('ra')) and pd.notna(row.get('dec')):
-                try:
-                    from astropy.coordinates import SkyCoord
-                    import astropy.units as u
-                    coords = SkyCoord(ra=row['ra']*u.deg, dec=row['dec']*u.deg, frame='icrs')
-                    feats['glon'] = float(coords.galactic.l.degree)
-                    feats['glat'] = float(coords.galactic.b.degree)
-                except Exception:
-                    pass
-            return feats
+        table, pos = _resolve_tess_position(target_id)
+        if pos is not None:
+            return table.feature_dict(pos)
 
     # --- Lookup Kepler KOI ---
-    if catalog_df is None:
+    table = _catalog.kepler_catalog
+    if table is None:
         return {}
-
-    # Résolution du kepid : soit passé directement, soit extrait du target_id
     if kepid is None:
-        if "KIC" in str(target_id).upper():
-            try:
-                kepid = int(str(target_id).upper().replace("KIC", "").strip())
-            except ValueError:
-                pass
+        kepid = _kepid_from_target(target_id)
+    pos = table.position("kepid", kepid)
+    return table.feature_dict(pos) if pos is not None else {}
 
-    if kepid is None:
-        return {}
 
-    match = catalog_df[catalog_df['kepid'] == kepid]
-    if len(match) == 0:
-        return {}
+def _input_sources(features_df, target_id, resolved_kepid=None, mission=None,
+                   bls_stats=None, period=None, lc_stellar_params=None):
+    """Sources d'une cible pour FeatureLayout (courbe, catalogue, FITS, BLS)."""
+    lc_features = None
+    if features_df is not None and not features_df.empty:
+        lc_features = dict(zip(features_df.columns, features_df.iloc[0].tolist()))
+    return {
+        "lc_features": lc_features,
+        "catalog_features": get_catalog_features_dict(target_id, kepid=resolved_kepid),
+        "mission": mission,
+        "lc_stellar_params": lc_stellar_params,
+        "period": period,
+        "bls_stats": bls_stats,
+    }
 
-    row = match.iloc[0]
-    feats = {}
-    
-    # Collecte dynamique de TOUTES les colonnes numériques dispo
-    for col in catalog_df.columns:
-        v = row.get(col)
-        if pd.notna(v) and isinstance(v, (int, float, np.number)):
-            feats[col] = float(v)
-
-    # Récupération Glon/Glat dynamiquement pour coller à l'entraînement astropy
-    if 'ra' in row and 'dec' in row and pd.notna(row['ra']) and pd.notna(row['dec']):
-        try:
-            from astropy.coordinates import SkyCoord
-            import astropy.units as u
-            coords = SkyCoord(ra=row['ra']*u.deg, dec=row['dec']*u.deg, frame='icrs')
-            feats['glon'] = float(coords.galactic.l.degree)
-            feats['glat'] = float(coords.galactic.b.degree)
-        except Exception:
-            pass
 
-    eps = 1e-9
-    period   = feats.get('koi_period')
-    depth    = feats.get('koi_depth')
-    duration = feats.get('koi_duration')
-    prad     = feats.get('koi_prad')
-    srad     = feats.get('koi_srad')
-    kepmag   = feats.get('koi_kepmag')
-
-    # Features dérivées
-    if period  is not None: feats['log_koi_period']  = float(np.log1p(max(period, 0)))
-    if depth   is not None: feats['log_koi_depth']   = float(np.log1p(max(depth, 0)))
-    if prad    is not None: feats['log_koi_prad']    = float(np.log1p(max(prad, 0)))
-    if period  is not None and duration is not None:
-        feats['duty_cycle'] = duration / (period * 24 + eps)
-    if prad is not None and srad is not None:
-        feats['ratio_prad_srad'] = prad / (srad * 109.076 + eps)
-    if depth is not None and srad is not None:
-        feats['depth_per_srad'] = depth / (srad + eps)
-    if depth is not None and kepmag is not None:
-        snr_p = depth / (10 ** (kepmag / 2.5 + eps))
-        feats['snr_proxy']     = snr_p
-        feats['log_snr_proxy'] = float(np.log1p(max(snr_p, 0)))
-
-    return feats
+# Features du modèle BLS Kepler+TESS (vecteur construit directement depuis le BLS)
+_BLS_FEATURES = frozenset({"bls_snr", "bls_depth_ppm", "bls_transit_fraction",
+                           "bls_power", "bls_duration_days", "bls_score",
+                           "period", "star_radius_solar", "star_temperature_k"})
+
+
+def needs_lc_features(bundle):
+    """
+    True si le modèle servi ou le modèle shadow lit des features de courbe
+    (run_feature_extraction) ; le modèle BLS n'utilise que period / bls_stats.
+    """
+    shadow = shadow_scorer
+    bundles = (bundle, shadow.bundle if shadow is not None else None)
+    return any(b is not None and b.features and not all(f in _BLS_FEATURES for f in b.features)
+               for b in bundles)
+
+
+def build_model_input(bundle, features_df, target_id, bls_stats, period, resolved_kepid=None,
+                      mission=None, lc_stellar_params=None):
+    """
+    Ligne d'entrée (DataFrame) dans l'ordre des features de `bundle` : vecteur
+    BLS direct pour le modèle BLS, sinon build_input_vector (ancien modèle
+    TSFRESH/KOI).
+    """
+    features = bundle.features
+    if not all(f in _BLS_FEATURES for f in features):
+        return build_input_vector(features_df, target_id, features, resolved_kepid=resolved_kepid,
+                                  mission=mission, bls_stats=bls_stats, period=period,
+                                  lc_stellar_params=lc_stellar_params)
+
+    from src.p02_preprocessing import compute_transit_score
+    bls_score_val = compute_transit_score(bls_stats)
+
+    # Données stellaires depuis catalogue KOI si disponible
+    cat_feats = get_catalog_features_dict(target_id, kepid=resolved_kepid)
+    srad  = cat_feats.get("koi_srad",  1.0) or 1.0
+    steff = cat_feats.get("koi_steff", 5500.0) or 5500.0
+
+    row_vals = {
+        "bls_snr":              float(bls_stats.get("bls_snr", 0)),
+        "bls_depth_ppm":        float(bls_stats.get("bls_depth_ppm", 0)),
+        "bls_transit_fraction": float(bls_stats.get("bls_transit_fraction", 0)),
+        "bls_power":            float(bls_stats.get("bls_power", 0)),
+        "bls_duration_days":    float(bls_stats.get("bls_duration_days", 0)),
+        "bls_score":            float(bls_score_val),
+        "period":               float(period),
+        "star_radius_solar":    float(srad),
+        "star_temperature_k":   float(steff),
+    }
+    return pd.DataFrame([row_vals])[features].astype(float)
+
+
+def build_input_matrix(targets, selected_features_list):
+    """
+    Matrice d'entrée (n, d) float64 pour un lot de cibles, colonnes dans
+    l'ordre de selected_features_list (utilisable telle quelle par le modèle).
+    targets : dicts d'arguments de build_input_vector (features_df, target_id, ...).
+    """
+    layout = feature_layout(selected_features_list)
+    return layout.assemble_batch([_input_sources(**t) for t in targets])
 
 
 def build_input_vector(features_df, target_id, selected_features_list, resolved_kepid=None,
@@ -1599,84 +1984,63 @@ def build_input_vector(features_df, target_id, selected_features_list, resolved_
     4. Fallback BLS : koi_period / koi_depth / koi_duration estimés depuis BLS
     5. koi_prad dérivé de depth + srad (rayon planétaire estimé)
     Les features toujours manquantes sont mises à 0.
+    Le vecteur est assemblé en NumPy (src.p13_feature_vector) ; le DataFrame
+    n'est construit qu'une fois, à la fin.
     """
-    # On force la création d'1 et 1 seule ligne (toutes les valeurs NaN au départ)
-    input_data = pd.DataFrame(index=[0], columns=selected_features_list)
+    X = build_input_matrix([{
+        "features_df": features_df, "target_id": target_id, "resolved_kepid": resolved_kepid,
+        "mission": mission, "bls_stats": bls_stats, "period": period,
+        "lc_stellar_params": lc_stellar_params,
+    }], selected_features_list)
+    return pd.DataFrame(X, columns=list(selected_features_list))
 
-    def _missing(col):
-        if col not in selected_features_list:
-            return False
-        v = input_data.loc[0, col]
-        return pd.isna(v) or v == 0
 
-    # 1. Injecter les features de la courbe de lumière (sci_*, bls_*)
-    if features_df is not None and not features_df.empty:
-        for col in selected_features_list:
-            if col in features_df.columns:
-                input_data.loc[0, col] = features_df[col].iloc[0]
+def _score_batch(X, cm):
+    return cm.predict_proba(X)[:, 1]
 
-    # 2. Enrichir avec les features du catalogue KOI ou TESS TOI
-    cat_feats = get_catalog_features_dict(target_id, kepid=resolved_kepid)
-    for col, val in cat_feats.items():
-        if col in selected_features_list:
-            input_data.loc[0, col] = val
 
-    # 3. Feature multi-missions : is_tess
-    if "is_tess" in selected_features_list:
-        input_data.loc[0, "is_tess"] = 1.0 if (mission and mission.upper() == "TESS") else 0.0
+# Micro-batching des scorings concurrents (INFERENCE_BATCH_WINDOW_MS=0 pour désactiver)
+inference_batcher = MicroBatcher(
+    _score_batch,
+    window_ms=float(os.environ.get("INFERENCE_BATCH_WINDOW_MS", "2")),
+    max_batch=int(os.environ.get("INFERENCE_MAX_BATCH", "64")),
+)
+
+
+def predict_score(bundle, input_data, build_row=None):
+    """
+    Probabilité 'planète' du modèle `bundle` pour une ligne construite avec
+    ses features, via le modèle compilé (identique bit à bit à
+    predict_proba, sans DMatrix).
+    build_row(bundle) -> ligne d'entrée : si un modèle shadow est configuré,
+    sa propre ligne (ses features) lui est transmise en tâche de fond.
+    """
+    cm = bundle.compiled
+    score = None
+    if cm is not None:
+        try:
+            x = input_data[cm.feature_names].to_numpy(dtype=np.float32)[0]
+            score = inference_batcher.score(x, cm)
+        except KeyError:
+            pass  # colonnes différentes du modèle compilé : chemin XGBoost
+    if score is None:
+        score = float(bundle.model.predict_proba(input_data)[0][1])
+
+    shadow = shadow_scorer
+    if shadow is not None and build_row is not None:
+        try:
+            shadow.submit(build_row(shadow.bundle).iloc[0].to_dict(), score)
+        except Exception as e:
+            print(f"[Shadow] Ligne d'entrée non construite : {e}")
+    return score
 
-    # 4. Paramètres stellaires depuis les métadonnées FITS Lightkurve
-    #    (TEFF, RADIUS, LOGG, TESSMAG, glon/glat) — comble ce que le catalogue n'a pas fourni
-    if lc_stellar_params:
-        for col, val in lc_stellar_params.items():
-            if col in selected_features_list and _missing(col):
-                input_data.loc[0, col] = float(val)
-
-    # 5. Fallback BLS : combler koi_period / koi_depth / koi_duration restants
-    if period and _missing("koi_period"):
-        input_data.loc[0, "koi_period"] = float(period)
-
-    if bls_stats:
-        depth_ppm = float(bls_stats.get("bls_depth_ppm", 0) or 0)
-        dur_days  = float(bls_stats.get("bls_duration_days", 0) or 0)
-
-        if _missing("koi_depth"):
-            input_data.loc[0, "koi_depth"] = depth_ppm
-        if _missing("koi_duration"):
-            input_data.loc[0, "koi_duration"] = dur_days * 24.0  # heures
-
-        # Barres d'erreur estimées à ±5% de la valeur centrale
-        for main_col, err_cols in [
-            ("koi_period",   ["koi_period_err1",   "koi_period_err2"]),
-            ("koi_depth",    ["koi_depth_err1",    "koi_depth_err2"]),
-            ("koi_duration", ["koi_duration_err1", "koi_duration_err2"]),
-        ]:
-            if main_col in selected_features_list:
-                main_val = input_data.loc[0, main_col]
-                if not pd.isna(main_val) and main_val != 0:
-                    for err_col in err_cols:
-                        if _missing(err_col):
-                            input_data.loc[0, err_col] = abs(float(main_val)) * 0.05
-
-    # 6. Dériver koi_prad depuis la profondeur du transit et le rayon stellaire
-    #    koi_prad (en R_terre) = sqrt(depth_ppm / 1e6) * koi_srad * 109.076
-    if _missing("koi_prad"):
-        srad      = input_data.loc[0, "koi_srad"]  if "koi_srad"  in selected_features_list else np.nan
-        depth_ppm = input_data.loc[0, "koi_depth"] if "koi_depth" in selected_features_list else np.nan
-        if not pd.isna(srad) and srad > 0 and not pd.isna(depth_ppm) and depth_ppm > 0:
-            rp_rstar = np.sqrt(depth_ppm / 1e6)
-            prad = rp_rstar * float(srad) * 109.076
-            input_data.loc[0, "koi_prad"] = prad
-            if _missing("koi_prad_err1"):
-                input_data.loc[0, "koi_prad_err1"] =  prad * 0.1
-            if _missing("koi_prad_err2"):
-                input_data.loc[0, "koi_prad_err2"] = -prad * 0.1
-
-    # 7. Remplir les manquants restants par 0
-    input_data = input_data.fillna(0)
-
-    # 8. Forcer le type float pour éviter l'erreur XGBoost 'object'
-    return input_data.astype(float)
+
+def top_feature_importances(bundle, k=5):
+    """[(feature, importance)] des k features les plus importantes du modèle."""
+    imp = getattr(bundle.model, "feature_importances_", None)
+    if imp is None or len(imp) != len(bundle.features):
+        return []
+    return [(bundle.features[i], float(imp[i])) for i in np.argsort(imp)[::-1][:k]]
 
 
 def classify_score(score):
@@ -1695,15 +2059,23 @@ def classify_score(score):
         return "Faux positif très probable"
 
 
-def compute_score_confidence(mdl, input_data):
+def compute_score_confidence(bundle, input_data):
     """
     Estime l'intervalle de confiance du score XGBoost en calculant la variance
     des prédictions à 4 profondeurs de l'ensemble (25%, 50%, 75%, 100% des arbres).
+    Les marges intermédiaires sont lues sur les sorties par arbre du modèle
+    compilé, en une seule traversée.
     Retourne le std en float (ex: 0.06 -> ±6%), ou None si indisponible.
     """
     try:
-        booster = mdl.get_booster()
-        n_trees = len(booster.get_dump())
+        cm = bundle.compiled
+        if cm is not None:
+            x = input_data[cm.feature_names].to_numpy(dtype=np.float32)
+            std = float(cm.score_confidence(x)[0])
+            return round(std, 4) if np.isfinite(std) else None
+
+        booster = bundle.model.get_booster()
+        n_trees = booster.num_boosted_rounds()
         if n_trees < 4:
             return None
         dmatrix = xgb.DMatrix(input_data)
@@ -1718,21 +2090,31 @@ def compute_score_confidence(mdl, input_data):
         return None
 
 
-def compute_characterization(lc_clean, lc_folded, period, score):
+def compute_characterization(lc_clean, lc_folded, period, score, flux_summary=None):
     """
     Caractérisation physique du signal détecté.
     Estime le rayon planétaire, le SNR du transit, et la durée.
+    lc_folded peut aussi être une source de flux memmap / par blocs : les
+    statistiques sont alors calculées en streaming (mémoire bornée).
+    flux_summary : FluxSummary de lc_clean. Le repliement ne fait que réordonner
+    les points, le résumé est donc réutilisé tel quel s'il couvre le même nombre
+    de points.
     """
     try:
-        flux_folded = np.array(lc_folded.flux.value, dtype=float)
-        flux_folded = flux_folded[~np.isnan(flux_folded)]
-        
-        if len(flux_folded) < 10:
+        if not hasattr(lc_folded, "flux"):
+            st = stream_flux_stats(lc_folded)
+        elif flux_summary is not None and flux_summary.count == len(lc_folded):
+            st = flux_summary
+        else:
+            st = FluxSummary(lc_folded)
+
+        if st.count < 10:
             return {"error": "Pas assez de données pour caractériser"}
-        
+
+        baseline, p1, noise_std = st.median(), st.percentile(1), st.std
+
         # Profondeur du transit (delta F / F)
-        baseline = np.median(flux_folded)
-        transit_depth = baseline - np.percentile(flux_folded, 1)  # percentile 1% pour robustesse
+        transit_depth = baseline - p1  # percentile 1% pour robustesse
         depth_ppm = transit_depth * 1e6  # en parties par million
         
         # Estimation du rayon planétaire (en rayons terrestres)
@@ -1742,7 +2124,6 @@ def compute_characterization(lc_clean, lc_folded, period, score):
         planet_radius_earth = rp_over_rstar * 109.076  # R_soleil / R_terre
         
         # SNR du transit
-        noise_std = np.std(flux_folded)
         snr = transit_depth / noise_std if noise_std > 0 else 0
         
         # Classification du type de planète
@@ -1770,6 +2151,41 @@ def compute_characterization(lc_clean, lc_folded, period, score):
         return {"error": f"Caractérisation échouée : {str(e)}"}
 
 
+def catalog_position(target_id, resolved_kepid=None):
+    """(ra, dec) en degrés d'une cible d'après les catalogues KOI / TESS, ou None."""
+    tid_upper = str(target_id).upper()
+    table, pos = (None, None)
+    if "TIC" in tid_upper or "TOI" in tid_upper:
+        table, pos = _resolve_tess_position(target_id)
+    kepler_catalog = _catalog.kepler_catalog
+    if pos is None and kepler_catalog is not None:
+        kepid = resolved_kepid if resolved_kepid is not None else _kepid_from_target(target_id)
+        table, pos = kepler_catalog, kepler_catalog.position("kepid", kepid)
+    if pos is None:
+        return None
+    row = table.row(pos)
+    ra, dec = row.get("ra"), row.get("dec")
+    if not (is_finite_number(ra) and is_finite_number(dec)):
+        return None
+    return float(ra), float(dec)
+
+
+def catalog_neighbours(target_id, mission, resolved_kepid=None, radius_arcsec=None):
+    """
+    Étoiles des catalogues à moins de radius_arcsec de la cible (par défaut
+    ~3 pixels du détecteur de la mission) : contrôle de contamination du flux.
+    Retourne une liste triée par séparation, ou None si la cible n'a pas de position.
+    """
+    index = _catalog.sky_index
+    position = catalog_position(target_id, resolved_kepid=resolved_kepid)
+    if index is None or position is None:
+        return None
+    radius = radius_arcsec or NEIGHBOUR_RADIUS_ARCSEC.get(mission, NEIGHBOUR_RADIUS_ARCSEC["TESS"])
+    # La cible (et son entrée KOI ↔ TOI) est exclue par position plutôt que par nom
+    return [n for n in index.neighbours(position[0], position[1], radius)
+            if n["separation_arcsec"] > SAME_STAR_ARCSEC]
+
+
 def get_real_metadata(target_id, resolved_kepid=None):
     """
     Récupère les vraies métadonnées stellaires depuis les catalogues NASA.
@@ -1795,47 +2211,40 @@ def get_real_metadata(target_id, resolved_kepid=None):
                 }
 
     # ── Lookup Kepler KOI ────────────────────────────────────────────────────
-    if catalog_df is None:
+    table = _catalog.kepler_catalog
+    if table is None:
         return {"note": "Catalogue non disponible"}
 
     kepid = resolved_kepid  # priorité : ID résolu par Lightkurve
 
     if kepid is None:
         if "KIC" in str(target_id).upper():
-            try:
-                kepid = int(str(target_id).upper().replace("KIC", "").strip())
-            except ValueError:
-                pass
+            kepid = _kepid_from_target(target_id)
         elif "Kepler-" in target_id:
             # Recherche par kepler_name (ex: "Kepler-452 b", "Kepler-10 b")
             # On extrait le numéro pour éviter que "Kepler-10" matche "Kepler-105"
-            import re as _re_meta
-            m = _re_meta.match(r'(Kepler-\d+)', target_id.strip(), _re_meta.IGNORECASE)
+            m = _re.match(r'(Kepler-\d+)', target_id.strip(), _re.IGNORECASE)
             if m:
-                name_prefix = m.group(1)
-                # Match exact du système : "Kepler-10 " (espace) ou fin de chaîne
-                pattern = rf'^{_re_meta.escape(name_prefix)}(\s|$)'
-                mask = catalog_df['kepler_name'].astype(str).str.match(pattern, case=False, na=False)
-                if mask.any():
-                    kepid = int(catalog_df.loc[mask, 'kepid'].iloc[0])
-
-    if kepid is not None:
-        match = catalog_df[catalog_df['kepid'] == kepid]
-        if len(match) > 0:
-            row = match.iloc[0]
-            kepler_name = str(row['kepler_name']) if pd.notna(row.get('kepler_name')) else None
-            return {
-                "kepid": int(row['kepid']),
-                "kepler_name": kepler_name,
-                "star_temperature_k": int(row['koi_steff']) if pd.notna(row.get('koi_steff')) else None,
-                "star_radius_solar": round(float(row['koi_srad']), 3) if pd.notna(row.get('koi_srad')) else None,
-                "kepler_magnitude": round(float(row['koi_kepmag']), 2) if pd.notna(row.get('koi_kepmag')) else None,
-                "known_disposition": row.get('koi_disposition', 'UNKNOWN'),
-                "catalog_period": round(float(row['koi_period']), 4) if pd.notna(row.get('koi_period')) else None,
-                "catalog_depth_ppm": round(float(row['koi_depth']), 1) if pd.notna(row.get('koi_depth')) else None,
-                "catalog_planet_radius": round(float(row['koi_prad']), 2) if pd.notna(row.get('koi_prad')) else None,
-                "source": "NASA Exoplanet Archive (KOI Table)"
-            }
+                pos = table.kepler_system_position(m.group(1))
+                if pos is not None:
+                    kepid = int(table.row(pos)['kepid'])
+
+    pos = table.position("kepid", kepid) if kepid is not None else None
+    if pos is not None:
+        row = table.row(pos)
+        kepler_name = str(row['kepler_name']) if pd.notna(row.get('kepler_name')) else None
+        return {
+            "kepid": int(row['kepid']),
+            "kepler_name": kepler_name,
+            "star_temperature_k": int(row['koi_steff']) if pd.notna(row.get('koi_steff')) else None,
+            "star_radius_solar": round(float(row['koi_srad']), 3) if pd.notna(row.get('koi_srad')) else None,
+            "kepler_magnitude": round(float(row['koi_kepmag']), 2) if pd.notna(row.get('koi_kepmag')) else None,
+            "known_disposition": row.get('koi_disposition', 'UNKNOWN'),
+            "catalog_period": round(float(row['koi_period']), 4) if pd.notna(row.get('koi_period')) else None,
+            "catalog_depth_ppm": round(float(row['koi_depth']), 1) if pd.notna(row.get('koi_depth')) else None,
+            "catalog_planet_radius": round(float(row['koi_prad']), 2) if pd.notna(row.get('koi_prad')) else None,
+            "source": "NASA Exoplanet Archive (KOI Table)"
+        }
 
     return {
         "note": "Métadonnées non trouvées dans le catalogue.",
@@ -1848,26 +2257,12 @@ def get_real_metadata(target_id, resolved_kepid=None):
 # =============================================================================
 
 import re as _re
-import requests as _requests
-
-_star_info_cache = {}
-_STAR_INFO_TTL   = 3600 * 24  # 24 h
-
-_NASA_TAP = "https://exoplanetarchive.ipac.caltech.edu/TAP/sync"
-
-
-def _hostname_from_target(target: str) -> str:
-    """Retire le suffixe de planète éventuel (ex: 'Kepler-452b' → 'Kepler-452')."""
-    t = target.strip()
-    t = _re.sub(r'(\d)\s*[b-z]$', r'\1', t, flags=_re.IGNORECASE)
-    return t
 
-
-def _query_nasa(adql: str, timeout: int = 8):
-    """Lance une requête ADQL sur le TAP NASA et retourne la liste de dicts."""
-    resp = _requests.get(_NASA_TAP, params={"query": adql, "format": "json"}, timeout=timeout)
-    resp.raise_for_status()
-    return resp.json() or []
+# Cache par étoile hôte : mémoire + data/star_info_cache.json (TTL 24 h),
+# requêtes TAP regroupées par lots sur une session keep-alive.
+_star_info = NasaTapClient(cache_path=STAR_INFO_CACHE_PATH)
+atexit.register(_star_info.cache.flush)
+_STAR_INFO_BATCH_MAX = 100     # cibles par appel de /api/star_info/batch (= limite de /api/catalog/stars)
 
 
 @app.route('/api/star_info', methods=['GET'])
@@ -1880,84 +2275,30 @@ def get_star_info():
     target = request.args.get('target', '').strip()
     if not target:
         return jsonify({"error": "Paramètre 'target' requis"}), 400
+    return jsonify(_star_info.star_info([target])[target])
 
-    cache_key = target.lower()
-    if cache_key in _star_info_cache:
-        entry = _star_info_cache[cache_key]
-        if time.time() - entry['ts'] < _STAR_INFO_TTL:
-            return jsonify(entry['data'])
-
-    hostname = _hostname_from_target(target)
-
-    result = {
-        "target":   target,
-        "hostname": hostname,
-        "stellar":  None,
-        "planets":  [],
-        "source":   None,
-    }
-
-    try:
-        # -- Données planétaires + stellaires (table ps, une ligne par planète) --
-        q_planets = (
-            "SELECT hostname, pl_name, pl_orbper, pl_rade, pl_eqt, pl_insol, "
-            "st_teff, st_rad, st_mass, st_lum, sy_dist, sy_kmag, "
-            "disc_year, disc_method "
-            f"FROM ps WHERE UPPER(hostname) = UPPER('{hostname}') "
-            "AND default_flag = 1"
-        )
-        rows = _query_nasa(q_planets)
-
-        if rows:
-            r0 = rows[0]
-            result["stellar"] = {
-                "teff":        r0.get("st_teff"),       # Température eff. (K)
-                "radius":      r0.get("st_rad"),         # Rayon (R☉)
-                "mass":        r0.get("st_mass"),        # Masse (M☉)
-                "luminosity":  r0.get("st_lum"),         # Luminosité (log L☉)
-                "distance_pc": r0.get("sy_dist"),        # Distance (pc)
-                "kmag":        r0.get("sy_kmag"),        # Magnitude K
-            }
-            result["planets"] = [
-                {
-                    "name":         r.get("pl_name"),
-                    "period_days":  r.get("pl_orbper"),
-                    "radius_earth": r.get("pl_rade"),
-                    "eq_temp":      r.get("pl_eqt"),
-                    "insolation":   r.get("pl_insol"),
-                    "disc_year":    r.get("disc_year"),
-                    "disc_method":  r.get("disc_method"),
-                }
-                for r in rows
-            ]
-            result["source"] = "NASA Exoplanet Archive"
-
-        else:
-            # Fallback : table stellarhosts (étoiles sans planète confirmée)
-            q_star = (
-                "SELECT hostname, st_teff, st_rad, st_mass, st_lum, sy_dist, sy_kmag "
-                f"FROM stellarhosts WHERE UPPER(hostname) = UPPER('{hostname}') "
-                "AND default_flag = 1"
-            )
-            stars = _query_nasa(q_star)
-            if stars:
-                s = stars[0]
-                result["stellar"] = {
-                    "teff":        s.get("st_teff"),
-                    "radius":      s.get("st_rad"),
-                    "mass":        s.get("st_mass"),
-                    "luminosity":  s.get("st_lum"),
-                    "distance_pc": s.get("sy_dist"),
-                    "kmag":        s.get("sy_kmag"),
-                }
-                result["source"] = "NASA Exoplanet Archive (stellar hosts)"
-
-    except Exception as exc:
-        print(f"[star_info] Erreur NASA API pour '{hostname}': {exc}")
-        # On ne lève pas — résultat vide renvoyé proprement
 
-    _star_info_cache[cache_key] = {"data": result, "ts": time.time()}
-    return jsonify(result)
+@app.route('/api/star_info/batch', methods=['GET', 'POST'])
+@token_required
+def get_star_info_batch():
+    """
+    Données NASA de plusieurs cibles en un appel (ex. une page de
+    /api/catalog/stars) : une requête ADQL par lot d'étoiles non cachées.
+    POST {"targets": [...]} ou GET ?targets=Kepler-452,Kepler-22b
+    """
+    body = request.get_json(silent=True) or {}
+    targets = body.get("targets")
+    if targets is None:
+        targets = request.args.get("targets", "").split(",")
+    if not isinstance(targets, list):
+        return jsonify({"error": "'targets' doit être une liste"}), 400
+    targets = list(dict.fromkeys(str(t).strip() for t in targets if str(t).strip()))
+    if not targets:
+        return jsonify({"error": "Paramètre 'targets' requis"}), 400
+    if len(targets) > _STAR_INFO_BATCH_MAX:
+        return jsonify({"error": f"{_STAR_INFO_BATCH_MAX} cibles maximum par appel"}), 400
+
+    return jsonify({"results": _star_info.star_info(targets), "stats": _star_info.stats()})
 
 
 # =============================================================================
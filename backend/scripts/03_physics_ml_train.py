@@ -14,6 +14,9 @@ enregistrées dans les fichiers JSON du cache Lightkurve.
 Usage :
     cd backend && source venv/bin/activate
     python scripts/03_physics_ml_train.py
+    python scripts/03_physics_ml_train.py --dataset data/processed/training_dataset
+    python scripts/03_physics_ml_train.py --dataset data/processed/training_dataset --update
+    python scripts/03_physics_ml_train.py --tune --trials 30
 =============================================================================
 """
 
@@ -21,6 +24,7 @@ import os
 import sys
 import json
 import time
+import argparse
 import warnings
 import numpy as np
 import pandas as pd
@@ -41,99 +45,143 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 CACHE_DIR = BASE_DIR / "data" / "cache" / "lightkurve_training"
 MODEL_DIR = BASE_DIR / "models"
 
+sys.path.insert(0, str(BASE_DIR))
+from src.p02_preprocessing import compute_transit_score
+from src.p06_feature_store import get_default_store, normalize_target
+from src.p05_dataset_manager import (load_partitioned_dataset, update_dataset,
+                                    iter_cached_lightcurves, read_cache_scalars)
+from src.p08_tuning import run_search
+from src.p09_evaluation import threshold_curves
+from src.p18_catalog_snapshot import load_catalog
+
+# Colonnes BLS relues depuis le feature store (prioritaires sur le JSON du cache)
+STORE_COLUMNS = ["bls_snr", "bls_depth_ppm", "bls_transit_fraction",
+                 "bls_power", "bls_duration_days", "period"]
+
 print("=" * 70)
 print("  ENTRAÎNEMENT IA PHYSIQUE (Scikit-Learn / XGBoost)")
 print("=====================================================================")
 
+# Nos "Features" d'entraînement incluent maintenant la taille de l'étoile
+FEATURES = [
+    "bls_snr",              
+    "bls_depth_ppm",        
+    "bls_transit_fraction", 
+    "bls_power",            
+    "bls_duration_days",    
+    "bls_score",            
+    "period",               
+    "star_radius_solar",    # NOUTEAUTE: Rayon de l'étoile
+    "star_temperature_k"    # NOUVEAUTE: Température
+]
+
 # -----------------------------------------------------------------------------
 # 1. Chargement des données d'astrophysique
 # -----------------------------------------------------------------------------
-def load_physics_data():
-    print("\n[1/4] Chargement des données astrophysiques et stellaires...")
-    if not CACHE_DIR.exists():
-        print("[!] Cache introuvable.")
-        sys.exit(1)
+STAR_COLUMNS = {"koi_srad": "star_radius_solar", "koi_steff": "star_temperature_k"}
+
 
+def load_star_meta():
+    """Catalogue KOI → DataFrame (kepid, star_radius_solar, star_temperature_k), médianes remplies."""
     # Chargement du catalogue pour récupérer les tailles des étoiles
     CATALOG_PATH = BASE_DIR / "data" / "catalog" / "kepler_koi_catalog.csv"
-    if CATALOG_PATH.exists():
-        df_cat = pd.read_csv(CATALOG_PATH)
-        df_cat = df_cat.drop_duplicates(subset=["kepid"])
-        
-        # Valeurs médianes par défaut si la donnée n'existe pas
-        default_srad = df_cat['koi_srad'].median()
-        default_steff = df_cat['koi_steff'].median()
-        
-        # Création d'un dictionnaire d'accès rapide {kepid: (srad, steff)}
-        star_meta = {}
-        for _, row in df_cat.iterrows():
-            k = int(row['kepid'])
-            srad = float(row['koi_srad']) if pd.notna(row['koi_srad']) else default_srad
-            steff = float(row['koi_steff']) if pd.notna(row['koi_steff']) else default_steff
-            star_meta[k] = (srad, steff)
-        print(f"   ✓ Catalogue NASA chargé ({len(star_meta)} étoiles)")
-    else:
+    if not CATALOG_PATH.exists():
         print("[!] Attention : kepler_koi_catalog.csv absent, impossibilité d'atteindre >90% d'accuracy.")
         sys.exit(1)
 
-    stars = []
-    for f in sorted(CACHE_DIR.glob("star_*.json")):
-        with open(f) as fp:
-            d = json.load(fp)
-        if d.get("status") == "ok":
-            stars.append(d)
+    df_cat = load_catalog(CATALOG_PATH, columns=["kepid", *STAR_COLUMNS])
+    df_cat = df_cat.drop_duplicates(subset=["kepid"])
+    df_cat["kepid"] = df_cat["kepid"].astype("int64")
+    star_meta = df_cat.rename(columns=STAR_COLUMNS)
+
+    # Valeurs médianes par défaut si la donnée n'existe pas
+    medians = star_meta[list(STAR_COLUMNS.values())].median()
+    star_meta = star_meta.fillna(medians)
+    print(f"   ✓ Catalogue NASA chargé ({len(star_meta)} étoiles)")
+    return star_meta, medians
+
+
+def join_star_meta(df, kepids):
+    """Ajoute rayon et température stellaires (jointure vectorisée sur kepid, médianes par défaut)."""
+    star_meta, medians = load_star_meta()
+    keys = pd.DataFrame({"kepid": pd.to_numeric(kepids, errors="coerce").astype("Int64")})
+    joined = keys.merge(star_meta.astype({"kepid": "Int64"}), on="kepid", how="left")
+    for col, default in medians.items():
+        df[col] = joined[col].fillna(default).to_numpy()
+    return df
+
+
+def load_physics_dataset(dataset_dir):
+    """
+    Variante de load_physics_data sur le dataset Parquet partitionné de
+    p05_dataset_manager : seules les colonnes utiles sont lues.
+    """
+    print(f"\n[1/4] Chargement du dataset partitionné {dataset_dir}...")
+    bls_cols = [f for f in FEATURES if f not in STAR_COLUMNS.values()]
+    df = load_partitioned_dataset(str(dataset_dir), columns=bls_cols + ["target_id", "target_label"])
+    df = df[df["target_label"].isin([0, 1])].reset_index(drop=True)
+    if len(df) == 0:
+        print("[!] Aucune ligne étiquetée dans le dataset.")
+        sys.exit(1)
+    print(f"   ✓ {len(df)} lignes ({int(df['target_label'].sum())} Planètes)")
+
+    kepids = df["target_id"].astype(str).str.extract(r"(\d+)")[0]
+    df = join_star_meta(df, kepids)
 
+    X = df[FEATURES].astype(float).fillna(0.0).reset_index(drop=True)
+    y = df["target_label"].astype(int).to_numpy()
+    return X, y, FEATURES
+
+
+def load_physics_data():
+    print("\n[1/4] Chargement des données astrophysiques et stellaires...")
+    if not CACHE_DIR.exists():
+        print("[!] Cache introuvable.")
+        sys.exit(1)
+
+    # Scalaires du cache (les tableaux flux/time ne sont pas désérialisés)
+    stars = read_cache_scalars(str(CACHE_DIR))
+    if "status" in stars.columns:
+        stars = stars[stars["status"] == "ok"].reset_index(drop=True)
     if len(stars) == 0:
         print("[!] Aucune étoile valide trouvée.")
         sys.exit(1)
 
-    planets = sum(1 for s in stars if s["label"] == 1)
-    fps = sum(1 for s in stars if s["label"] == 0)
+    planets = int((stars["label"] == 1).sum())
+    fps = int((stars["label"] == 0).sum())
     print(f"   ✓ {len(stars)} courbes trouvées ({planets} Planètes, {fps} Fausses)")
 
-    # Nos "Features" d'entraînement incluent maintenant la taille de l'étoile
-    FEATURES = [
-        "bls_snr",              
-        "bls_depth_ppm",        
-        "bls_transit_fraction", 
-        "bls_power",            
-        "bls_duration_days",    
-        "bls_score",            
-        "period",               
-        "star_radius_solar",    # NOUTEAUTE: Rayon de l'étoile
-        "star_temperature_k"    # NOUVEAUTE: Température
-    ]
-
-    data = []
-    labels = []
-    for s in stars:
-        # Trouver les métadonnées de l'étoile (Rayon et Température)
-        kepid = int(s["kepid"])
-        srad, steff = star_meta.get(kepid, (default_srad, default_steff))
-        
-        row = [
-            float(s.get("bls_snr", 0.0)),
-            float(s.get("bls_depth_ppm", 0.0)),
-            float(s.get("bls_transit_fraction", 0.0)),
-            float(s.get("bls_power", 0.0)),
-            float(s.get("bls_duration_days", 0.0)),
-            float(s.get("bls_score", 0.0)),
-            float(s.get("period", 0.0)),
-            srad,
-            steff
-        ]
-        data.append(row)
-        labels.append(s["label"])
-
-    X = pd.DataFrame(data, columns=FEATURES)
-    y = np.array(labels)
+    # Métriques BLS recalculées par la version courante du pipeline (feature store)
+    try:
+        stored = get_default_store().read_bulk(columns=STORE_COLUMNS)
+    except Exception as e:
+        print(f"   [!] Feature store illisible ({e}), métriques du cache JSON utilisées.")
+        stored = pd.DataFrame()
+    for col in FEATURES:
+        if col not in stars.columns:
+            stars[col] = np.nan
+    if not stored.empty:
+        keys = "kic " + stars["kepid"].astype("int64").astype(str)
+        overlay = stored.set_index("target")[STORE_COLUMNS].reindex(keys).reset_index(drop=True)
+        stars[STORE_COLUMNS] = overlay.combine_first(stars[STORE_COLUMNS])
+        # bls_score dérive des métriques BLS : recalculé sur les valeurs du store
+        updated = keys.isin(stored["target"]).to_numpy()
+        stats = stars.loc[updated, STORE_COLUMNS].astype(float).fillna(0.0)
+        stars.loc[updated, "bls_score"] = [compute_transit_score(row) for row in stats.to_dict("records")]
+        print(f"   ✓ Feature store : {int(updated.sum())} étoiles avec métriques BLS à jour")
+
+    # Rayon et température de l'étoile
+    stars = join_star_meta(stars, stars["kepid"])
+
+    X = stars[FEATURES].astype(float).fillna(0.0)
+    y = stars["label"].to_numpy()
     
     return X, y, FEATURES
 
 # -----------------------------------------------------------------------------
 # 2. Équilibrage et Modélisation Machine Learning
 # -----------------------------------------------------------------------------
-def train_physics_model(X, y, feature_names):
+def train_physics_model(X, y, feature_names, tune=False, n_trials=20, n_jobs=None):
     print("\n[2/4] Modélisation IA (XGBoost)...")
 
     # Séparation Entraînement / Validation (80% / 20%)
@@ -153,12 +201,25 @@ def train_physics_model(X, y, feature_names):
 
     # L'algorithme d'apprentissage : XGBoost (Extreme Gradient Boosting)
     # Très performant sur des variables tabulaires physiques
-    model = xgb.XGBClassifier(
+    params = dict(
         n_estimators=150,        # Nombre d'itérations
         max_depth=4,             # Arbres peu profonds pour éviter l'overfitting
         learning_rate=0.05,
         subsample=0.8,
         colsample_bytree=0.8,
+    )
+    tuned_params = None
+    if tune:
+        # Recherche d'hyperparamètres (leaderboard + front de Pareto précision / latence)
+        tuned_params, _ = run_search(X_resampled, y_resampled, base_params={"seed": 42},
+                                     n_trials=n_trials, n_jobs=n_jobs,
+                                     output_path=MODEL_DIR / "tuning_leaderboard.json",
+                                     log=lambda m: print(f"   {m}"))
+        params.update(tuned_params)
+        print(f"   ✓ Configuration retenue : {tuned_params}")
+
+    model = xgb.XGBClassifier(
+        **params,
         eval_metric="logloss",
         use_label_encoder=False,
         random_state=42,
@@ -179,18 +240,14 @@ def train_physics_model(X, y, feature_names):
     # Test final sur des données que l'IA n'a jamais vues (Holdout)
     proba_test = model.predict_proba(X_test)[:, 1]
     
-    # Recherche du meilleur seuil de coupure (Threshold) pour maximiser l'ACCURACY globale
-    best_acc, best_thr, best_f1 = 0, 0.5, 0
-    for thr in np.arange(0.1, 0.9, 0.05):
-        y_pred_thr = (proba_test >= thr).astype(int)
-        acc = accuracy_score(y_test, y_pred_thr)
-        if acc > best_acc:
-            best_acc = acc
-            best_thr = thr
-            best_f1 = f1_score(y_test, y_pred_thr, zero_division=0)
+    # Courbes ROC / précision-rappel / accuracy par seuil (un seul tri du holdout)
+    # et seuil de coupure maximisant l'ACCURACY globale
+    curves = threshold_curves(y_test, proba_test)
+    best_thr = curves["best_accuracy_threshold"]
 
     y_pred = (proba_test >= best_thr).astype(int)
-    print(f"\n   Seuil optimal déterminé : {best_thr:.2f}")
+    best_f1 = f1_score(y_test, y_pred, zero_division=0)
+    print(f"\n   Seuil optimal déterminé : {best_thr:.3f}")
     
     print(f"\n   Résultats sur le set de test ({len(y_test)} étoiles) :")
     print(classification_report(y_test, y_pred, target_names=["Faux Positif", "Planète"]))
@@ -221,11 +278,14 @@ def train_physics_model(X, y, feature_names):
         "holdout_recall": float(recall_score(y_test, y_pred, zero_division=0)),
         "holdout_f1": float(best_f1),
         "holdout_auc_roc": float(roc_auc_score(y_test, proba_test)),
+        "threshold_curves": curves,
         "confusion_matrix": cm.tolist(),
         "cv5_accuracy_mean": float(cv_scores["test_accuracy"].mean()),
         "cv5_auc_mean": float(cv_scores["test_roc_auc"].mean()),
         "top_features": top_feats,
     }
+    if tuned_params is not None:
+        metrics["tuned_params"] = tuned_params
 
     return model, metrics
 
@@ -254,9 +314,36 @@ def save_compiled_model(model, features, metrics):
     print("=====================================================================\n")
 
 def main():
+    parser = argparse.ArgumentParser(description="Entraînement XGBoost sur métriques BLS")
+    parser.add_argument("--dataset", default=None,
+                        help="Dataset Parquet partitionné (p05_dataset_manager) au lieu du cache JSON")
+    parser.add_argument("--update", action="store_true",
+                        help="Met d'abord à jour le dataset depuis le cache (seules les courbes "
+                             "ou étapes modifiées sont recalculées)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Processus pour le recalcul des features (défaut : nb de CPU)")
+    parser.add_argument("--tune", action="store_true",
+                        help="Recherche d'hyperparamètres XGBoost avant l'entraînement final")
+    parser.add_argument("--trials", type=int, default=20, help="Nombre de candidats (--tune)")
+    parser.add_argument("--jobs", type=int, default=None,
+                        help="Essais en parallèle (--tune, défaut : nb de CPU)")
+    args = parser.parse_args()
+    if args.update and not args.dataset:
+        parser.error("--update nécessite --dataset")
+
     t0 = time.time()
-    X, y, feature_names = load_physics_data()
-    model, metrics = train_physics_model(X, y, feature_names)
+    if args.update:
+        print(f"\n[0/4] Mise à jour incrémentale de {args.dataset}...")
+        report = update_dataset(iter_cached_lightcurves(str(CACHE_DIR)), str(args.dataset),
+                                n_workers=args.workers)
+        print(f"   ✓ {report['reused']} lignes réutilisées, {report['recomputed']} recalculées "
+              f"({report['failed']} échecs, {report['removed']} retirées)")
+    if args.dataset:
+        X, y, feature_names = load_physics_dataset(Path(args.dataset))
+    else:
+        X, y, feature_names = load_physics_data()
+    model, metrics = train_physics_model(X, y, feature_names, tune=args.tune,
+                                         n_trials=args.trials, n_jobs=args.jobs)
     save_compiled_model(model, feature_names, metrics)
     print(f"[Horloge] Durée d'entraînement total : {time.time() - t0:.2f} secondes.")
 
@@ -3,12 +3,19 @@ Script d'entraînement XGBoost MULTI-MISSIONS (Kepler KOI + TESS TOI).
 Fusionne les deux datasets, harmonise les colonnes, et entraîne un
 classifieur binaire robuste capable de prédire sur les deux missions.
 Utilise astropy pour les coordonnées galactiques.
+
+Mode incrémental (--incremental) : continue le boosting du modèle existant
+sur les seules lignes nouvelles ou modifiées depuis le dernier entraînement
+(empreintes dans models/training_rows.parquet), puis ne remplace le modèle
+que s'il tient la comparaison avec le précédent sur le holdout.
 """
 
 import sys
 import os
 import json
+import time
 import logging
+import argparse
 from pathlib import Path
 
 import pandas as pd
@@ -21,13 +28,14 @@ import astropy.units as u
 from sklearn.model_selection import StratifiedKFold, cross_validate, train_test_split
 from sklearn.metrics import (accuracy_score, f1_score, roc_auc_score,
                              classification_report, precision_score,
-                             recall_score, confusion_matrix)
+                             recall_score, confusion_matrix, log_loss)
 from xgboost import XGBClassifier
 
 # ============================================================================
 # CONFIGURATION
 # ============================================================================
 ROOT_DIR = Path(__file__).resolve().parent.parent.parent
+BACKEND_DIR = ROOT_DIR / "backend"
 DATA_DIR = ROOT_DIR / "data" / "catalog"
 MODELS_DIR = ROOT_DIR / "models"
 
@@ -37,9 +45,35 @@ TESS_PATH   = DATA_DIR / "tess_toi_binary.csv"
 MODEL_PATH    = MODELS_DIR / "exoplanet_model.json"
 FEATURES_PATH = MODELS_DIR / "selected_features.json"
 METRICS_PATH  = MODELS_DIR / "model_metrics.json"
+ROWS_PATH     = MODELS_DIR / "training_rows.parquet"
 
 RANDOM_SEED = 42
 
+# Configuration XGBoost par défaut (remplacée par --tune)
+DEFAULT_PARAMS = dict(
+    n_estimators=500,
+    max_depth=6,
+    learning_rate=0.05,
+    subsample=0.85,
+    colsample_bytree=0.85,
+)
+
+# Mode incrémental : arbres ajoutés et dégradation tolérée sur le holdout
+INCREMENTAL_ROUNDS = 20
+INCREMENTAL_TOLERANCE = 0.005
+# Lignes inchangées rejouées avec les nouvelles (× nombre de lignes nouvelles)
+# pour que les arbres ajoutés ne sur-apprennent pas le seul delta
+INCREMENTAL_REPLAY = 4
+
+# Features de courbe de lumière (run_feature_extraction) jointes depuis le feature store
+LC_BLS_FEATURES = ["bls_snr", "bls_depth_ppm", "bls_transit_fraction",
+                   "bls_power", "bls_duration_days"]
+
+sys.path.insert(0, str(BACKEND_DIR))
+from src.p09_evaluation import threshold_curves
+from src.p18_catalog_snapshot import load_catalog
+from src.p19_catalog_state import row_hashes
+
 logging.basicConfig(level=logging.INFO, format="%(levelname)s - %(message)s")
 
 def log(msg):
@@ -74,20 +108,48 @@ def add_astropy_features(df):
     return df
 
 
-def load_and_merge_datasets():
+def join_lightcurve_features(df, id_col, prefix, stored):
+    """
+    Joint les features de courbe de lumière (sci_*, bls_*) du feature store
+    sur l'identifiant stellaire (kepid → 'kic <id>', tid → 'tic <id>').
+    Les étoiles absentes du store gardent des NaN (imputés dans prepare_dataset).
+    """
+    feat_cols = [c for c in stored.columns
+                 if c.startswith("sci_") or c in LC_BLS_FEATURES]
+    if id_col not in df.columns or not feat_cols:
+        return df
+    keys = prefix + " " + pd.to_numeric(df[id_col], errors="coerce").astype("Int64").astype(str)
+    lc_feats = stored.set_index("target")[feat_cols]
+    joined = lc_feats.reindex(keys.values)
+    joined.index = df.index
+    log(f"  → {int(joined.notna().any(axis=1).sum())} {prefix.upper()} avec features de courbe de lumière")
+    return pd.concat([df, joined], axis=1)
+
+
+def load_and_merge_datasets(with_lc_features=False):
     """
     Charge les datasets Kepler et TESS, harmonise les colonnes,
     ajoute une feature 'is_tess' et les fusionne.
+    with_lc_features : joint aussi les features sci_*/bls_* du feature store.
     """
+    stored = pd.DataFrame()
+    if with_lc_features:
+        from src.p06_feature_store import get_default_store
+        stored = get_default_store().read_bulk()
+        log(f"Feature store : {len(stored)} courbes de lumière pré-calculées")
     # --- Kepler ---
     if not KEPLER_PATH.exists():
         raise FileNotFoundError(f"Dataset Kepler introuvable : {KEPLER_PATH}")
     
     log(f"Chargement Kepler : {KEPLER_PATH.name}")
-    df_kepler = pd.read_csv(KEPLER_PATH)
+    df_kepler = load_catalog(KEPLER_PATH)
     df_kepler["is_tess"] = 0
     df_kepler["mission"] = "Kepler"
+    df_kepler["row_key"] = df_kepler["kepoi_name"].astype(str) if "kepoi_name" in df_kepler.columns \
+        else "KIC " + df_kepler["kepid"].astype(str)
     log(f"  → {len(df_kepler)} entrées Kepler")
+    if not stored.empty:
+        df_kepler = join_lightcurve_features(df_kepler, "kepid", "kic", stored)
     
     # --- TESS ---
     if not TESS_PATH.exists():
@@ -97,9 +159,12 @@ def load_and_merge_datasets():
         return df_kepler
     
     log(f"Chargement TESS : {TESS_PATH.name}")
-    df_tess = pd.read_csv(TESS_PATH)
+    df_tess = load_catalog(TESS_PATH)
     df_tess["is_tess"] = 1
+    df_tess["row_key"] = "TOI " + df_tess["toi"].astype(str)
     log(f"  → {len(df_tess)} entrées TESS")
+    if not stored.empty:
+        df_tess = join_lightcurve_features(df_tess, "tid", "tic", stored)
     
     # --- Harmonisation des colonnes ---
     # Trouver les colonnes communes (numériques + target + is_tess)
@@ -108,7 +173,7 @@ def load_and_merge_datasets():
     common_cols = sorted(kepler_cols & tess_cols)
     
     # S'assurer que les colonnes essentielles sont présentes
-    essential = ["target_planet", "is_tess"]
+    essential = ["target_planet", "is_tess", "row_key"]
     for col in essential:
         if col not in common_cols:
             common_cols.append(col)
@@ -142,7 +207,7 @@ def prepare_dataset(df):
     drop_cols = [
         "target_planet",
         "kepid", "kepoi_name", "kepler_name", "koi_disposition",
-        "index", "target_label", "mission", "tid", "toi"
+        "index", "target_label", "mission", "tid", "toi", "row_key"
     ]
     
     # Ne garder que les colonnes numériques
@@ -165,18 +230,76 @@ def prepare_dataset(df):
 # MAIN PIPELINE
 # ============================================================================
 
-def run_training():
+def row_fingerprints(df):
+    """Empreinte (uint64) de chaque ligne brute, avant imputation (indépendante des types compacts)."""
+    return row_hashes(df, sorted(c for c in df.columns if c != "row_key"))
+
+
+def save_training_rows(keys, hashes, splits):
+    """Mémorise les lignes vues par le modèle (clé, empreinte, train/test)."""
+    rows = pd.DataFrame({"row_key": np.asarray(keys, dtype=str),
+                         "row_hash": np.asarray(hashes, dtype=np.uint64).view(np.int64),
+                         "split": np.asarray(splits, dtype=str)})
+    tmp = ROWS_PATH.with_suffix(".tmp")
+    rows.to_parquet(tmp, index=False)
+    os.replace(tmp, ROWS_PATH)
+
+
+def feature_importance_table(model, features_list):
+    """DataFrame (name, importance) trié par importance décroissante."""
+    return pd.DataFrame({"name": features_list, "importance": model.feature_importances_})\
+             .sort_values(by="importance", ascending=False)
+
+
+def dataset_counts(X):
+    """Nombre de lignes Kepler / TESS du dataset."""
+    if "is_tess" not in X.columns:
+        return {"kepler": len(X), "tess": 0}
+    return {"kepler": int((X["is_tess"] == 0).sum()), "tess": int((X["is_tess"] == 1).sum())}
+
+
+def holdout_scores(model, X, y):
+    proba = model.predict_proba(X)[:, 1]
+    pred = (proba >= 0.5).astype(int)
+    return {
+        "accuracy": float(accuracy_score(y, pred)),
+        "auc_roc": float(roc_auc_score(y, proba)) if len(np.unique(y)) > 1 else float("nan"),
+        "logloss": float(log_loss(y, proba, labels=[0, 1])),
+    }
+
+
+class FeatureSetMismatch(RuntimeError):
+    """Le dataset ne produit plus les features du modèle en production."""
+
+
+def _feature_diff(features, expected):
+    added = [f for f in features if f not in set(expected)]
+    removed = [f for f in expected if f not in set(features)]
+    return f"ajoutées {added[:10]}, retirées {removed[:10]}"
+
+
+def run_training(with_lc_features=False, tune=False, n_trials=20, n_jobs=None,
+                 tuned_params=None, expected_features=None):
+    """
+    Entraînement complet. tuned_params : hyperparamètres repris d'un
+    entraînement précédent (ignorés avec tune). expected_features : features
+    du modèle remplacé ; s'il y en a et que le dataset n'en produit plus le
+    même ensemble, FeatureSetMismatch est levée avant toute sauvegarde.
+    """
+    t_start = time.perf_counter()
     log("=" * 70)
     log("  ENTRAÎNEMENT XGBOOST MULTI-MISSIONS (Kepler + TESS)")
     log("=" * 70)
     
     # 1. Charger et fusionner les datasets
-    df = load_and_merge_datasets()
+    df = load_and_merge_datasets(with_lc_features=with_lc_features)
     
     # 2. Feature Engineering avec Astropy
     df = add_astropy_features(df)
     
     # 3. Préparation
+    row_keys = df["row_key"].astype(str).to_numpy()
+    hashes = row_fingerprints(df)
     X, y = prepare_dataset(df)
     
     # Séparation train/test
@@ -185,18 +308,31 @@ def run_training():
     )
     
     features_list = list(X.columns)
+    if expected_features is not None and set(features_list) != set(expected_features):
+        raise FeatureSetMismatch("Features différentes du modèle en production ("
+                                 f"{_feature_diff(features_list, expected_features)}) : modèle conservé.")
     log(f"Features utilisées ({len(features_list)}) : {features_list[:10]}...")
     log(f"Test Set = {len(X_test)} échantillons")
 
     # 4. Modèle XGBoost (plus d'arbres pour le dataset multi-missions)
     pos_weight = (y_train == 0).sum() / max(1, y_train.sum())
+
+    params = dict(DEFAULT_PARAMS)
+    if tune:
+        from src.p08_tuning import run_search
+        tuned_params, _ = run_search(
+            X_train, y_train,
+            base_params={"scale_pos_weight": float(pos_weight), "seed": RANDOM_SEED},
+            n_trials=n_trials, n_jobs=n_jobs, random_state=RANDOM_SEED,
+            output_path=MODELS_DIR / "tuning_leaderboard.json", log=log,
+        )
+        log(f"Configuration retenue : {tuned_params}")
+    elif tuned_params:
+        log(f"Hyperparamètres repris de l'entraînement précédent : {tuned_params}")
+    params.update(tuned_params or {})
     
     model = XGBClassifier(
-        n_estimators=500,
-        max_depth=6,
-        learning_rate=0.05,
-        subsample=0.85,
-        colsample_bytree=0.85,
+        **params,
         scale_pos_weight=pos_weight, 
         eval_metric="logloss",
         random_state=RANDOM_SEED,
@@ -247,9 +383,7 @@ def run_training():
     log("\n" + classification_report(y_test, y_pred))
 
     # Feature Importances
-    imp = model.feature_importances_
-    imp_df = pd.DataFrame({"name": features_list, "importance": imp})\
-             .sort_values(by="importance", ascending=False)
+    imp_df = feature_importance_table(model, features_list)
     log(f"Top 10 Features :\n{imp_df.head(10).to_string(index=False)}")
 
     # 8. Sauvegarde
@@ -260,6 +394,7 @@ def run_training():
         json.dump(features_list, f, indent=4)
         
     metrics = {
+        "test_accuracy": float(acc),
         "test_precision": float(prec),
         "test_recall": float(rec),
         "test_f1": float(f1),
@@ -268,16 +403,25 @@ def run_training():
         "cv_accuracy_std": float(cv_acc_std),
         "cv_f1_mean": float(cv_f1_mean),
         "cv_f1_std": float(cv_f1_std),
+        "cv_available": True,
         "n_features_selected": len(features_list),
         "n_features_total": len(features_list),
         "train_size": len(X_train),
         "test_size": len(X_test),
         "confusion_matrix": cm,
+        "threshold_curves": threshold_curves(y_test, y_proba),
         "top_features": imp_df.head(20).to_dict('records'),
-        "datasets": {
-            "kepler": int((X_train["is_tess"] == 0).sum() + (X_test["is_tess"] == 0).sum()) if "is_tess" in X.columns else len(X),
-            "tess": int((X_train["is_tess"] == 1).sum() + (X_test["is_tess"] == 1).sum()) if "is_tess" in X.columns else 0,
-        }
+        "tuned_params": tuned_params,
+        "datasets": dataset_counts(X),
+    }
+    splits = np.where(X.index.isin(X_test.index), "test", "train")
+    save_training_rows(row_keys, hashes, splits)
+    metrics["training"] = {
+        "mode": "full",
+        "trained_at": time.strftime("%Y-%m-%d %H:%M"),
+        "seconds": time.perf_counter() - t_start,
+        "full_train_seconds": time.perf_counter() - t_start,
+        "with_lc_features": with_lc_features,
     }
     with open(METRICS_PATH, "w", encoding="utf-8") as f:
         json.dump(metrics, f, indent=4)
@@ -288,6 +432,195 @@ def run_training():
     log("=== Entraînement Multi-Missions terminé avec succès ===")
 
 
+def run_incremental_training(with_lc_features=None, extra_rounds=INCREMENTAL_ROUNDS,
+                             tolerance=INCREMENTAL_TOLERANCE, replay=INCREMENTAL_REPLAY):
+    """
+    Continue le boosting de models/exoplanet_model.json sur les lignes
+    nouvelles ou modifiées depuis le dernier entraînement.
+
+    Les lignes déjà en holdout y restent, 20 % des nouvelles y sont ajoutées.
+    `replay` × (lignes nouvelles) lignes d'entraînement inchangées, tirées au
+    hasard, accompagnent le delta.
+    Le nouveau modèle n'est sauvegardé que si sa précision et son AUC sur ce
+    holdout ne perdent pas plus de `tolerance` par rapport au modèle courant.
+    with_lc_features : par défaut, celui du dernier entraînement (models/
+    model_metrics.json) ; le dataset doit produire les mêmes features que le
+    modèle courant, sinon FeatureSetMismatch (le modèle n'est pas remplacé).
+    Retourne un résumé (lignes, scores, temps gagné vs réentraînement complet).
+    """
+    t_start = time.perf_counter()
+    log("=" * 70)
+    log("  ENTRAÎNEMENT INCRÉMENTAL (continuation du modèle existant)")
+    log("=" * 70)
+
+    prev_metrics, prev_features = {}, None
+    if METRICS_PATH.exists():
+        with open(METRICS_PATH, encoding="utf-8") as f:
+            prev_metrics = json.load(f)
+    if MODEL_PATH.exists() and FEATURES_PATH.exists():
+        with open(FEATURES_PATH, encoding="utf-8") as f:
+            prev_features = json.load(f)
+    if with_lc_features is None:
+        with_lc_features = bool((prev_metrics.get("training") or {}).get("with_lc_features", False))
+    tuned_params = prev_metrics.get("tuned_params") or None
+
+    if not (MODEL_PATH.exists() and ROWS_PATH.exists() and METRICS_PATH.exists()
+            and FEATURES_PATH.exists()):
+        log("[!] Pas d'entraînement de référence (modèle ou training_rows.parquet absent) : "
+            "entraînement complet.")
+        run_training(with_lc_features=with_lc_features, tuned_params=tuned_params,
+                     expected_features=prev_features)
+        return {"mode": "full"}
+
+    prev_rows = pd.read_parquet(ROWS_PATH).drop_duplicates("row_key", keep="last").set_index("row_key")
+
+    df = load_and_merge_datasets(with_lc_features=with_lc_features)
+    df = add_astropy_features(df)
+    row_keys = df["row_key"].astype(str).to_numpy()
+    hashes = row_fingerprints(df)
+    X, y = prepare_dataset(df)
+
+    if set(X.columns) != set(prev_features):
+        # Un entraînement complet changerait l'entrée du modèle servi sans
+        # comparaison possible sur le holdout : à lancer explicitement.
+        raise FeatureSetMismatch("Les features ont changé depuis le dernier entraînement ("
+                                 f"{_feature_diff(list(X.columns), prev_features)}, "
+                                 f"with_lc_features={with_lc_features}) : modèle conservé.")
+    X = X[prev_features]
+
+    # Diff avec les lignes du dernier entraînement (empreintes comparées en
+    # int64 : un reindex avec NaN les passerait en float64, donc arrondies)
+    is_new = ~pd.Index(row_keys).isin(prev_rows.index)
+    prev_hash = prev_rows["row_hash"].reindex(row_keys, fill_value=0).to_numpy(dtype=np.int64)
+    prev_split = prev_rows["split"].reindex(row_keys).to_numpy()
+    is_changed = ~is_new & (prev_hash != hashes.view(np.int64))
+    n_removed = int((~prev_rows.index.isin(row_keys)).sum())
+    log(f"Lignes : {int(is_new.sum())} nouvelles, {int(is_changed.sum())} modifiées, "
+        f"{n_removed} disparues, {int((~is_new & ~is_changed).sum())} inchangées")
+
+    summary = {"mode": "incremental", "n_new": int(is_new.sum()),
+               "n_changed": int(is_changed.sum()), "n_removed": n_removed}
+    if not is_new.any() and not is_changed.any():
+        log("Aucune ligne nouvelle ou modifiée : modèle inchangé.")
+        return {**summary, "accepted": False, "reason": "no_changes"}
+
+    # Holdout : anciennes lignes de test + 20 % des nouvelles
+    rng = np.random.default_rng(RANDOM_SEED)
+    splits = np.where(is_new, np.where(rng.random(len(X)) < 0.20, "test", "train"), prev_split)
+    is_test = splits == "test"
+    delta = (is_new | is_changed) & ~is_test
+    unchanged_train = np.flatnonzero(~delta & ~is_test)
+    n_replay = min(len(unchanged_train), replay * int(delta.sum()))
+    replayed = np.zeros(len(X), dtype=bool)
+    replayed[rng.choice(unchanged_train, size=n_replay, replace=False)] = True
+    X_test, y_test = X[is_test], y[is_test]
+    X_delta, y_delta = X[delta | replayed], y[delta | replayed]
+    log(f"Continuation sur {int(delta.sum())} lignes (+{n_replay} rejouées), "
+        f"holdout de {len(X_test)} lignes")
+
+    prev_model = XGBClassifier()
+    prev_model.load_model(str(MODEL_PATH))
+    prev_scores = holdout_scores(prev_model, X_test, y_test)
+
+    params = {**DEFAULT_PARAMS, **(tuned_params or {})}
+    params["n_estimators"] = extra_rounds
+    pos_weight = (y[~is_test] == 0).sum() / max(1, y[~is_test].sum())
+    model = XGBClassifier(**params, scale_pos_weight=pos_weight, eval_metric="logloss",
+                          random_state=RANDOM_SEED, n_jobs=-1)
+    if delta.any():
+        model.fit(X_delta, y_delta, xgb_model=prev_model.get_booster())
+    else:
+        model = prev_model  # seules des lignes de holdout ont changé
+    new_scores = holdout_scores(model, X_test, y_test)
+
+    log(f"Holdout précédent : acc {prev_scores['accuracy']:.4f} | AUC {prev_scores['auc_roc']:.4f} "
+        f"| logloss {prev_scores['logloss']:.4f}")
+    log(f"Holdout nouveau   : acc {new_scores['accuracy']:.4f} | AUC {new_scores['auc_roc']:.4f} "
+        f"| logloss {new_scores['logloss']:.4f}")
+    accepted = (new_scores["accuracy"] >= prev_scores["accuracy"] - tolerance
+                and new_scores["auc_roc"] >= prev_scores["auc_roc"] - tolerance)
+
+    elapsed = time.perf_counter() - t_start
+    full_seconds = (prev_metrics.get("training") or {}).get("full_train_seconds")
+    summary.update({
+        "accepted": bool(accepted),
+        "holdout_size": int(is_test.sum()),
+        "train_rows": int(delta.sum()),
+        "replay_rows": n_replay,
+        "previous": prev_scores,
+        "new": new_scores,
+        "seconds": elapsed,
+        "full_train_seconds": full_seconds,
+        "saved_seconds": full_seconds - elapsed if full_seconds else None,
+    })
+    if full_seconds:
+        log(f"Durée : {elapsed:.1f} s contre {full_seconds:.1f} s pour un entraînement complet "
+            f"({full_seconds - elapsed:.1f} s gagnées)")
+
+    if not accepted:
+        log("[!] Le nouveau modèle dégrade le holdout : modèle précédent conservé.")
+        return summary
+
+    model.save_model(str(MODEL_PATH))
+    save_training_rows(row_keys, hashes, splits)
+
+    # Les métriques de validation croisée ne sont pas recalculées (5
+    # entraînements complets) : retirées plutôt que laissées périmées.
+    y_pred = model.predict(X_test)
+    metrics = {k: v for k, v in prev_metrics.items() if not k.startswith("cv_")}
+    metrics.update({
+        "cv_available": False,
+        "test_accuracy": new_scores["accuracy"],
+        "test_precision": float(precision_score(y_test, y_pred, zero_division=0)),
+        "test_recall": float(recall_score(y_test, y_pred, zero_division=0)),
+        "test_f1": float(f1_score(y_test, y_pred, zero_division=0)),
+        "test_auc_roc": new_scores["auc_roc"],
+        "train_size": int((~is_test).sum()),
+        "test_size": int(is_test.sum()),
+        "confusion_matrix": confusion_matrix(y_test, y_pred).tolist(),
+        "threshold_curves": threshold_curves(y_test, model.predict_proba(X_test)[:, 1]),
+        "top_features": feature_importance_table(model, prev_features).head(20).to_dict('records'),
+        "datasets": dataset_counts(X),
+        "training": {
+            "mode": "incremental",
+            "trained_at": time.strftime("%Y-%m-%d %H:%M"),
+            "seconds": elapsed,
+            "full_train_seconds": full_seconds,
+            "with_lc_features": with_lc_features,
+            **{k: summary[k] for k in ("n_new", "n_changed", "n_removed", "train_rows", "replay_rows",
+                                       "previous", "new", "saved_seconds")},
+        },
+    })
+    with open(METRICS_PATH, "w", encoding="utf-8") as f:
+        json.dump(metrics, f, indent=4)
+    log(f"Modèle mis à jour : {MODEL_PATH}")
+    return summary
+
+
 if __name__ == "__main__":
-    run_training()
+    parser = argparse.ArgumentParser(description="Entraînement XGBoost Kepler + TESS")
+    parser.add_argument("--with-lc-features", action="store_true", default=None,
+                        help="Ajoute les features sci_*/bls_* lues depuis le feature store "
+                             "(--incremental : par défaut, comme le dernier entraînement)")
+    parser.add_argument("--tune", action="store_true",
+                        help="Recherche d'hyperparamètres XGBoost (leaderboard dans models/tuning_leaderboard.json)")
+    parser.add_argument("--trials", type=int, default=20, help="Nombre de candidats (--tune)")
+    parser.add_argument("--jobs", type=int, default=None,
+                        help="Essais en parallèle (--tune, défaut : nb de CPU)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Continue le modèle existant sur les lignes nouvelles ou modifiées")
+    parser.add_argument("--extra-rounds", type=int, default=INCREMENTAL_ROUNDS,
+                        help="Arbres ajoutés en mode incrémental")
+    parser.add_argument("--summary", default=None,
+                        help="Fichier JSON où écrire le résumé du mode incrémental")
+    args = parser.parse_args()
+    if args.incremental:
+        summary = run_incremental_training(with_lc_features=args.with_lc_features,
+                                           extra_rounds=args.extra_rounds)
+        if args.summary:
+            with open(args.summary, "w", encoding="utf-8") as f:
+                json.dump(summary, f, indent=2)
+    else:
+        run_training(with_lc_features=bool(args.with_lc_features), tune=args.tune,
+                     n_trials=args.trials, n_jobs=args.jobs)
 
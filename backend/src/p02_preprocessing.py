@@ -3,6 +3,25 @@ import matplotlib.pyplot as plt
 import lightkurve as lk
 import time
 
+from src.p07_flux_stats import FluxSummary
+
+
+# Paramètres du prétraitement et du BLS. Ils servent aussi de clé au feature
+# store (src/p06_feature_store.py) : toute modification invalide les features
+# déjà calculées.
+PREPROCESSING_PARAMS = {
+    "outlier_sigma": 7,
+    "time_bin_size": 0.05,
+    "flatten_window": 101,
+}
+
+BLS_PARAMS = {
+    "min_period": 0.5,
+    "max_period": 400,
+    "n_periods": 500,
+    "durations": [0.02, 0.05, 0.08, 0.12, 0.15],
+}
+
 
 def clean_only(lc):
     """Nettoyage SANS aplatissement — pour l'extraction de features.
@@ -11,7 +30,7 @@ def clean_only(lc):
     if lc is None:
         return None
 
-    lc = lc.remove_nans().remove_outliers(sigma=7)
+    lc = lc.remove_nans().remove_outliers(sigma=PREPROCESSING_PARAMS["outlier_sigma"])
 
     if len(lc) == 0:
         print("   [Preprocessing] Courbe vide après remove_nans/remove_outliers.")
@@ -19,7 +38,7 @@ def clean_only(lc):
 
     # Binning pour réduire à ~3000-5000 points
     try:
-        lc = lc.bin(time_bin_size=0.05)
+        lc = lc.bin(time_bin_size=PREPROCESSING_PARAMS["time_bin_size"])
     except Exception as e:
         print(f"   [Preprocessing] Erreur binning : {e} — on continue sans binning.")
 
@@ -37,7 +56,7 @@ def clean_and_flatten(lc, quality="auto"):
         return None
 
     # window_length doit être impair et < len(lc)
-    win = min(101, len(lc_clean) - 1)
+    win = min(PREPROCESSING_PARAMS["flatten_window"], len(lc_clean) - 1)
     if win % 2 == 0:
         win -= 1
     if win < 3:
@@ -62,10 +81,11 @@ def fold_lightcurve(lc_flat, period, t0=None):
     return lc_flat.fold(period=period, epoch_time=t0)
 
 
-def get_period_hint(lc_flat, progress_cb=None):
+def get_period_hint(lc_flat, progress_cb=None, flux_summary=None):
     """
     Trouve une période probable via BLS (Box Least Squares).
     Retourne (period, bls_stats) où bls_stats contient power, depth, snr, duration.
+    flux_summary : FluxSummary partagé de lc_flat, réutilisé pour la médiane du flux.
     """
     if lc_flat is None:
         return 1.0, {}
@@ -85,11 +105,11 @@ def get_period_hint(lc_flat, progress_cb=None):
         return 1.0, {}
 
     time_span = t[-1] - t[0]
-    max_period = min(time_span / 2, 400)
-    min_period = 0.5
+    max_period = min(time_span / 2, BLS_PARAMS["max_period"])
+    min_period = BLS_PARAMS["min_period"]
 
-    periods = np.linspace(min_period, max_period, 500)
-    durations = np.array([0.02, 0.05, 0.08, 0.12, 0.15])
+    periods = np.linspace(min_period, max_period, BLS_PARAMS["n_periods"])
+    durations = np.array(BLS_PARAMS["durations"])
 
     report(f"BLS rapide : {len(periods)} periodes x {len(durations)} durations...")
     t_start = time.time()
@@ -105,11 +125,13 @@ def get_period_hint(lc_flat, progress_cb=None):
 
         # SNR du BLS : (best_power - median_power) / std_power
         powers = np.array(result.power)
-        powers_clean = powers[np.isfinite(powers)]
-        bls_snr = (best_power - np.median(powers_clean)) / (np.std(powers_clean) + 1e-10)
+        power_summary = FluxSummary(powers[np.isfinite(powers)])
+        bls_snr = (best_power - power_summary.median()) / (power_summary.std + 1e-10)
 
-        # Transit depth en ppm
-        median_flux = np.median(f)
+        # Transit depth en ppm (résumé partagé si calculé sur les mêmes points)
+        if flux_summary is None or flux_summary.count != len(f):
+            flux_summary = FluxSummary(f)
+        median_flux = flux_summary.median()
         depth_ppm = best_depth / median_flux * 1e6 if median_flux > 0 else 0
 
         # Fraction du transit (durée / période)
@@ -11,7 +11,11 @@ Les features manquantes sont mises à 0 (robuste aux différences de longueur).
 
 import pandas as pd
 import numpy as np
-from scipy import stats
+
+from src.p07_flux_stats import (
+    DEFAULT_CHUNK_SIZE, FluxSummary, LowRunStats, iter_chunks,
+    stream_flux_stats,
+)
 
 try:
     from tsfresh import extract_features
@@ -27,41 +31,59 @@ except ImportError:
 # Features scientifiques (fallback + complément)
 # =============================================================================
 
-def extract_scientific_features(lc_flat):
-    """Features statistiques manuelles pour la détection de transits."""
-    flux = np.array(lc_flat.flux.value, dtype=float)
-    flux = flux[~np.isnan(flux)]
-
-    if len(flux) < 50:
-        return {}
-
-    median_flux = np.median(flux)
-    std_flux = np.std(flux)
+def _summary_features(st):
+    """
+    Features sci_* tirées d'un résumé statistique : FluxSummary (exact) ou
+    StreamingFluxStats (sketch), qui partagent la même interface.
+    """
+    median_flux = st.median()
+    std_flux = st.std
+    p1 = st.percentile(1)
 
-    feats = {
+    return {
         'sci_std_dev': std_flux,
-        'sci_skewness': float(stats.skew(flux)),
-        'sci_kurtosis': float(stats.kurtosis(flux)),
-        'sci_mad': np.median(np.abs(flux - median_flux)),
-        'sci_amplitude': np.ptp(flux),
-        'sci_transit_depth_p1': median_flux - np.percentile(flux, 1),
-        'sci_transit_depth_p5': median_flux - np.percentile(flux, 5),
-        'sci_transit_depth_min': median_flux - np.min(flux),
-        'sci_rms': np.sqrt(np.mean(flux**2)),
-        'sci_iqr': np.percentile(flux, 75) - np.percentile(flux, 25),
+        'sci_skewness': st.skewness,
+        'sci_kurtosis': st.kurtosis,
+        'sci_mad': st.mad(),
+        'sci_amplitude': st.ptp,
+        'sci_transit_depth_p1': median_flux - p1,
+        'sci_transit_depth_p5': median_flux - st.percentile(5),
+        'sci_transit_depth_min': median_flux - st.min,
+        'sci_rms': st.rms,
+        'sci_iqr': st.percentile(75) - st.percentile(25),
         'sci_cv': std_flux / abs(median_flux) if median_flux != 0 else 0,
-        'sci_max_sigma': abs(np.min(flux) - median_flux) / std_flux if std_flux > 0 else 0,
-        'sci_snr_approx': (median_flux - np.percentile(flux, 1)) / std_flux if std_flux > 0 else 0,
+        'sci_max_sigma': abs(st.min - median_flux) / std_flux if std_flux > 0 else 0,
+        'sci_snr_approx': (median_flux - p1) / std_flux if std_flux > 0 else 0,
     }
 
-    # Transit fraction
+
+def extract_scientific_features(lc_flat, flux_summary=None):
+    """
+    Features statistiques manuelles pour la détection de transits.
+    lc_flat : LightCurve, ou source de flux memmap / callable de blocs
+    (voir p07_flux_stats.iter_chunks) traitée en mémoire bornée.
+    flux_summary : FluxSummary déjà calculé sur lc_flat (partagé avec le BLS
+    et la caractérisation pour ne trier le flux qu'une fois).
+    """
+    if flux_summary is None:
+        if not hasattr(lc_flat, "flux"):
+            return extract_scientific_features_streaming(lc_flat)
+        flux_summary = FluxSummary(lc_flat)
+
+    st = flux_summary
+    if st.count < 50:
+        return {}
+
+    feats = _summary_features(st)
+
+    # Transit fraction (comptages par recherche dichotomique sur le flux trié)
+    median_flux = st.median()
     threshold = median_flux - 3 * feats['sci_mad']
-    below = flux[flux < median_flux]
-    above = flux[flux >= median_flux]
-    feats['sci_below_above_ratio'] = len(below) / max(len(above), 1)
-    feats['sci_transit_fraction'] = np.sum(flux < threshold) / len(flux)
+    n_below = st.count_below(median_flux)
+    feats['sci_below_above_ratio'] = n_below / max(st.count - n_below, 1)
+    feats['sci_transit_fraction'] = st.count_below(threshold) / st.count
 
-    low_points = np.where(flux < threshold)[0]
+    low_points = np.flatnonzero(st.values < threshold)
     if len(low_points) > 1:
         gaps = np.diff(low_points)
         feats['sci_low_cluster_mean_gap'] = np.mean(gaps)
@@ -73,22 +95,56 @@ def extract_scientific_features(lc_flat):
     return feats
 
 
+def extract_scientific_features_streaming(source, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Mêmes features sci_* que extract_scientific_features, calculées en deux
+    passes à mémoire bornée (quantiles et MAD approchés par sketch).
+    """
+    st = stream_flux_stats(source, chunk_size)
+    if st.count < 50:
+        return {}
+
+    feats = _summary_features(st)
+
+    # Seconde passe : comptages exacts et écarts entre points bas
+    median_flux = st.median()
+    low = LowRunStats(threshold=median_flux - 3 * feats['sci_mad'], split=median_flux)
+    for chunk in iter_chunks(source, chunk_size):
+        low.update(chunk)
+    feats['sci_below_above_ratio'] = low.n_below_split / max(low.n_above_split, 1)
+    feats['sci_transit_fraction'] = low.n_below / low.n
+    feats['sci_low_cluster_mean_gap'] = low.gap_mean if low.n_below > 1 else 0
+    feats['sci_low_cluster_std_gap'] = low.gap_std if low.n_below > 1 else 0
+
+    return feats
+
+
 # =============================================================================
 # Extraction principale (EfficientFCParameters)
 # =============================================================================
 
-def run_feature_extraction(lc_flat, target_id, bls_stats=None):
+def run_feature_extraction(lc_flat, target_id, bls_stats=None, flux_summary=None):
     """
     Extrait les features sci_* + BLS pour le modèle 09_bls_enhanced_train.
     bls_stats : dict retourné par get_period_hint() (optionnel, déjà calculé dans app.py)
+    flux_summary : FluxSummary partagé de lc_flat (optionnel)
     """
     if lc_flat is None:
         return None
 
-    sci_feats = extract_scientific_features(lc_flat)
+    sci_feats = extract_scientific_features(lc_flat, flux_summary=flux_summary)
     if not sci_feats:
         return None
 
+    return build_features_frame(sci_feats, target_id, bls_stats)
+
+
+def build_features_frame(sci_feats, target_id, bls_stats=None):
+    """
+    Assemble la ligne de features (sci_* + BLS) telle que retournée par
+    run_feature_extraction. Réutilisée par le feature store pour reconstruire
+    une ligne persistée sans recalcul.
+    """
     df = pd.DataFrame([sci_feats])
     df['target_id'] = target_id
 
@@ -1,37 +1,581 @@
 import pandas as pd
+import numpy as np
 import os
-from src.p02_preprocessing import clean_and_flatten
+import json
+import re
+import glob
+import hashlib
+import inspect
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from src import p02_preprocessing
+from src.p02_preprocessing import (clean_and_flatten, get_period_hint, compute_transit_score,
+                                   PREPROCESSING_PARAMS, BLS_PARAMS)
 from src.p04_features import run_feature_extraction
 
+_SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+_CACHE_DIR = os.path.join(os.path.dirname(__file__), "..", "data", "cache", "lightkurve_training")
 
-def build_final_csv(lc_list, labels, output_path="data/processed/training_dataset.csv"):
+CHECKPOINT_NAME = "_completed_ids.txt"
+SCHEMA_NAME = "_schema.json"
+STAGING_PIPELINE_NAME = "_pipeline.txt"
+
+# Partitionnement du dataset final (répertoires Hive : mission=Kepler/target_label=1/)
+PARTITION_COLS = ("mission", "target_label")
+ROW_GROUP_SIZE = 4096
+
+# Une colonne passe en float32 si l'erreur d'arrondi reste négligeable devant
+# sa dispersion (les features proches de 1.0 comme sci_rms restent en float64).
+FLOAT32_MAX_ERR_STD = 1e-4
+
+
+def iter_cached_lightcurves(cache_dir=_CACHE_DIR):
     """
-    Prend des courbes, les nettoie, extrait les features et sauve en CSV.
-    lc_list: Liste d'objets LightCurve (reels ou augmentes).
-    labels: Liste des etiquettes (0 pour non-planete, 1 pour planete).
+    Générateur (sample_id, LightCurve, label) sur le cache JSON local.
+    Les fichiers sont lus un par un : le cache n'est jamais entièrement en mémoire.
     """
-    all_rows = []
+    import lightkurve as lk
 
-    for i, (lc, label) in enumerate(zip(lc_list, labels)):
-        # 1. Toujours pretraiter
-        lc_clean = clean_and_flatten(lc)
-        if lc_clean is None:
+    for path in sorted(glob.glob(os.path.join(cache_dir, "star_*.json"))):
+        try:
+            with open(path) as f:
+                d = json.load(f)
+        except Exception as e:
+            print(f"   [Dataset] Lecture impossible {os.path.basename(path)} : {e}")
+            continue
+        if d.get("status") != "ok":
             continue
+        lc = lk.LightCurve(time=np.array(d["time"], dtype=float),
+                           flux=np.array(d["flux"], dtype=float))
+        yield f"KIC {d['kepid']}", lc, d.get("label", 0)
+
+
+SCALARS_INDEX_NAME = "_scalars.parquet"
+
+# Paire "clé": valeur scalaire de premier niveau ; les éléments des tableaux
+# flux/time n'ont pas de clé et ne sont donc jamais convertis en objets Python.
+_SCALAR_RE = re.compile(
+    rb'"(\w+)"\s*:\s*("(?:[^"\\]|\\.)*"|-?(?:\d+\.?\d*(?:[eE][+-]?\d+)?|Infinity)|NaN|null|true|false)'
+)
+
+
+def _read_star_scalars(path):
+    with open(path, "rb") as f:
+        raw = f.read()
+    return {m.group(1).decode(): json.loads(m.group(2)) for m in _SCALAR_RE.finditer(raw)}
+
+
+def read_cache_scalars(cache_dir=_CACHE_DIR):
+    """
+    Table des scalaires (kepid, label, status, n_points, bls_*, period) de
+    chaque star_*.json du cache, sans désérialiser les tableaux flux/time.
+
+    Un index <cache_dir>/_scalars.parquet mémorise les valeurs par fichier
+    (taille + date de modification) : seuls les fichiers nouveaux ou modifiés
+    sont relus. Les lignes sont triées par nom de fichier.
+    """
+    files = [(e.name, e.stat().st_mtime_ns, e.stat().st_size)
+             for e in os.scandir(cache_dir)
+             if e.name.startswith("star_") and e.name.endswith(".json")]
+    listing = pd.DataFrame(files, columns=["file", "mtime_ns", "size"]).sort_values("file")
+
+    index_path = os.path.join(cache_dir, SCALARS_INDEX_NAME)
+    index = pd.DataFrame({"file": pd.Series(dtype=object), "mtime_ns": pd.Series(dtype="int64"),
+                          "size": pd.Series(dtype="int64")})
+    if os.path.exists(index_path):
+        try:
+            index = pd.read_parquet(index_path)
+        except Exception as e:
+            print(f"   [Dataset] Index des scalaires illisible, reconstruction : {e}")
+
+    known = listing.merge(index, on=["file", "mtime_ns", "size"], how="inner")
+    stale = listing[~listing["file"].isin(known["file"])]
+    if len(stale) or len(known) != len(index):
+        fresh = []
+        for name, mtime_ns, size in stale.itertuples(index=False):
+            try:
+                row = _read_star_scalars(os.path.join(cache_dir, name))
+            except OSError as e:
+                print(f"   [Dataset] Lecture impossible {name} : {e}")
+                continue
+            row.update(file=name, mtime_ns=mtime_ns, size=size)
+            fresh.append(row)
+        frames = [df for df in (known, pd.DataFrame(fresh)) if not df.empty]
+        known = pd.concat(frames, ignore_index=True) if frames else index.iloc[:0]
+        tmp = index_path + ".tmp"
+        known.to_parquet(tmp, index=False)
+        os.replace(tmp, index_path)
+
+    return known.sort_values("file", kind="stable").reset_index(drop=True)
+
+
+def _normalize_samples(samples):
+    """
+    Accepte des tuples (lc, label), (sample_id, lc, label) ou
+    (sample_id, lc, label, extra) — extra : colonnes ajoutées à la ligne.
+    """
+    for i, item in enumerate(samples):
+        if len(item) == 2:
+            lc, label = item
+            yield f"sample_{i}", lc, label
+        else:
+            yield item
+
+
+def _infer_mission(sample_id):
+    sid = str(sample_id).upper()
+    if sid.startswith(("TIC", "TOI")):
+        return "TESS"
+    if sid.startswith(("KIC", "KEPLER", "KOI")):
+        return "Kepler"
+    return "unknown"
+
+
+def _process_sample(sample_id, lc, label, extra=None):
+    """Worker : prétraitement + BLS + features d'un échantillon (ligne dict ou None)."""
+    lc_clean = clean_and_flatten(lc)
+    if lc_clean is None:
+        return sample_id, None
+    period, bls_stats = get_period_hint(lc_clean)
+    row = run_feature_extraction(lc_clean, sample_id, bls_stats=bls_stats)
+    if row is None:
+        return sample_id, None
+    row['period'] = float(period)
+    row['bls_score'] = compute_transit_score(bls_stats)
+    row['mission'] = _infer_mission(sample_id)
+    row['target_label'] = label
+    row = row.iloc[0].to_dict()
+    if extra:
+        row.update(extra)
+    return sample_id, row
+
 
-        # 2. Extraire les caracteristiques via TSFRESH + scientifiques
-        target_id = f"sample_{i}"
-        row = run_feature_extraction(lc_clean, target_id)
+def _process_sample_safe(sample_id, lc, label, extra=None):
+    """_process_sample ; une courbe qui lève est journalisée et comptée comme échec."""
+    try:
+        return _process_sample(sample_id, lc, label, extra)
+    except Exception as e:
+        print(f"   [Dataset] Echantillon {sample_id} ignore : {type(e).__name__}: {e}")
+        return sample_id, None
+
+
+# Étapes du pipeline : code (fichiers ou fonctions) et paramètres dont dépend
+# leur sortie. Toute modification change l'empreinte de l'étape.
+PIPELINE_STAGES = {
+    "preprocessing": ((p02_preprocessing.clean_only, clean_and_flatten), PREPROCESSING_PARAMS),
+    "bls":           ((get_period_hint, compute_transit_score, "p07_flux_stats.py"), BLS_PARAMS),
+    "features":      (("p04_features.py", "p07_flux_stats.py"), {}),
+    "assembly":      ((_process_sample, _infer_mission), {}),
+}
+
+
+def _source_bytes(item):
+    if callable(item):
+        return inspect.getsource(item).encode()
+    with open(os.path.join(_SRC_DIR, item), "rb") as f:
+        return f.read()
+
+
+def stage_fingerprints():
+    """Empreinte courte {étape: hash(code + paramètres)} de chaque étape du pipeline."""
+    fingerprints = {}
+    for stage, (sources, params) in PIPELINE_STAGES.items():
+        h = hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode())
+        for item in sources:
+            h.update(_source_bytes(item))
+        fingerprints[stage] = h.hexdigest()[:12]
+    return fingerprints
+
+
+def pipeline_fingerprint(stages=None):
+    stages = stages or stage_fingerprints()
+    return hashlib.sha1(json.dumps(stages, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def fingerprint_lightcurve(lc):
+    """Empreinte du contenu (temps + flux) d'une courbe de lumière."""
+    h = hashlib.sha1()
+    for values in (lc.time, lc.flux):
+        values = getattr(values, "value", values)
+        h.update(np.ascontiguousarray(values, dtype=np.float64).tobytes())
+    return h.hexdigest()[:16]
+
+
+def _load_checkpoint(output_dir):
+    path = os.path.join(output_dir, CHECKPOINT_NAME)
+    if not os.path.exists(path):
+        return set()
+    with open(path) as f:
+        return {line.strip() for line in f if line.strip()}
+
+
+def _flush_chunk(output_dir, rows, done_ids, part_idx):
+    """
+    Écrit un chunk Parquet (publication atomique) puis marque ses échantillons
+    comme terminés : un crash entre les deux ne fait que recalculer le chunk.
+    """
+    if rows:
+        name = f"part-{part_idx:05d}.parquet"
+        tmp = os.path.join(output_dir, f".{name}.tmp")
+        pd.DataFrame(rows).to_parquet(tmp, index=False)
+        os.replace(tmp, os.path.join(output_dir, name))
+    with open(os.path.join(output_dir, CHECKPOINT_NAME), "a") as f:
+        for sid in done_ids:
+            f.write(f"{sid}\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def build_dataset(samples, output_dir="data/processed/training_dataset", n_workers=None,
+                  chunk_size=256, resume=True):
+    """
+    Construit le dataset de features en parallèle, par chunks Parquet, avec reprise.
+
+    samples : itérable (ou générateur) de (lc, label) ou (sample_id, lc, label).
+    Les échantillons déjà présents dans le checkpoint sont sautés ; au plus
+    2 × n_workers courbes sont en vol à la fois. Un échantillon qui lève une
+    exception est journalisé et compté comme échec (sans ligne), comme une
+    courbe rejetée par le prétraitement.
+    Retourne le nombre d'échantillons traités lors de cet appel.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    if not resume:
+        for path in glob.glob(os.path.join(output_dir, "part-*.parquet")):
+            os.remove(path)
+        if os.path.exists(os.path.join(output_dir, CHECKPOINT_NAME)):
+            os.remove(os.path.join(output_dir, CHECKPOINT_NAME))
+
+    completed = _load_checkpoint(output_dir)
+    if completed:
+        print(f"Reprise : {len(completed)} echantillons deja traites.")
+    part_idx = len(glob.glob(os.path.join(output_dir, "part-*.parquet")))
+    n_workers = n_workers or os.cpu_count() or 1
+
+    pending = (s for s in _normalize_samples(samples) if s[0] not in completed)
+    rows, done_ids = [], []
+    n_processed = 0
+
+    def collect(sample_id, row):
+        nonlocal part_idx, rows, done_ids, n_processed
+        n_processed += 1
+        done_ids.append(sample_id)
         if row is not None:
-            row['target_label'] = label
-            all_rows.append(row)
+            rows.append(row)
+        if len(done_ids) >= chunk_size:
+            _flush_chunk(output_dir, rows, done_ids, part_idx)
+            if rows:
+                part_idx += 1
+            rows, done_ids = [], []
+
+    if n_workers == 1:
+        for sample in pending:
+            collect(*_process_sample_safe(*sample))
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            in_flight = set()
+            for sample in pending:
+                in_flight.add(pool.submit(_process_sample_safe, *sample))
+                if len(in_flight) >= 2 * n_workers:
+                    finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for fut in finished:
+                        collect(*fut.result())
+            for fut in wait(in_flight).done:
+                collect(*fut.result())
+
+    if done_ids:
+        _flush_chunk(output_dir, rows, done_ids, part_idx)
+
+    print(f"Dataset : {n_processed} echantillons traites dans {output_dir}")
+    return n_processed
+
+
+def load_dataset(output_dir="data/processed/training_dataset", columns=None):
+    """Relit tous les chunks Parquet d'un dataset construit par build_dataset."""
+    parts = sorted(glob.glob(os.path.join(output_dir, "part-*.parquet")))
+    if not parts:
+        return None
+    df = pd.concat([pd.read_parquet(p, columns=columns) for p in parts], ignore_index=True)
+    # Un crash entre l'écriture d'un chunk et son checkpoint peut le dupliquer
+    if "target_id" in df.columns:
+        df = df.drop_duplicates(subset=["target_id"], keep="last").reset_index(drop=True)
+    return df
+
+
+def _downcast(df):
+    """
+    Types compacts : entiers au plus petit type, float32 là où c'est sans
+    perte significative. Retourne (df, colonnes passées en float32).
+    """
+    df = df.copy()
+    float32_cols = []
+    for col in df.columns:
+        s = df[col]
+        if not pd.api.types.is_numeric_dtype(s) or pd.api.types.is_bool_dtype(s):
+            continue
+        values = s.to_numpy(dtype=float)
+        finite = np.isfinite(values)
+        if finite.all() and np.array_equal(values, np.round(values)):
+            df[col] = pd.to_numeric(s, downcast="integer")
+            continue
+        if not finite.any():
+            continue
+        v = values[finite]
+        err = np.abs(v.astype(np.float32).astype(float) - v).max()
+        std = v.std()
+        if np.abs(v).max() < np.finfo(np.float32).max and err <= FLOAT32_MAX_ERR_STD * std:
+            df[col] = s.astype(np.float32)
+            float32_cols.append(col)
+    return df, float32_cols
+
+
+def write_partitioned_dataset(df, output_dir, partition_cols=PARTITION_COLS,
+                              row_group_size=ROW_GROUP_SIZE, source=None, fingerprints=None):
+    """
+    Écrit le dataset en Parquet typé, partitionné par mission et label
+    (répertoires Hive), avec statistiques min/max par row group et un fichier
+    de schéma <output_dir>/_schema.json. Le remplacement est atomique.
+    fingerprints : empreintes du pipeline et des entrées (voir update_dataset),
+                   enregistrées dans le schéma.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    df = df.copy()
+    if "mission" in partition_cols and "mission" not in df.columns:
+        df["mission"] = df["target_id"].map(_infer_mission) if "target_id" in df.columns else "unknown"
+    df, float32_cols = _downcast(df)
+
+    tmp_dir = output_dir.rstrip("/") + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    partitions = []
+    for keys, group in df.groupby(list(partition_cols), sort=True, dropna=False):
+        keys = keys if isinstance(keys, tuple) else (keys,)
+        rel = os.path.join(*[f"{c}={k}" for c, k in zip(partition_cols, keys)])
+        os.makedirs(os.path.join(tmp_dir, rel))
+        table = pa.Table.from_pandas(group.drop(columns=list(partition_cols)), preserve_index=False)
+        pq.write_table(table, os.path.join(tmp_dir, rel, "part-0.parquet"),
+                       row_group_size=row_group_size, write_statistics=True,
+                       compression="zstd")
+        partitions.append({"path": rel, "n_rows": len(group)})
+
+    schema = {
+        "n_rows": len(df),
+        "columns": {c: str(t) for c, t in df.dtypes.items()},
+        "float32_columns": float32_cols,
+        "partition_cols": list(partition_cols),
+        "partitions": partitions,
+        "row_group_size": row_group_size,
+        "source": source,
+        "generated_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    if fingerprints is not None:
+        schema["fingerprints"] = fingerprints
+    with open(os.path.join(tmp_dir, SCHEMA_NAME), "w") as f:
+        json.dump(schema, f, indent=2)
+
+    old_dir = output_dir.rstrip("/") + ".old"
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.exists(output_dir):
+        os.replace(output_dir, old_dir)
+    os.replace(tmp_dir, output_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    print(f"Dataset partitionne : {len(df)} lignes, {len(partitions)} partitions dans {output_dir}")
+    return schema
+
+
+def load_partitioned_dataset(output_dir, columns=None, filters=None):
+    """
+    Lit un dataset écrit par write_partitioned_dataset en ne chargeant que les
+    colonnes demandées (fichiers mappés en mémoire).
+    filters : expression pyarrow.dataset ou liste de tuples
+              (ex. [("mission", "==", "Kepler")]) — les partitions et row groups
+              hors filtre ne sont pas lus.
+    """
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(output_dir, format="parquet", partitioning="hive",
+                         exclude_invalid_files=True)
+    if not dataset.files:
+        # Dataset vide : aucune partition, colonnes lues dans le schéma
+        schema_columns = list(read_dataset_schema(output_dir)["columns"])
+        return pd.DataFrame(columns=columns if columns is not None else schema_columns)
+    if isinstance(filters, list):
+        expr = None
+        for col, op, val in filters:
+            field = ds.field(col)
+            term = {"==": field == val, "!=": field != val, ">": field > val,
+                    ">=": field >= val, "<": field < val, "<=": field <= val}[op]
+            expr = term if expr is None else expr & term
+        filters = expr
+    table = dataset.to_table(columns=columns, filter=filters)
+    return table.to_pandas()
+
+
+def read_dataset_schema(output_dir):
+    with open(os.path.join(output_dir, SCHEMA_NAME)) as f:
+        return json.load(f)
+
+
+def build_training_dataset(samples, output_dir="data/processed/training_dataset", n_workers=None):
+    """
+    Pipeline complète : build_dataset (chunks + reprise) dans <output_dir>_staging/,
+    puis écriture du dataset partitionné final dans output_dir. Le staging
+    ne sert qu'à reprendre un appel interrompu avec les mêmes échantillons :
+    il est supprimé une fois le dataset écrit.
+    """
+    staging_dir = output_dir.rstrip("/") + "_staging"
+    build_dataset(samples, output_dir=staging_dir, n_workers=n_workers)
+    df = load_dataset(staging_dir)
+    if df is None or df.empty:
+        print("Aucun echantillon valide extrait.")
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        return None
+    write_partitioned_dataset(df, output_dir, source="build_training_dataset")
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    return df
+
+
+def update_dataset(samples, output_dir="data/processed/training_dataset", n_workers=None):
+    """
+    Reconstruction incrémentale du dataset partitionné.
+
+    Chaque courbe est identifiée par l'empreinte de son contenu, le pipeline
+    par celle de chaque étape (code + paramètres) ; les deux sont enregistrées
+    dans le schéma du dataset. Seules les courbes nouvelles ou modifiées (ou
+    toutes si une étape a changé) sont recalculées ; les autres lignes sont
+    reprises telles quelles et les échantillons disparus sont retirés.
+    Retourne {"reused", "recomputed", "failed", "removed"}.
+    """
+    stages = stage_fingerprints()
+    pipeline_fp = pipeline_fingerprint(stages)
+
+    previous = {}
+    if os.path.exists(os.path.join(output_dir, SCHEMA_NAME)):
+        previous = read_dataset_schema(output_dir).get("fingerprints") or {}
+    old_inputs = previous.get("inputs", {})
+    if previous and previous.get("pipeline") != pipeline_fp:
+        changed = sorted(k for k, v in stages.items() if previous.get("stages", {}).get(k) != v)
+        print(f"Pipeline modifie ({', '.join(changed)}) : toutes les lignes sont recalculees.")
+        old_inputs = {}
+
+    # Le staging n'est repris que s'il a été produit par le même pipeline
+    staging_dir = output_dir.rstrip("/") + "_staging"
+    marker = os.path.join(staging_dir, STAGING_PIPELINE_NAME)
+    staged_fp = open(marker).read().strip() if os.path.exists(marker) else None
+    if staged_fp != pipeline_fp:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+    os.makedirs(staging_dir, exist_ok=True)
+    with open(marker, "w") as f:
+        f.write(pipeline_fp)
+
+    inputs, labels, to_compute = {}, {}, set()
+
+    def pending():
+        for sample_id, lc, label, *_ in _normalize_samples(samples):
+            fp = fingerprint_lightcurve(lc)
+            inputs[sample_id] = fp
+            labels[sample_id] = label
+            if old_inputs.get(sample_id) != fp:
+                to_compute.add(sample_id)
+                yield sample_id, lc, label, {"_input_fp": fp}
+
+    build_dataset(pending(), output_dir=staging_dir, n_workers=n_workers)
+
+    # Lignes recalculées (un staging repris après crash peut contenir une
+    # version antérieure d'une courbe modifiée depuis : elle est écartée)
+    new_df = load_dataset(staging_dir)
+    stale = set()
+    if new_df is not None and not new_df.empty:
+        new_df = new_df[new_df["target_id"].isin(to_compute)]
+        fresh = new_df["target_id"].map(inputs) == new_df["_input_fp"]
+        stale = set(new_df.loc[~fresh, "target_id"])
+        new_df = new_df[fresh].drop(columns="_input_fp")
+    else:
+        new_df = pd.DataFrame()
+
+    # Lignes reprises : entrée inchangée, présente dans le dataset existant
+    reusable = [sid for sid in inputs if sid not in to_compute]
+    old_df = pd.DataFrame()
+    relabeled = 0
+    if reusable:
+        old_df = load_partitioned_dataset(output_dir)
+        old_df = old_df[old_df["target_id"].isin(reusable)].copy()
+        new_labels = old_df["target_id"].map(labels)
+        relabeled = int((new_labels != old_df["target_label"]).sum())
+        old_df["target_label"] = new_labels
+
+    report = {
+        "reused": len(old_df),
+        "recomputed": len(new_df),
+        "failed": len(to_compute) - len(new_df) - len(stale),
+        "removed": len(set(old_inputs) - set(inputs)),
+    }
+    print(f"Dataset : {report['reused']} lignes reutilisees, {report['recomputed']} recalculees, "
+          f"{report['failed']} echecs, {report['removed']} supprimees")
+    if stale:
+        print(f"   {len(stale)} courbes modifiees depuis un staging interrompu : recalculees au prochain passage.")
+
+    if not to_compute and not report["removed"] and not relabeled:
+        print("Dataset a jour.")
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        return report
+
+    frames = [d for d in (old_df, new_df) if not d.empty]
+    if frames:
+        df = pd.concat(frames, ignore_index=True)
+    else:
+        # Plus aucune ligne (échantillons retirés ou en échec) : le dataset
+        # est tout de même réécrit, sans quoi les lignes retirées resteraient
+        print("Aucun echantillon valide extrait.")
+        df = pd.DataFrame(columns=["target_id", *PARTITION_COLS])
+
+    # Les échecs restent enregistrés : ils ne sont retentés que si la courbe change
+    write_partitioned_dataset(df, output_dir,
+                              source="update_dataset", fingerprints={
+                                  "pipeline": pipeline_fp,
+                                  "stages": stages,
+                                  "inputs": {k: v for k, v in inputs.items() if k not in stale},
+                              })
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    return report
+
+
+def convert_csv_dataset(csv_path, output_dir=None):
+    """Migre un dataset CSV existant (ex. overnight_features.csv) au format partitionné."""
+    output_dir = output_dir or os.path.splitext(csv_path)[0]
+    df = pd.read_csv(csv_path)
+    if "target_label" not in df.columns:
+        df["target_label"] = -1
+    return write_partitioned_dataset(df, output_dir, source=os.path.basename(csv_path))
+
+
+def build_final_csv(lc_list, labels, output_path="data/processed/training_dataset.csv", n_workers=None):
+    """
+    Prend des courbes, les nettoie, extrait les features et sauve en CSV
+    (export texte ; préférer build_training_dataset pour l'entraînement).
+    lc_list: Liste (ou générateur) d'objets LightCurve (reels ou augmentes).
+    labels: Liste des etiquettes (0 pour non-planete, 1 pour planete).
+    Les chunks intermédiaires sont dans <output_path>_parts/ : ils permettent
+    de reprendre un appel interrompu (mêmes courbes, identifiées par leur
+    position sample_{i}) et sont supprimés une fois le CSV écrit.
+    Colonnes : features sci_* et bls_*, period, bls_score, mission, target_label.
+    """
+    parts_dir = os.path.splitext(output_path)[0] + "_parts"
+    build_dataset(zip(lc_list, labels), output_dir=parts_dir, n_workers=n_workers)
 
-    if not all_rows:
+    df = load_dataset(parts_dir)
+    if df is None or df.empty:
         print("Aucun echantillon valide extrait.")
+        shutil.rmtree(parts_dir, ignore_errors=True)
         return None
 
-    # 3. Creation du DataFrame et sauvegarde
-    df = pd.concat(all_rows, ignore_index=True)
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    df.to_csv(output_path, index=False)
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    tmp = f"{output_path}.tmp"
+    df.to_csv(tmp, index=False)
+    os.replace(tmp, output_path)
+    shutil.rmtree(parts_dir, ignore_errors=True)
     print(f"Dataset sauvegarde : {len(df)} echantillons dans {output_path}")
-    return df
\ No newline at end of file
+    return df
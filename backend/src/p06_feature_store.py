@@ -0,0 +1,287 @@
+"""
+=============================================================================
+P06 - Feature store persistant et versionné
+=============================================================================
+Persiste les sorties de run_feature_extraction (features sci_* + BLS) et les
+bls_stats de get_period_hint, par (cible, hash des paramètres de
+prétraitement, version du code des features), au format Parquet.
+
+Organisation sur disque :
+    data/feature_store/v=<code_version>/p=<params_hash>/part-*.parquet
+
+- La version du code est un hash du source de p02_preprocessing,
+  p04_features et p07_flux_stats : toute modification du code rend les anciennes partitions
+  invisibles (invalidation automatique), purge_stale() les supprime.
+- Lecture ponctuelle (serveur) : index mémoire {cible: ligne} chargé
+  paresseusement par partition. Chaque ligne garde l'empreinte du contenu
+  de la courbe (temps + flux) : une courbe re-téléchargée ou redétrendée,
+  même de longueur identique, n'est pas servie avec les anciennes features.
+- Lecture en masse (entraînement) : read_bulk() charge toute la partition
+  avec projection de colonnes.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from src.p02_preprocessing import PREPROCESSING_PARAMS, BLS_PARAMS, get_period_hint
+from src.p04_features import run_feature_extraction, build_features_frame
+from src.p05_dataset_manager import fingerprint_lightcurve
+
+_SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_STORE_DIR = os.path.join(_SRC_DIR, "..", "data", "feature_store")
+
+# À incrémenter si le format des lignes persistées change
+FEATURE_SCHEMA_VERSION = 2
+
+# Fichiers dont le code détermine la valeur des features
+_VERSIONED_SOURCES = ("p02_preprocessing.py", "p04_features.py", "p07_flux_stats.py")
+
+BLS_STAT_KEYS = (
+    "bls_power", "bls_snr", "bls_depth", "bls_depth_ppm",
+    "bls_duration_days", "bls_transit_fraction",
+)
+
+
+def compute_code_version():
+    """Hash court du code de prétraitement/features + version du schéma."""
+    h = hashlib.sha1(f"schema={FEATURE_SCHEMA_VERSION}".encode())
+    for name in _VERSIONED_SOURCES:
+        with open(os.path.join(_SRC_DIR, name), "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()[:12]
+
+
+def params_hash(params=None):
+    """Hash stable des paramètres de prétraitement et du BLS."""
+    if params is None:
+        params = {"preprocessing": PREPROCESSING_PARAMS, "bls": BLS_PARAMS}
+    payload = json.dumps(params, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()[:12]
+
+
+def normalize_target(target_id):
+    """Clé de cible insensible à la casse et aux espaces ('KIC 123' → 'kic 123')."""
+    return " ".join(str(target_id).strip().lower().split())
+
+
+class FeatureStore:
+    """Store Parquet des features par (cible, paramètres, version du code)."""
+
+    def __init__(self, root=DEFAULT_STORE_DIR, code_version=None, compact_every=64):
+        self.root = os.path.abspath(root)
+        self.code_version = code_version or compute_code_version()
+        self.compact_every = compact_every
+        self._rows = {}   # params_key -> {target: dict}
+        self._lock = threading.Lock()
+
+    # ── Organisation des partitions ─────────────────────────────────────────
+
+    def partition_dir(self, params_key=None):
+        params_key = params_key or params_hash()
+        return os.path.join(self.root, f"v={self.code_version}", f"p={params_key}")
+
+    def _part_files(self, params_key):
+        pdir = self.partition_dir(params_key)
+        if not os.path.isdir(pdir):
+            return []
+        return sorted(os.path.join(pdir, f) for f in os.listdir(pdir)
+                      if f.startswith("part-") and f.endswith(".parquet"))
+
+    def _read_partition(self, params_key, columns=None):
+        files = self._part_files(params_key)
+        if not files:
+            return pd.DataFrame()
+        frames = []
+        for path in files:
+            try:
+                frames.append(pd.read_parquet(path, columns=columns))
+            except Exception as e:
+                print(f"   [FeatureStore] Partition illisible ignorée {os.path.basename(path)} : {e}")
+        if not frames:
+            return pd.DataFrame()
+        df = pd.concat(frames, ignore_index=True)
+        # La dernière écriture l'emporte pour une même cible
+        if "target" in df.columns:
+            if "written_at" in df.columns:
+                df = df.sort_values("written_at", kind="stable")
+            df = df.drop_duplicates(subset=["target"], keep="last").reset_index(drop=True)
+        return df
+
+    def _index(self, params_key):
+        rows = self._rows.get(params_key)
+        if rows is None:
+            df = self._read_partition(params_key)
+            rows = {r["target"]: r for r in df.to_dict("records")} if not df.empty else {}
+            self._rows[params_key] = rows
+        return rows
+
+    def _write_part(self, params_key, df, prefix="part"):
+        pdir = self.partition_dir(params_key)
+        os.makedirs(pdir, exist_ok=True)
+        name = f"{prefix}-{time.time_ns()}-{uuid.uuid4().hex[:6]}.parquet"
+        tmp = os.path.join(pdir, f".{name}.tmp")
+        df.to_parquet(tmp, index=False)
+        path = os.path.join(pdir, name)
+        os.replace(tmp, path)  # publication atomique
+        return path
+
+    # ── Lecture / écriture ponctuelles (serveur) ────────────────────────────
+
+    def get(self, target_id, params_key=None, n_points=None, fingerprint=None):
+        """
+        Retourne {"period", "bls_stats", "features"} pour une cible, ou None.
+        n_points / fingerprint : si fournis, une ligne calculée sur une courbe
+        de taille ou de contenu différents (fingerprint_lightcurve) est
+        considérée périmée. features vaut None si la ligne n'en a pas.
+        """
+        params_key = params_key or params_hash()
+        with self._lock:
+            row = self._index(params_key).get(normalize_target(target_id))
+        if row is None:
+            return None
+        if n_points is not None and int(row.get("n_points") or -1) != int(n_points):
+            return None
+        if fingerprint is not None and row.get("fingerprint") != fingerprint:
+            return None
+
+        bls_stats = {k: float(row[k]) for k in BLS_STAT_KEYS
+                     if k in row and pd.notna(row[k])}
+        features = None
+        if row.get("has_features"):
+            sci = {k: v for k, v in row.items()
+                   if k.startswith("sci_") and pd.notna(v)}
+            features = build_features_frame(sci, target_id, bls_stats)
+        return {"period": float(row["period"]), "bls_stats": bls_stats, "features": features}
+
+    def put(self, target_id, period, bls_stats, features_df=None, params_key=None, n_points=None,
+            fingerprint=None):
+        """Persiste une ligne (écrase la précédente pour la même cible)."""
+        params_key = params_key or params_hash()
+        row = {
+            "target":       normalize_target(target_id),
+            "target_id":    str(target_id),
+            "period":       float(period),
+            "n_points":     int(n_points) if n_points is not None else -1,
+            "fingerprint":  fingerprint,
+            "has_features": features_df is not None and not features_df.empty,
+            "written_at":   time.time(),
+        }
+        for k in BLS_STAT_KEYS:
+            row[k] = float(bls_stats[k]) if bls_stats and k in bls_stats else np.nan
+        if row["has_features"]:
+            for col in features_df.columns:
+                if col.startswith("sci_"):
+                    row[col] = float(features_df[col].iloc[0])
+
+        with self._lock:
+            self._index(params_key)[row["target"]] = row
+            self._write_part(params_key, pd.DataFrame([row]))
+            if len(self._part_files(params_key)) > self.compact_every:
+                self._compact_locked(params_key)
+
+    # ── Lecture en masse (entraînement) ─────────────────────────────────────
+
+    def read_bulk(self, params_key=None, columns=None):
+        """
+        DataFrame de toute la partition courante (une ligne par cible).
+        columns : projection optionnelle (la colonne 'target' est toujours lue).
+        """
+        params_key = params_key or params_hash()
+        if columns is not None:
+            columns = list(dict.fromkeys(["target", "written_at"] + list(columns)))
+        with self._lock:
+            return self._read_partition(params_key, columns=columns)
+
+    # ── Maintenance ─────────────────────────────────────────────────────────
+
+    def compact(self, params_key=None):
+        """Fusionne les fichiers part-* d'une partition en un seul."""
+        with self._lock:
+            self._compact_locked(params_key or params_hash())
+
+    def _compact_locked(self, params_key):
+        old_files = self._part_files(params_key)
+        if len(old_files) <= 1:
+            return
+        df = self._read_partition(params_key)
+        self._write_part(params_key, df)
+        for path in old_files:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def purge_stale(self):
+        """Supprime les partitions produites par une autre version du code."""
+        if not os.path.isdir(self.root):
+            return 0
+        removed = 0
+        for name in os.listdir(self.root):
+            if name.startswith("v=") and name != f"v={self.code_version}":
+                shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+                removed += 1
+        return removed
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_default_store():
+    """Instance partagée du store (data/feature_store)."""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = FeatureStore()
+        return _default_store
+
+
+def get_or_compute_features(lc_flat, target_id, store=None, progress_cb=None, flux_summary=None,
+                            with_features=True):
+    """
+    Équivalent de get_period_hint (+ run_feature_extraction) avec persistance :
+    retourne (period, bls_stats, features_df) depuis le store si la cible y
+    est déjà (même version de code, mêmes paramètres, même courbe), sinon
+    calcule puis enregistre.
+    with_features : False si seuls period / bls_stats sont utiles (modèle
+                    BLS) ; run_feature_extraction n'est alors pas lancé et
+                    features_df vaut None (ou les features déjà stockées).
+    flux_summary : FluxSummary de lc_flat partagé par les deux calculs.
+    """
+    store = store or get_default_store()
+    n_points = len(lc_flat) if lc_flat is not None else None
+    fingerprint = fingerprint_lightcurve(lc_flat) if lc_flat is not None else None
+
+    try:
+        hit = store.get(target_id, n_points=n_points, fingerprint=fingerprint)
+    except Exception as e:
+        print(f"   [FeatureStore] Lecture impossible pour {target_id} : {e}")
+        hit = None
+    if hit is not None and (hit["features"] is not None or not with_features):
+        print(f"   [FeatureStore] Features réutilisées pour {target_id}")
+        return hit["period"], hit["bls_stats"], hit["features"]
+
+    if hit is not None:
+        # BLS déjà stocké (ligne écrite sans features) : seules les features manquent
+        period, bls_stats = hit["period"], hit["bls_stats"]
+    else:
+        period, bls_stats = get_period_hint(lc_flat, progress_cb=progress_cb, flux_summary=flux_summary)
+    features_df = None
+    if with_features:
+        features_df = run_feature_extraction(lc_flat, target_id, bls_stats=bls_stats,
+                                             flux_summary=flux_summary)
+    if bls_stats:
+        try:
+            store.put(target_id, period, bls_stats, features_df, n_points=n_points,
+                      fingerprint=fingerprint)
+        except Exception as e:
+            print(f"   [FeatureStore] Écriture impossible pour {target_id} : {e}")
+    return period, bls_stats, features_df
@@ -0,0 +1,433 @@
+"""
+=============================================================================
+P07 - Statistiques de flux en flux continu (out-of-core)
+=============================================================================
+Accumulateurs à mémoire bornée pour calculer les statistiques des features
+sci_* et de la caractérisation sur des courbes trop grandes pour être
+triées/parcourues plusieurs fois en mémoire (TESS multi-secteurs, uploads,
+fichiers memmap).
+
+- StreamingFluxStats : moments (Welford / Chan, jusqu'à l'ordre 4), min/max,
+  RMS, quantiles approchés via un sketch à buckets logarithmiques
+  (erreur relative bornée sur la valeur, type DDSketch : 1e-4 par défaut,
+  soit ~1e-4 en absolu sur un flux normalisé), estimation de la MAD et
+  comptages sous un seuil. Réservé aux sources qui ne tiennent pas en
+  mémoire : un tableau déjà chargé passe par FluxSummary (exact).
+- LowRunStats : seconde passe optionnelle, comptages exacts sous un seuil et
+  statistiques des écarts entre points bas (sci_low_cluster_*).
+- FluxSummary : résumé exact en mémoire, calculé une fois par tableau et
+  partagé entre get_period_hint, extract_scientific_features et
+  compute_characterization (un seul tri, statistiques d'ordre en cache).
+  Même interface que StreamingFluxStats.
+"""
+
+import numpy as np
+
+DEFAULT_CHUNK_SIZE = 1 << 16
+
+
+def iter_chunks(source, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Itère sur les valeurs finies (hors NaN) d'une source de flux par blocs.
+    source : LightCurve, ndarray / np.memmap (découpé par tranches), ou
+    callable sans argument retournant un itérable de blocs (ré-itérable).
+    """
+    if callable(source):
+        blocks = source()
+    else:
+        if hasattr(source, "flux"):
+            source = source.flux.value
+        blocks = (source[i:i + chunk_size] for i in range(0, len(source), chunk_size))
+    for block in blocks:
+        block = np.asarray(block, dtype=float).ravel()
+        block = block[~np.isnan(block)]
+        if len(block):
+            yield block
+
+
+class _LogBucketStore:
+    """Histogramme à buckets logarithmiques pour des valeurs > 0."""
+
+    def __init__(self, max_bins):
+        self.max_bins = max_bins
+        self.keys = np.empty(0, dtype=np.int64)
+        self.counts = np.empty(0, dtype=np.int64)
+
+    def add(self, keys, counts):
+        keys = np.concatenate([self.keys, keys])
+        counts = np.concatenate([self.counts, counts])
+        uniq, inv = np.unique(keys, return_inverse=True)
+        self.keys = uniq
+        self.counts = np.bincount(inv, weights=counts).astype(np.int64)
+        excess = len(self.keys) - self.max_bins
+        if excess > 0:
+            # Comme DDSketch : les buckets de plus faible magnitude sont fusionnés
+            # dans le premier bucket conservé. Avec 1 << 14 buckets à 1e-4, il
+            # faut un rapport > 25 entre valeurs extrêmes de même signe pour
+            # en arriver là.
+            self.counts[excess] += self.counts[:excess].sum()
+            self.keys = self.keys[excess:]
+            self.counts = self.counts[excess:]
+
+
+class StreamingFluxStats:
+    """Accumulateur une passe : moments, extrema et sketch de quantiles."""
+
+    def __init__(self, relative_accuracy=1e-4, max_bins=1 << 14):
+        self.relative_accuracy = relative_accuracy
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = np.log(self._gamma)
+        self._pos = _LogBucketStore(max_bins)
+        self._neg = _LogBucketStore(max_bins)
+        self._zero = 0
+
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self._m3 = 0.0
+        self._m4 = 0.0
+        self._sum_sq = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+        self._sorted = None
+
+    # ── Accumulation ────────────────────────────────────────────────────────
+
+    def update(self, chunk):
+        """Ajoute un bloc de valeurs (NaN déjà filtrés)."""
+        x = np.asarray(chunk, dtype=float).ravel()
+        if len(x) == 0:
+            return self
+
+        n_b = len(x)
+        mean_b = float(x.mean())
+        d = x - mean_b
+        m2_b = float(np.dot(d, d))
+        m3_b = float(np.sum(d ** 3))
+        m4_b = float(np.sum(d ** 4))
+        self._combine(n_b, mean_b, m2_b, m3_b, m4_b)
+
+        self._sum_sq += float(np.dot(x, x))
+        self.min = min(self.min, float(x.min()))
+        self.max = max(self.max, float(x.max()))
+        self._add_to_sketch(x)
+        return self
+
+    def _combine(self, n_b, mean_b, m2_b, m3_b, m4_b):
+        # Fusion des moments centrés (Chan et al. / Pébay), ordre 4
+        n_a = self.count
+        if n_a == 0:
+            self.count, self.mean = n_b, mean_b
+            self._m2, self._m3, self._m4 = m2_b, m3_b, m4_b
+            return
+        n = n_a + n_b
+        delta = mean_b - self.mean
+        delta_n = delta / n
+        m2_a, m3_a, m4_a = self._m2, self._m3, self._m4
+
+        self._m4 = (m4_a + m4_b
+                    + delta * delta_n ** 3 * n_a * n_b * (n_a * n_a - n_a * n_b + n_b * n_b)
+                    + 6 * delta_n ** 2 * (n_a * n_a * m2_b + n_b * n_b * m2_a)
+                    + 4 * delta_n * (n_a * m3_b - n_b * m3_a))
+        self._m3 = (m3_a + m3_b
+                    + delta * delta_n ** 2 * n_a * n_b * (n_a - n_b)
+                    + 3 * delta_n * (n_a * m2_b - n_b * m2_a))
+        self._m2 = m2_a + m2_b + delta * delta_n * n_a * n_b
+        self.mean = self.mean + delta_n * n_b
+        self.count = n
+
+    def _add_to_sketch(self, x):
+        self._sorted = None
+        pos = x[x > 0]
+        neg = -x[x < 0]
+        self._zero += int(np.sum(x == 0))
+        for store, vals in ((self._pos, pos), (self._neg, neg)):
+            if len(vals):
+                keys = np.ceil(np.log(vals) / self._log_gamma).astype(np.int64)
+                uniq, counts = np.unique(keys, return_counts=True)
+                store.add(uniq, counts)
+
+    def merge(self, other):
+        """Fusionne un autre accumulateur (ex. calculé par un autre worker)."""
+        if other.count == 0:
+            return self
+        self._combine(other.count, other.mean, other._m2, other._m3, other._m4)
+        self._sum_sq += other._sum_sq
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._zero += other._zero
+        self._pos.add(other._pos.keys, other._pos.counts)
+        self._neg.add(other._neg.keys, other._neg.counts)
+        self._sorted = None
+        return self
+
+    # ── Moments ─────────────────────────────────────────────────────────────
+
+    @property
+    def var(self):
+        return self._m2 / self.count if self.count else np.nan
+
+    @property
+    def std(self):
+        return float(np.sqrt(self.var)) if self.count else np.nan
+
+    @property
+    def skewness(self):
+        """Asymétrie biaisée (= scipy.stats.skew par défaut)."""
+        if self.count == 0 or self._m2 == 0:
+            return np.nan
+        return float(np.sqrt(self.count) * self._m3 / self._m2 ** 1.5)
+
+    @property
+    def kurtosis(self):
+        """Kurtosis en excès, biaisée (= scipy.stats.kurtosis par défaut)."""
+        if self.count == 0 or self._m2 == 0:
+            return np.nan
+        return float(self.count * self._m4 / self._m2 ** 2 - 3.0)
+
+    @property
+    def rms(self):
+        return float(np.sqrt(self._sum_sq / self.count)) if self.count else np.nan
+
+    @property
+    def ptp(self):
+        return self.max - self.min
+
+    # ── Quantiles (sketch) ──────────────────────────────────────────────────
+
+    def _bucket_value(self, keys):
+        return 2.0 * self._gamma ** keys.astype(float) / (self._gamma + 1)
+
+    def _sorted_buckets(self):
+        """(valeurs représentatives triées, effectifs) de tout le sketch."""
+        if self._sorted is None:
+            neg_vals = -self._bucket_value(self._neg.keys)[::-1]
+            neg_counts = self._neg.counts[::-1]
+            vals = np.concatenate([neg_vals, [0.0] if self._zero else [],
+                                   self._bucket_value(self._pos.keys)])
+            counts = np.concatenate([neg_counts, [self._zero] if self._zero else [],
+                                     self._pos.counts]).astype(float)
+            self._sorted = (vals, counts)
+        return self._sorted
+
+    def quantile(self, q):
+        """Quantile approché (q dans [0, 1]), exact aux extrémités."""
+        if self.count == 0:
+            return np.nan
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+        vals, counts = self._sorted_buckets()
+        rank = q * (self.count - 1)
+        idx = int(np.searchsorted(np.cumsum(counts), rank, side="right"))
+        return float(np.clip(vals[min(idx, len(vals) - 1)], self.min, self.max))
+
+    def percentile(self, p):
+        return self.quantile(p / 100.0)
+
+    def median(self):
+        return self.quantile(0.5)
+
+    def mad(self):
+        """Estimation de la MAD (médiane des |x - médiane|) depuis le sketch."""
+        if self.count == 0:
+            return np.nan
+        vals, counts = self._sorted_buckets()
+        dev = np.abs(vals - self.median())
+        order = np.argsort(dev, kind="stable")
+        cum = np.cumsum(counts[order])
+        idx = int(np.searchsorted(cum, (self.count - 1) / 2.0, side="right"))
+        return float(dev[order][min(idx, len(dev) - 1)])
+
+    def count_below(self, threshold):
+        """Nombre approché de valeurs strictement sous le seuil."""
+        if self.count == 0:
+            return 0
+        vals, counts = self._sorted_buckets()
+        return int(counts[vals < threshold].sum())
+
+
+class LowRunStats:
+    """
+    Seconde passe : comptages exacts sous un seuil et sous un point de
+    partage (médiane), et moyenne / écart-type des écarts d'indices entre
+    points bas successifs.
+    """
+
+    def __init__(self, threshold, split):
+        self.threshold = threshold
+        self.split = split
+        self.n = 0
+        self.n_below_split = 0
+        self.n_below = 0
+        self._last_low = None
+        self._gap_n = 0
+        self._gap_mean = 0.0
+        self._gap_m2 = 0.0
+
+    def update(self, chunk):
+        x = np.asarray(chunk, dtype=float).ravel()
+        self.n_below_split += int(np.sum(x < self.split))
+        low = np.nonzero(x < self.threshold)[0] + self.n
+        self.n += len(x)
+        if len(low) == 0:
+            return self
+        self.n_below += len(low)
+        if self._last_low is not None:
+            low = np.concatenate([[self._last_low], low])
+        self._last_low = int(low[-1])
+        gaps = np.diff(low).astype(float)
+        if len(gaps):
+            n_b = len(gaps)
+            mean_b = float(gaps.mean())
+            m2_b = float(np.sum((gaps - mean_b) ** 2))
+            n = self._gap_n + n_b
+            delta = mean_b - self._gap_mean
+            self._gap_m2 += m2_b + delta * delta * self._gap_n * n_b / n
+            self._gap_mean += delta * n_b / n
+            self._gap_n = n
+        return self
+
+    @property
+    def n_above_split(self):
+        return self.n - self.n_below_split
+
+    @property
+    def gap_mean(self):
+        return self._gap_mean if self._gap_n else 0
+
+    @property
+    def gap_std(self):
+        return float(np.sqrt(self._gap_m2 / self._gap_n)) if self._gap_n else 0
+
+
+def stream_flux_stats(source, chunk_size=DEFAULT_CHUNK_SIZE, **kwargs):
+    """Calcule un StreamingFluxStats en une passe sur la source."""
+    stats = StreamingFluxStats(**kwargs)
+    for chunk in iter_chunks(source, chunk_size):
+        stats.update(chunk)
+    return stats
+
+
+class FluxSummary:
+    """
+    Résumé exact d'un tableau de flux (NaN exclus), calculé paresseusement et
+    mis en cache : un tri unique sert médiane, percentiles, extrema et
+    comptages sous seuil (recherche dichotomique), les moments sont calculés
+    ensemble en un seul parcours. `passes` compte les parcours complets du
+    tableau effectués par le résumé.
+    """
+
+    def __init__(self, source):
+        if hasattr(source, "flux"):
+            source = source.flux.value
+        x = np.asarray(source, dtype=float).ravel()
+        self.values = x[~np.isnan(x)]
+        self.count = len(self.values)
+        self.passes = 1
+        self._sorted = None
+        self._moments = None
+        self._mad = None
+
+    @property
+    def sorted(self):
+        if self._sorted is None:
+            self._sorted = np.sort(self.values)
+            self.passes += 1
+        return self._sorted
+
+    def _get_moments(self):
+        if self._moments is None:
+            x = self.values
+            n = self.count
+            mean = np.sum(x) / n
+            d = x - mean
+            d2 = d * d
+            m2 = np.sum(d2) / n
+            m3 = np.sum(d2 * d) / n
+            m4 = np.sum(d2 * d2) / n
+            rms = np.sqrt(np.sum(x * x) / n)
+            self._moments = (mean, m2, m3, m4, rms)
+            self.passes += 1
+        return self._moments
+
+    # ── Moments ─────────────────────────────────────────────────────────────
+
+    @property
+    def mean(self):
+        return self._get_moments()[0] if self.count else np.nan
+
+    @property
+    def var(self):
+        return self._get_moments()[1] if self.count else np.nan
+
+    @property
+    def std(self):
+        return np.sqrt(self.var) if self.count else np.nan
+
+    @property
+    def skewness(self):
+        if self.count == 0:
+            return np.nan
+        _, m2, m3, _, _ = self._get_moments()
+        return float(m3 / m2 ** 1.5) if m2 > 0 else np.nan
+
+    @property
+    def kurtosis(self):
+        if self.count == 0:
+            return np.nan
+        _, m2, _, m4, _ = self._get_moments()
+        return float(m4 / m2 ** 2 - 3.0) if m2 > 0 else np.nan
+
+    @property
+    def rms(self):
+        return self._get_moments()[4] if self.count else np.nan
+
+    # ── Statistiques d'ordre ────────────────────────────────────────────────
+
+    @property
+    def min(self):
+        return self.sorted[0] if self.count else np.nan
+
+    @property
+    def max(self):
+        return self.sorted[-1] if self.count else np.nan
+
+    @property
+    def ptp(self):
+        return self.max - self.min
+
+    def quantile(self, q):
+        """Quantile exact, interpolation linéaire identique à np.quantile."""
+        if self.count == 0:
+            return np.nan
+        s = self.sorted
+        pos = q * (self.count - 1)
+        lo = int(np.floor(pos))
+        hi = min(lo + 1, self.count - 1)
+        t = pos - lo
+        a, b = s[lo], s[hi]
+        diff = b - a
+        # Même formule que numpy (_lerp) pour des résultats bit à bit identiques
+        return b - diff * (1 - t) if t >= 0.5 else a + diff * t
+
+    def percentile(self, p):
+        return self.quantile(p / 100.0)
+
+    def median(self):
+        if self.count == 0:
+            return np.nan
+        s = self.sorted
+        k = self.count // 2
+        return s[k] if self.count % 2 else (s[k - 1] + s[k]) / 2.0
+
+    def mad(self):
+        if self._mad is None:
+            self._mad = np.median(np.abs(self.values - self.median())) if self.count else np.nan
+            self.passes += 1
+        return self._mad
+
+    def count_below(self, threshold):
+        """Nombre exact de valeurs strictement sous le seuil (O(log n))."""
+        return int(np.searchsorted(self.sorted, threshold, side="left"))
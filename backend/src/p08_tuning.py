@@ -0,0 +1,217 @@
+"""
+=============================================================================
+P08 - Recherche d'hyperparamètres XGBoost (mode tuning)
+=============================================================================
+Recherche aléatoire sur une grille d'hyperparamètres XGBoost (tree_method
+"hist", profondeur, taux d'apprentissage, nombre d'arbres borné par early
+stopping sur les folds de validation), utilisée par 03_physics_ml_train.py
+et 07_kaggle_train.py (option --tune).
+
+- Les folds stratifiés et leurs QuantileDMatrix (binning calculé une seule
+  fois, en lecture seule ensuite) sont partagés par tous les essais.
+- Les essais tournent en parallèle dans des threads (XGBoost libère le GIL
+  pendant l'entraînement), les cœurs étant répartis entre eux.
+- Chaque candidat est chronométré (fit, prédiction par lot, prédiction d'une
+  ligne isolée comme côté serveur) ; le leaderboard marque le front de
+  Pareto précision / latence d'inférence.
+"""
+
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import xgboost as xgb
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import StratifiedKFold
+
+# Grille de recherche (tree_method "hist" pour tous les candidats)
+SEARCH_SPACE = {
+    "max_depth":        [3, 4, 5, 6, 8],
+    "learning_rate":    [0.02, 0.05, 0.1, 0.2],
+    "min_child_weight": [1, 3, 5],
+    "subsample":        [0.7, 0.85, 1.0],
+    "colsample_bytree": [0.7, 0.85, 1.0],
+}
+
+MAX_BOOST_ROUNDS = 1000
+EARLY_STOPPING_ROUNDS = 30
+MAX_BIN = 256
+
+# Répétitions pour mesurer la latence d'une prédiction unitaire
+_SINGLE_ROW_REPEATS = 50
+
+
+class FoldCache:
+    """Folds stratifiés et QuantileDMatrix associés, construits une seule fois."""
+
+    def __init__(self, X, y, n_splits=5, random_state=42, max_bin=MAX_BIN):
+        X = np.ascontiguousarray(np.asarray(X, dtype=np.float32))
+        y = np.asarray(y, dtype=np.float32)
+        self.feature_names = None
+        self.folds = []
+        cv = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=random_state)
+        for train_idx, val_idx in cv.split(X, y):
+            dtrain = xgb.QuantileDMatrix(X[train_idx], label=y[train_idx], max_bin=max_bin)
+            dval = xgb.QuantileDMatrix(X[val_idx], label=y[val_idx], ref=dtrain, max_bin=max_bin)
+            self.folds.append({
+                "dtrain": dtrain,
+                "dval": dval,
+                "X_val": X[val_idx],
+                "y_val": y[val_idx].astype(int),
+            })
+
+
+def sample_candidates(n_trials, space=SEARCH_SPACE, seed=42):
+    """Tire n_trials combinations distinctes de la grille (ordre reproductible)."""
+    keys = sorted(space)
+    sizes = [len(space[k]) for k in keys]
+    total = int(np.prod(sizes))
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(total, size=min(n_trials, total), replace=False)
+    candidates = []
+    for flat in picks:
+        params = {}
+        for k, size in zip(keys, sizes):
+            flat, i = divmod(int(flat), size)
+            params[k] = space[k][i]
+        candidates.append(params)
+    return candidates
+
+
+def _single_row_latency_us(booster, x_row, iteration_range):
+    booster.inplace_predict(x_row, iteration_range=iteration_range)  # échauffement
+    times = []
+    for _ in range(_SINGLE_ROW_REPEATS):
+        t0 = time.perf_counter()
+        booster.inplace_predict(x_row, iteration_range=iteration_range)
+        times.append(time.perf_counter() - t0)
+    return float(np.median(times) * 1e6)
+
+
+def evaluate_candidate(params, folds, base_params=None, nthread=1,
+                       max_rounds=MAX_BOOST_ROUNDS, early_stopping=EARLY_STOPPING_ROUNDS):
+    """Validation croisée d'un candidat sur les folds en cache, avec chronométrage."""
+    booster_params = {
+        "objective": "binary:logistic",
+        "eval_metric": "logloss",
+        "tree_method": "hist",
+        "max_bin": MAX_BIN,
+        "nthread": nthread,
+        "verbosity": 0,
+        **(base_params or {}),
+        **params,
+    }
+    accs, aucs, rounds = [], [], []
+    fit_s = predict_s = single_us = 0.0
+    n_pred = 0
+    for fold in folds.folds:
+        t0 = time.perf_counter()
+        booster = xgb.train(booster_params, fold["dtrain"], num_boost_round=max_rounds,
+                            evals=[(fold["dval"], "val")],
+                            early_stopping_rounds=early_stopping, verbose_eval=False)
+        fit_s += time.perf_counter() - t0
+
+        iteration_range = (0, booster.best_iteration + 1)
+        t0 = time.perf_counter()
+        proba = booster.inplace_predict(fold["X_val"], iteration_range=iteration_range)
+        predict_s += time.perf_counter() - t0
+        n_pred += len(proba)
+        single_us += _single_row_latency_us(booster, fold["X_val"][:1], iteration_range)
+
+        y_val = fold["y_val"]
+        accs.append(float(((proba >= 0.5).astype(int) == y_val).mean()))
+        aucs.append(float(roc_auc_score(y_val, proba)) if len(np.unique(y_val)) > 1 else float("nan"))
+        rounds.append(booster.best_iteration + 1)
+
+    n_folds = len(folds.folds)
+    return {
+        "params": params,
+        "n_estimators": int(round(np.mean(rounds))),
+        "cv_accuracy_mean": float(np.mean(accs)),
+        "cv_accuracy_std": float(np.std(accs)),
+        "cv_auc_mean": float(np.nanmean(aucs)),
+        "fit_seconds": fit_s / n_folds,
+        "predict_us_per_row": predict_s / max(1, n_pred) * 1e6,
+        "single_row_latency_us": single_us / n_folds,
+    }
+
+
+def pareto_front(results, accuracy_key="cv_accuracy_mean", latency_key="single_row_latency_us"):
+    """Indices des candidats non dominés (précision maximale, latence minimale)."""
+    order = sorted(range(len(results)),
+                   key=lambda i: (results[i][latency_key], -results[i][accuracy_key]))
+    front, best_acc = [], -np.inf
+    for i in order:
+        if results[i][accuracy_key] > best_acc:
+            front.append(i)
+            best_acc = results[i][accuracy_key]
+    return front
+
+
+def run_search(X, y, base_params=None, n_trials=20, n_jobs=None, n_splits=5,
+               random_state=42, output_path=None, log=print):
+    """
+    Recherche d'hyperparamètres. Retourne (meilleurs paramètres pour
+    XGBClassifier, leaderboard trié par précision CV).
+    base_params : paramètres fixes communs (ex. scale_pos_weight).
+    output_path : fichier JSON où écrire le leaderboard et le front de Pareto.
+    """
+    n_cores = os.cpu_count() or 1
+    candidates = sample_candidates(n_trials, seed=random_state)
+    n_jobs = max(1, min(n_jobs or n_cores, len(candidates)))
+    nthread = max(1, n_cores // n_jobs)
+
+    t0 = time.perf_counter()
+    folds = FoldCache(X, y, n_splits=n_splits, random_state=random_state)
+    log(f"Tuning : {len(candidates)} candidats, {n_splits} folds en cache "
+        f"({time.perf_counter() - t0:.2f} s), {n_jobs} essais en parallèle × {nthread} threads")
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+        results = list(pool.map(
+            lambda p: evaluate_candidate(p, folds, base_params=base_params, nthread=nthread),
+            candidates))
+    elapsed = time.perf_counter() - t0
+
+    results.sort(key=lambda r: (-r["cv_accuracy_mean"], r["single_row_latency_us"]))
+    front = set(pareto_front(results))
+    for i, r in enumerate(results):
+        r["rank"] = i + 1
+        r["pareto"] = i in front
+
+    log(f"{'#':>3} {'acc':>7} {'auc':>7} {'arbres':>6} {'fit s':>7} {'µs/ligne':>9} {'µs unit.':>9}  paramètres")
+    for r in results:
+        log(f"{r['rank']:>3} {r['cv_accuracy_mean']:7.4f} {r['cv_auc_mean']:7.4f} "
+            f"{r['n_estimators']:>6} {r['fit_seconds']:7.2f} {r['predict_us_per_row']:9.2f} "
+            f"{r['single_row_latency_us']:9.1f}  {'*' if r['pareto'] else ' '} {r['params']}")
+    log(f"Tuning terminé en {elapsed:.1f} s (* = front de Pareto précision / latence)")
+
+    best = results[0]
+    best_params = {**best["params"], "n_estimators": best["n_estimators"],
+                   "tree_method": "hist", "max_bin": MAX_BIN}
+
+    if output_path is not None:
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        report = {
+            "generated_at": time.strftime("%Y-%m-%d %H:%M"),
+            "n_trials": len(results),
+            "n_splits": n_splits,
+            "search_seconds": elapsed,
+            "base_params": base_params or {},
+            "best_params": best_params,
+            "pareto": [
+                {"rank": r["rank"], "cv_accuracy_mean": r["cv_accuracy_mean"],
+                 "single_row_latency_us": r["single_row_latency_us"], "params": r["params"],
+                 "n_estimators": r["n_estimators"]}
+                for r in sorted((r for r in results if r["pareto"]),
+                                key=lambda r: r["single_row_latency_us"])
+            ],
+            "leaderboard": results,
+        }
+        with open(output_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, default=float)
+        log(f"Leaderboard sauvegardé : {output_path}")
+
+    return best_params, results
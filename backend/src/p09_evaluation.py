@@ -0,0 +1,125 @@
+"""
+=============================================================================
+P09 - Courbes d'évaluation par seuil (ROC, précision-rappel, accuracy)
+=============================================================================
+Les probabilités du holdout sont triées une seule fois ; les matrices de
+confusion de tous les seuils distincts en découlent par sommes cumulées,
+d'où les courbes ROC, précision-rappel, accuracy et F1 en une passe
+vectorisée.
+
+Les courbes sont stockées dans model_metrics.json sous forme de colonnes
+(échantillonnées à max_points seuils, le seuil optimal toujours conservé),
+ce qui suffit à /api/metrics pour proposer n'importe quel point de
+fonctionnement sans réentraîner.
+"""
+
+import numpy as np
+
+CURVE_MAX_POINTS = 201
+CURVE_DECIMALS = 5
+
+CURVE_KEYS = ("thresholds", "tpr", "fpr", "precision", "recall", "accuracy", "f1")
+
+
+def _confusion_by_threshold(y_true, proba):
+    """(seuils décroissants, TP, FP, P, N) pour chaque seuil distinct (+ seuil 'aucun positif')."""
+    y = np.asarray(y_true).astype(bool)
+    p = np.asarray(proba, dtype=float)
+    order = np.argsort(-p, kind="mergesort")
+    p_sorted, y_sorted = p[order], y[order]
+
+    tp = np.cumsum(y_sorted)
+    fp = np.cumsum(~y_sorted)
+    # Dernière position de chaque valeur distincte : tout ce qui précède est >= seuil
+    last = np.r_[np.flatnonzero(np.diff(p_sorted)), len(p_sorted) - 1]
+    thresholds = p_sorted[last]
+    tp = np.r_[0, tp[last]]
+    fp = np.r_[0, fp[last]]
+    # Seuil juste au-dessus de la plus forte probabilité : aucun positif prédit
+    top = np.nextafter(thresholds[0], np.inf) if len(thresholds) else 1.0
+    thresholds = np.r_[top, thresholds]
+    n_pos = int(y.sum())
+    return thresholds, tp, fp, n_pos, len(y) - n_pos
+
+
+def threshold_curves(y_true, proba, max_points=CURVE_MAX_POINTS):
+    """
+    Courbes par seuil (prédiction positive si proba >= seuil), seuils
+    décroissants. Retourne un dict de colonnes + résumés :
+    auc_roc, average_precision, best_accuracy_threshold, best_f1_threshold.
+    """
+    thresholds, tp, fp, n_pos, n_neg = _confusion_by_threshold(y_true, proba)
+    n = n_pos + n_neg
+    fn = n_pos - tp
+    tn = n_neg - fp
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        tpr = tp / n_pos if n_pos else np.zeros_like(tp, dtype=float)
+        fpr = fp / n_neg if n_neg else np.zeros_like(fp, dtype=float)
+        precision = np.where(tp + fp > 0, tp / np.maximum(tp + fp, 1), 1.0)
+        f1 = np.where(2 * tp + fp + fn > 0, 2 * tp / np.maximum(2 * tp + fp + fn, 1), 0.0)
+    accuracy = (tp + tn) / n
+
+    auc_roc = float(np.sum(np.diff(fpr) * (tpr[1:] + tpr[:-1]) / 2)) if n_pos and n_neg else float("nan")
+    average_precision = float(np.sum(np.diff(tpr) * precision[1:])) if n_pos else float("nan")
+    best_acc = int(np.argmax(accuracy))
+    best_f1 = int(np.argmax(f1))
+
+    # Échantillonnage régulier le long de la courbe, points remarquables conservés
+    n_points = len(thresholds)
+    if max_points and n_points > max_points:
+        keep = np.unique(np.r_[np.linspace(0, n_points - 1, max_points).round().astype(int),
+                               best_acc, best_f1])
+    else:
+        keep = np.arange(n_points)
+
+    columns = {"thresholds": thresholds, "tpr": tpr, "fpr": fpr, "precision": precision,
+               "recall": tpr, "accuracy": accuracy, "f1": f1}
+    curves = {k: np.round(v[keep].astype(float), CURVE_DECIMALS).tolist() for k, v in columns.items()}
+    # Le seuil lui-même garde sa pleine précision (comparaison exacte avec les probabilités)
+    curves["thresholds"] = thresholds[keep].astype(float).tolist()
+    curves.update({
+        "n_pos": n_pos,
+        "n_neg": n_neg,
+        "auc_roc": auc_roc,
+        "average_precision": average_precision,
+        "best_accuracy_threshold": float(thresholds[best_acc]),
+        "best_accuracy": float(accuracy[best_acc]),
+        "best_f1_threshold": float(thresholds[best_f1]),
+        "best_f1": float(f1[best_f1]),
+    })
+    return curves
+
+
+def _point(curves, i):
+    point = {k: curves[k][i] for k in CURVE_KEYS}
+    point["threshold"] = point.pop("thresholds")
+    return point
+
+
+def select_operating_point(curves, threshold=None, min_precision=None, min_recall=None):
+    """
+    Point de fonctionnement lu sur les courbes stockées :
+    - threshold     : point du plus petit seuil stocké >= threshold ;
+    - min_precision : meilleur rappel parmi les points de précision >= min_precision ;
+    - min_recall    : meilleure précision parmi les points de rappel >= min_recall ;
+    - sinon         : seuil maximisant l'accuracy.
+    Retourne un dict (threshold, tpr, fpr, precision, recall, accuracy, f1) ou None.
+    """
+    thresholds = np.asarray(curves["thresholds"])
+    if threshold is not None:
+        above = np.flatnonzero(thresholds >= threshold)
+        return _point(curves, int(above[-1]) if len(above) else 0)
+
+    if min_precision is not None or min_recall is not None:
+        if min_precision is not None:
+            ok = np.flatnonzero(np.asarray(curves["precision"]) >= min_precision)
+            score = np.asarray(curves["recall"])
+        else:
+            ok = np.flatnonzero(np.asarray(curves["recall"]) >= min_recall)
+            score = np.asarray(curves["precision"])
+        if not len(ok):
+            return None
+        return _point(curves, int(ok[np.argmax(score[ok])]))
+
+    return _point(curves, int(np.argmax(curves["accuracy"])))
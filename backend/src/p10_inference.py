@@ -0,0 +1,202 @@
+"""
+=============================================================================
+P10 - Inférence compilée (arbres XGBoost aplatis en tableaux NumPy)
+=============================================================================
+Charge exoplanet_model.json une seule fois et aplatit tous ses arbres en
+tableaux contigus (enfants gauche/droit, feature, seuil, branche par défaut,
+valeur des feuilles). Un vecteur brut ou un lot de vecteurs est ensuite
+évalué sans DataFrame ni DMatrix : tous les arbres avancent d'un niveau à
+chaque itération, sur toutes les lignes à la fois.
+
+Le résultat est identique bit à bit à XGBClassifier.predict_proba :
+- entrées et seuils en float32, test `x < seuil`, NaN → branche par défaut ;
+- marge accumulée en float32 dans l'ordre des arbres à partir de la marge
+  de base (np.cumsum est séquentiel, contrairement à np.sum) ;
+- sigmoïde d'XGBoost en float32 (marge bornée à 88.7) avec l'expf de la
+  libm C : l'exp float32 de NumPy (SIMD) diffère parfois d'un ulp.
+"""
+
+import ctypes
+import ctypes.util
+import json
+
+import numpy as np
+
+# Profondeurs de l'ensemble utilisées pour l'incertitude du score (part des arbres)
+STAGE_FRACTIONS = (0.25, 0.50, 0.75, 1.0)
+
+
+def _load_libm_expf():
+    """expf de la libm (celle qu'utilise XGBoost), vectorisée ; None si indisponible."""
+    try:
+        libm = ctypes.CDLL(ctypes.util.find_library("m") or "libm.so.6")
+        expf = libm.expf
+    except (OSError, AttributeError):
+        return None
+    expf.restype = ctypes.c_float
+    expf.argtypes = [ctypes.c_float]
+    return np.frompyfunc(expf, 1, 1)
+
+
+_libm_expf = _load_libm_expf()
+
+
+def expf(x):
+    x = np.asarray(x, dtype=np.float32)
+    if _libm_expf is not None:
+        return _libm_expf(x).astype(np.float32)
+    # Repli : exp arrondie correctement (peut différer d'un ulp de la libm)
+    return np.exp(x.astype(np.float64)).astype(np.float32)
+
+
+def _parse_float(value):
+    """base_score peut être sérialisé '5E-1' ou '[5E-1]' selon la version d'XGBoost."""
+    return float(str(value).strip("[]"))
+
+
+class CompiledModel:
+    """Classifieur binaire XGBoost (gbtree, binary:logistic) évalué en NumPy."""
+
+    def __init__(self, model_json):
+        learner = model_json["learner"]
+        objective = learner["objective"]["name"]
+        if objective != "binary:logistic":
+            raise ValueError(f"Objectif non supporté : {objective}")
+        booster = learner["gradient_booster"]
+        if booster["name"] != "gbtree":
+            raise ValueError(f"Booster non supporté : {booster['name']}")
+
+        self.feature_names = list(learner.get("feature_names") or [])
+        self.n_features = int(learner["learner_model_param"]["num_feature"])
+        if not self.feature_names:
+            self.feature_names = [f"f{i}" for i in range(self.n_features)]
+        self.feature_index = {name: i for i, name in enumerate(self.feature_names)}
+
+        # Marge de base : base_score est une probabilité pour binary:logistic
+        base_score = np.float32(_parse_float(learner["learner_model_param"]["base_score"]))
+        self.base_margin = np.float32(-np.log(np.float32(1.0) / base_score - np.float32(1.0)))
+
+        trees = booster["model"]["trees"]
+        # Comme predict_proba : seuls les arbres jusqu'à best_iteration si l'early stopping l'a fixé
+        best_iteration = (learner.get("attributes") or {}).get("best_iteration")
+        if best_iteration is not None:
+            n_parallel = int(booster["model"]["gbtree_model_param"].get("num_parallel_tree", 1))
+            trees = trees[:(int(best_iteration) + 1) * n_parallel]
+        self._flatten(trees)
+
+    def _flatten(self, trees):
+        roots, left, right, feature, threshold, default_left, value = [], [], [], [], [], [], []
+        offset = 0
+        for tree in trees:
+            if any(tree.get("split_type") or []):
+                raise ValueError("Splits catégoriels non supportés par l'inférence compilée.")
+            lc = np.asarray(tree["left_children"], dtype=np.int64)
+            rc = np.asarray(tree["right_children"], dtype=np.int64)
+            is_leaf = lc == -1
+            roots.append(offset)
+            # Une feuille pointe sur elle-même : l'itération s'y stabilise
+            own = np.arange(offset, offset + len(lc))
+            left.append(np.where(is_leaf, own, lc + offset))
+            right.append(np.where(is_leaf, own, rc + offset))
+            feature.append(np.where(is_leaf, 0, tree["split_indices"]))
+            cond = np.asarray(tree["split_conditions"], dtype=np.float32)
+            threshold.append(cond)
+            default_left.append(np.asarray(tree["default_left"], dtype=bool))
+            value.append(np.where(is_leaf, cond, np.float32(0)))
+            offset += len(lc)
+
+        self.n_trees = len(roots)
+        self.roots = np.asarray(roots, dtype=np.int64)
+        self.left = np.concatenate(left) if left else np.zeros(0, np.int64)
+        self.right = np.concatenate(right) if right else np.zeros(0, np.int64)
+        self.feature = np.concatenate(feature).astype(np.int64) if feature else np.zeros(0, np.int64)
+        self.threshold = np.concatenate(threshold) if threshold else np.zeros(0, np.float32)
+        self.default_left = np.concatenate(default_left) if default_left else np.zeros(0, bool)
+        self.leaf_value = np.concatenate(value).astype(np.float32) if value else np.zeros(0, np.float32)
+        self.is_leaf = self.left == np.arange(len(self.left))
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls(json.load(f))
+
+    # ── Évaluation ──────────────────────────────────────────────────────────
+
+    def _as_matrix(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[None, :]
+        if X.shape[1] != self.n_features:
+            raise ValueError(f"{X.shape[1]} features reçues, {self.n_features} attendues.")
+        return X
+
+    def leaf_indices(self, X):
+        """Nœud feuille atteint dans chaque arbre : tableau (n_lignes, n_arbres)."""
+        X = self._as_matrix(X)
+        rows = np.arange(len(X))[:, None]
+        node = np.broadcast_to(self.roots, (len(X), self.n_trees)).copy()
+        while True:
+            active = ~self.is_leaf[node]
+            if not active.any():
+                return node
+            x = X[rows, self.feature[node]]
+            go_left = np.where(np.isnan(x), self.default_left[node], x < self.threshold[node])
+            node = np.where(go_left, self.left[node], self.right[node])
+
+    def leaf_values(self, X):
+        """Contribution de chaque arbre à la marge : tableau float32 (n_lignes, n_arbres)."""
+        return self.leaf_value[self.leaf_indices(X)]
+
+    def _cumulative_margins(self, X):
+        """Colonne j : marge après les j premiers arbres (colonne 0 = marge de base)."""
+        leaves = self.leaf_values(X)
+        acc = np.concatenate([np.full((len(leaves), 1), self.base_margin, dtype=np.float32), leaves], axis=1)
+        return np.cumsum(acc, axis=1, dtype=np.float32)
+
+    def predict_margin(self, X):
+        return self._cumulative_margins(X)[:, -1]
+
+    def staged_margins(self, X, fractions=STAGE_FRACTIONS):
+        """
+        Marges après une fraction des arbres, en une seule traversée :
+        tableau (n_lignes, len(fractions)), identique à
+        predict(iteration_range=(0, k), output_margin=True).
+        """
+        stages = [max(1, int(self.n_trees * p)) for p in fractions]
+        return self._cumulative_margins(X)[:, stages]
+
+    def score_confidence(self, X, fractions=STAGE_FRACTIONS):
+        """
+        Écart-type des probabilités aux différentes profondeurs de l'ensemble,
+        par ligne (NaN si le modèle a moins d'arbres que de profondeurs).
+        """
+        margins = self.staged_margins(X, fractions).astype(np.float64)
+        if self.n_trees < len(fractions):
+            return np.full(len(margins), np.nan)
+        return np.std(1.0 / (1.0 + np.exp(-margins)), axis=1)
+
+    @staticmethod
+    def sigmoid(margin):
+        """common::Sigmoid d'XGBoost : 1 / (expf(min(-x, 88.7)) + 1 + 1e-16), en float32."""
+        z = np.minimum(-np.asarray(margin, dtype=np.float32), np.float32(88.7))
+        denom = (expf(z) + np.float32(1.0)) + np.float32(1e-16)
+        return (np.float32(1.0) / denom).astype(np.float32)
+
+    def predict_proba(self, X):
+        """Même sortie que XGBClassifier.predict_proba : (n, 2) float32."""
+        p = self.sigmoid(self.predict_margin(X))
+        return np.column_stack([np.float32(1.0) - p, p])
+
+    def predict_one(self, x):
+        """Probabilité de la classe 1 pour un seul vecteur (ordre de feature_names)."""
+        return float(self.predict_proba(x)[0, 1])
+
+    def vector_from(self, values):
+        """Vecteur float32 (NaN = manquant) depuis un dict ou une Series {feature: valeur}."""
+        x = np.full(self.n_features, np.nan, dtype=np.float32)
+        for name, v in values.items():
+            i = self.feature_index.get(name)
+            if i is not None and v is not None:
+                x[i] = v
+        return x
+
@@ -0,0 +1,160 @@
+"""
+=============================================================================
+P11 - Micro-batching de l'inférence
+=============================================================================
+Les analyses concurrentes (threads Flask) déposent leur vecteur de features
+dans une file ; un thread de scoring attend le premier vecteur puis en
+collecte d'autres pendant une courte fenêtre (ex. 2 ms) ou jusqu'à
+max_batch lignes, score le lot en un seul appel et rend à chaque appelant
+son propre résultat. Un contexte (typiquement le modèle qui doit scorer le
+vecteur) accompagne chaque demande : un lot ne mélange jamais deux
+contextes, ce qui permet de changer de modèle à chaud pendant un lot.
+
+- window_ms = 0 ou max_batch <= 1 : micro-batching désactivé, le vecteur
+  est scoré directement dans le thread appelant.
+- Histogrammes exposés par stats() : attente dans la file (ms) et taille
+  des lots.
+"""
+
+import queue
+import threading
+import time
+
+import numpy as np
+
+WAIT_MS_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 25, 50, 100)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+class Histogram:
+    """Histogramme cumulatif à bornes fixes (même sémantique que 'le' de Prometheus)."""
+
+    def __init__(self, bounds):
+        self.bounds = tuple(bounds)
+        self._counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = int(np.searchsorted(self.bounds, value, side="left"))
+        with self._lock:
+            self._counts[i] += 1
+            self.count += 1
+            self.total += value
+
+    def snapshot(self):
+        with self._lock:
+            counts, count, total = list(self._counts), self.count, self.total
+        cumulative = np.cumsum(counts).tolist()
+        buckets = [{"le": b, "count": c} for b, c in zip(self.bounds, cumulative)]
+        buckets.append({"le": "+Inf", "count": cumulative[-1]})
+        return {"count": count, "sum": total, "mean": total / count if count else None,
+                "buckets": buckets}
+
+
+class _Request:
+    __slots__ = ("x", "context", "enqueued", "done", "result", "error")
+
+    def __init__(self, x, context):
+        self.x = x
+        self.context = context
+        self.enqueued = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MicroBatcher:
+    """
+    Regroupe les scorings unitaires concurrents en lots.
+    score_batch : fonction (matrice n × d float32, contexte) → tableau de n scores.
+    """
+
+    def __init__(self, score_batch, window_ms=2.0, max_batch=64):
+        self.score_batch = score_batch
+        self.window_ms = float(window_ms)
+        self.max_batch = int(max_batch)
+        self.wait_ms = Histogram(WAIT_MS_BUCKETS)
+        self.batch_size = Histogram(BATCH_SIZE_BUCKETS)
+        self._queue = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.window_ms > 0 and self.max_batch > 1
+
+    def configure(self, window_ms=None, max_batch=None):
+        """Change la fenêtre à chaud (0 = désactivé) ; s'applique au lot suivant."""
+        if window_ms is not None:
+            self.window_ms = float(window_ms)
+        if max_batch is not None:
+            self.max_batch = int(max_batch)
+
+    def score(self, x, context=None):
+        """Score d'un vecteur ; bloque jusqu'au traitement du lot qui le contient."""
+        x = np.asarray(x, dtype=np.float32)
+        if not self.enabled:
+            self.wait_ms.observe(0.0)
+            self.batch_size.observe(1)
+            return float(self.score_batch(x[None, :], context)[0])
+
+        self._ensure_worker()
+        req = _Request(x, context)
+        self._queue.put(req)
+        req.done.wait()
+        if req.error is not None:
+            raise req.error
+        return req.result
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "window_ms": self.window_ms,
+            "max_batch": self.max_batch,
+            "queue_wait_ms": self.wait_ms.snapshot(),
+            "batch_size": self.batch_size.snapshot(),
+        }
+
+    # ── Thread de scoring ───────────────────────────────────────────────────
+
+    def _ensure_worker(self):
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+                self._worker.start()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.window_ms / 1000.0
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            for req in batch:
+                self.wait_ms.observe((started - req.enqueued) * 1000.0)
+            self.batch_size.observe(len(batch))
+            groups = {}
+            for req in batch:
+                groups.setdefault(id(req.context), []).append(req)
+            for group in groups.values():
+                try:
+                    scores = self.score_batch(np.stack([req.x for req in group]), group[0].context)
+                    for req, s in zip(group, scores):
+                        req.result = float(s)
+                except Exception as e:
+                    for req in group:
+                        req.error = e
+                for req in group:
+                    req.done.set()
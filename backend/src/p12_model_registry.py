@@ -0,0 +1,261 @@
+"""
+=============================================================================
+P12 - Registre de modèles versionnés (promotion atomique, modèle shadow)
+=============================================================================
+Structure du registre :
+
+    models/registry/
+        versions/<version>/exoplanet_model.json
+                           selected_features.json
+                           model_metrics.json
+                           manifest.json        (date, sha1 du modèle, origine)
+        ACTIVE                                  (version servie)
+        SHADOW                                  (version évaluée en ombre, optionnelle)
+
+- Une version est écrite dans un répertoire temporaire puis renommée :
+  elle n'est jamais visible à moitié copiée.
+- ACTIVE / SHADOW sont réécrits via un fichier temporaire + os.replace :
+  la promotion est atomique, un lecteur voit l'ancienne ou la nouvelle
+  version, jamais un état intermédiaire.
+- ModelBundle regroupe tout ce qu'une version sert (modèle, arbres
+  compilés, features, métriques) : le serveur en change par une seule
+  affectation.
+- ShadowScorer score en tâche de fond, avec le modèle candidat, les mêmes
+  requêtes que le modèle actif (chaque ligne construite avec ses propres
+  features) et agrège les écarts ; la file est bornée et les vecteurs en
+  trop sont abandonnés plutôt que de ralentir les requêtes.
+- Les noms de version sont restreints à [A-Za-z0-9_.-]+ (sans "..") :
+  ils deviennent des chemins sous versions/.
+"""
+
+import collections
+import datetime
+import hashlib
+import json
+import os
+import queue
+import re
+import shutil
+import threading
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from src.p10_inference import CompiledModel
+
+MODEL_FILE = "exoplanet_model.json"
+FEATURES_FILE = "selected_features.json"
+METRICS_FILE = "model_metrics.json"
+MANIFEST_FILE = "manifest.json"
+
+SHADOW_QUEUE_SIZE = 1024
+SHADOW_WINDOW = 1000        # dernières paires (actif, shadow) conservées pour les stats
+DECISION_THRESHOLD = 0.5
+VERSION_PATTERN = re.compile(r"[A-Za-z0-9_.-]+")   # noms de version (chemins sous versions/)
+
+
+def _sha1_file(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _write_atomic(path, text):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+class ModelBundle:
+    """Une version de modèle chargée : XGBClassifier, arbres compilés, features, métriques."""
+
+    def __init__(self, version, model, compiled, features, metrics, fingerprint=None):
+        self.version = version
+        self.model = model
+        self.compiled = compiled
+        self.features = features
+        self.metrics = metrics
+        self.fingerprint = fingerprint  # sha1 court du modèle et de sa liste de features
+
+    @classmethod
+    def load(cls, model_path, features_path, metrics_path, version=None):
+        model = xgb.XGBClassifier()
+        model.load_model(model_path)
+        try:
+            compiled = CompiledModel.load(model_path)
+        except Exception as e:
+            print(f"[!] Inférence compilée indisponible ({e}), repli sur predict_proba.")
+            compiled = None
+        features = []
+        if os.path.exists(features_path):
+            with open(features_path) as f:
+                features = json.load(f)
+        metrics = {}
+        if os.path.exists(metrics_path):
+            with open(metrics_path) as f:
+                metrics = json.load(f)
+        fingerprint = hashlib.sha1(f"{_sha1_file(model_path)}|{json.dumps(features)}".encode()).hexdigest()[:12]
+        return cls(version, model, compiled, features, metrics, fingerprint)
+
+    def score(self, values):
+        """Probabilité de la classe 1 depuis un dict {feature: valeur} (absente = NaN)."""
+        if self.compiled is not None:
+            return self.compiled.predict_one(self.compiled.vector_from(values))
+        row = pd.DataFrame([{f: values.get(f, np.nan) for f in self.features}]).astype(float)
+        return float(self.model.predict_proba(row)[0][1])
+
+
+class ModelRegistry:
+    """Répertoire de versions de modèles avec pointeurs ACTIVE / SHADOW."""
+
+    def __init__(self, root):
+        self.root = str(root)
+        self.versions_dir = os.path.join(self.root, "versions")
+
+    def _pointer(self, name):
+        path = os.path.join(self.root, name)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            version = f.read().strip()
+        return version or None
+
+    def _set_pointer(self, name, version):
+        if version is not None and not os.path.isdir(self.version_dir(version)):
+            raise KeyError(f"Version inconnue : {version}")
+        os.makedirs(self.root, exist_ok=True)
+        _write_atomic(os.path.join(self.root, name), version or "")
+
+    def version_dir(self, version):
+        """Répertoire d'une version ; ValueError si le nom sortirait de versions/."""
+        version = str(version)
+        if not VERSION_PATTERN.fullmatch(version) or ".." in version:
+            raise ValueError(f"Nom de version invalide : {version!r}")
+        return os.path.join(self.versions_dir, version)
+
+    def active_version(self):
+        return self._pointer("ACTIVE")
+
+    def shadow_version(self):
+        return self._pointer("SHADOW")
+
+    def list_versions(self):
+        """Manifestes de toutes les versions, de la plus ancienne à la plus récente."""
+        if not os.path.isdir(self.versions_dir):
+            return []
+        manifests = []
+        for version in os.listdir(self.versions_dir):
+            path = os.path.join(self.versions_dir, version, MANIFEST_FILE)
+            if os.path.exists(path):
+                with open(path) as f:
+                    manifests.append(json.load(f))
+        return sorted(manifests, key=lambda m: m["created_at"])
+
+    def register(self, model_path, features_path, metrics_path, version=None, source=None):
+        """
+        Copie un modèle (et ses features / métriques) comme nouvelle version.
+        Version par défaut : date UTC + sha1 court du modèle. Un modèle déjà
+        enregistré (même sha1) n'est pas dupliqué : sa version est retournée.
+        """
+        sha1 = _sha1_file(model_path)
+        for manifest in self.list_versions():
+            if manifest["sha1"] == sha1 and version in (None, manifest["version"]):
+                return manifest["version"]
+
+        now = datetime.datetime.utcnow()
+        version = version or f"{now:%Y%m%d-%H%M%S}-{sha1[:8]}"
+        target = self.version_dir(version)
+        if os.path.exists(target):
+            raise FileExistsError(f"Version déjà présente : {version}")
+
+        os.makedirs(self.versions_dir, exist_ok=True)
+        staging = f"{target}.tmp"
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        shutil.copy2(model_path, os.path.join(staging, MODEL_FILE))
+        for src, name in ((features_path, FEATURES_FILE), (metrics_path, METRICS_FILE)):
+            if src and os.path.exists(src):
+                shutil.copy2(src, os.path.join(staging, name))
+        with open(os.path.join(staging, MANIFEST_FILE), "w") as f:
+            json.dump({"version": version, "sha1": sha1, "created_at": now.isoformat(),
+                       "source": source}, f, indent=2)
+        os.replace(staging, target)
+        return version
+
+    def promote(self, version):
+        """Rend `version` active (remplacement atomique du pointeur ACTIVE)."""
+        self._set_pointer("ACTIVE", version)
+
+    def set_shadow(self, version):
+        """Définit (ou retire avec None) le modèle évalué en ombre."""
+        self._set_pointer("SHADOW", version)
+
+    def load(self, version):
+        d = self.version_dir(version)
+        return ModelBundle.load(os.path.join(d, MODEL_FILE), os.path.join(d, FEATURES_FILE),
+                                os.path.join(d, METRICS_FILE), version=version)
+
+
+class ShadowScorer:
+    """Scoring en ombre d'un modèle candidat, dans un thread de fond."""
+
+    def __init__(self, bundle, queue_size=SHADOW_QUEUE_SIZE, window=SHADOW_WINDOW):
+        self.bundle = bundle
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._pairs = collections.deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.scored = 0
+        self.dropped = 0
+        self.errors = 0
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="shadow-scorer", daemon=True)
+        self._thread.start()
+
+    def submit(self, values, active_score):
+        """Non bloquant : abandonne le vecteur si la file est pleine."""
+        try:
+            self._queue.put_nowait((dict(values), float(active_score)))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def stop(self):
+        self._stopped = True
+        self._queue.put(None)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None or self._stopped:
+                return
+            values, active_score = item
+            try:
+                shadow_score = self.bundle.score(values)
+            except Exception:
+                with self._lock:
+                    self.errors += 1
+                continue
+            with self._lock:
+                self.scored += 1
+                self._pairs.append((active_score, shadow_score))
+
+    def stats(self):
+        with self._lock:
+            pairs = np.asarray(self._pairs, dtype=float).reshape(-1, 2)
+            counts = {"scored": self.scored, "dropped": self.dropped, "errors": self.errors}
+        summary = {"version": self.bundle.version, **counts, "window": len(pairs)}
+        if len(pairs):
+            active, shadow = pairs[:, 0], pairs[:, 1]
+            summary.update({
+                "mean_active": float(active.mean()),
+                "mean_shadow": float(shadow.mean()),
+                "mean_abs_diff": float(np.abs(shadow - active).mean()),
+                "max_abs_diff": float(np.abs(shadow - active).max()),
+                "decision_agreement": float(np.mean((active >= DECISION_THRESHOLD)
+                                                    == (shadow >= DECISION_THRESHOLD))),
+            })
+        return summary
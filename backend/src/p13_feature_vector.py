@@ -0,0 +1,141 @@
+"""
+=============================================================================
+P13 - Assemblage des vecteurs d'entrée du modèle (tableaux NumPy)
+=============================================================================
+Un FeatureLayout fixe, pour une liste de features, la position de chaque
+nom (dict nom → index). Les sources d'une cible sont écrites directement
+dans un tableau float64 préalloué, ligne par ligne, avec les mêmes règles
+de priorité que l'ancienne version par DataFrame :
+
+1. features de la courbe de lumière (sci_*, bls_*) ;
+2. features du catalogue KOI / TESS TOI (écrasent les précédentes) ;
+3. is_tess ;
+4. paramètres stellaires des en-têtes FITS (seulement si manquant) ;
+5. fallback BLS : koi_period / koi_depth / koi_duration et barres ±5 % ;
+6. koi_prad dérivé de la profondeur et de koi_srad (barres ±10 %) ;
+7. manquants restants → 0.
+
+« Manquant » signifie NaN ou 0, comme auparavant. assemble_batch()
+retourne une matrice (n, d) dans l'ordre des features, directement
+utilisable par le booster ou le modèle compilé.
+"""
+
+import functools
+import math
+
+import numpy as np
+
+EARTH_RADII_PER_SOLAR = 109.076
+BLS_ERROR_FRACTION = 0.05
+PRAD_ERROR_FRACTION = 0.1
+
+_ERROR_COLUMNS = (
+    ("koi_period",   ("koi_period_err1",   "koi_period_err2")),
+    ("koi_depth",    ("koi_depth_err1",    "koi_depth_err2")),
+    ("koi_duration", ("koi_duration_err1", "koi_duration_err2")),
+)
+
+
+def _as_float(value):
+    """float(), avec None / NA → NaN (les valeurs issues de pandas peuvent être pd.NA)."""
+    if value is None:
+        return math.nan
+    try:
+        return float(value)
+    except TypeError:
+        return math.nan
+
+
+class FeatureLayout:
+    """Positions des features d'un modèle dans le vecteur d'entrée."""
+
+    def __init__(self, feature_names):
+        self.feature_names = list(feature_names)
+        self.index = {name: i for i, name in enumerate(self.feature_names)}
+        self.n_features = len(self.feature_names)
+
+    def _fill_row(self, x, lc_features=None, catalog_features=None, mission=None,
+                  lc_stellar_params=None, period=None, bls_stats=None):
+        idx = self.index
+
+        def missing(col):
+            i = idx.get(col)
+            return i is not None and (math.isnan(x[i]) or x[i] == 0)
+
+        def value(col):
+            i = idx.get(col)
+            return x[i] if i is not None else math.nan
+
+        # 1-2. Courbe de lumière puis catalogue (le catalogue l'emporte, même NaN)
+        for source in (lc_features, catalog_features):
+            if source:
+                for col, val in source.items():
+                    i = idx.get(col)
+                    if i is not None:
+                        x[i] = _as_float(val)
+
+        # 3. Feature multi-missions
+        i = idx.get("is_tess")
+        if i is not None:
+            x[i] = 1.0 if (mission and mission.upper() == "TESS") else 0.0
+
+        # 4. Paramètres stellaires FITS : comblent ce que le catalogue n'a pas fourni
+        if lc_stellar_params:
+            for col, val in lc_stellar_params.items():
+                if missing(col):
+                    x[idx[col]] = float(val)
+
+        # 5. Fallback BLS
+        if period and missing("koi_period"):
+            x[idx["koi_period"]] = float(period)
+
+        if bls_stats:
+            depth_ppm = float(bls_stats.get("bls_depth_ppm", 0) or 0)
+            dur_days = float(bls_stats.get("bls_duration_days", 0) or 0)
+            if missing("koi_depth"):
+                x[idx["koi_depth"]] = depth_ppm
+            if missing("koi_duration"):
+                x[idx["koi_duration"]] = dur_days * 24.0  # heures
+
+            for main_col, err_cols in _ERROR_COLUMNS:
+                main_val = value(main_col)
+                if not math.isnan(main_val) and main_val != 0:
+                    for err_col in err_cols:
+                        if missing(err_col):
+                            x[idx[err_col]] = abs(main_val) * BLS_ERROR_FRACTION
+
+        # 6. koi_prad (R_terre) = sqrt(depth_ppm / 1e6) * koi_srad * 109.076
+        if missing("koi_prad"):
+            srad, depth_ppm = value("koi_srad"), value("koi_depth")
+            if srad > 0 and depth_ppm > 0:
+                prad = np.sqrt(depth_ppm / 1e6) * srad * EARTH_RADII_PER_SOLAR
+                x[idx["koi_prad"]] = prad
+                if missing("koi_prad_err1"):
+                    x[idx["koi_prad_err1"]] = prad * PRAD_ERROR_FRACTION
+                if missing("koi_prad_err2"):
+                    x[idx["koi_prad_err2"]] = -prad * PRAD_ERROR_FRACTION
+
+    def assemble(self, **sources):
+        """Vecteur (d,) float64 d'une cible ; mêmes arguments que assemble_batch."""
+        return self.assemble_batch([sources])[0]
+
+    def assemble_batch(self, rows):
+        """
+        Matrice (n, d) float64, une ligne par dict de sources :
+        lc_features, catalog_features, mission, lc_stellar_params, period, bls_stats.
+        """
+        X = np.full((len(rows), self.n_features), np.nan)
+        for x, sources in zip(X, rows):
+            self._fill_row(x, **sources)
+        np.nan_to_num(X, copy=False, nan=0.0, posinf=np.inf, neginf=-np.inf)
+        return X
+
+
+@functools.lru_cache(maxsize=8)
+def _layout(names):
+    return FeatureLayout(names)
+
+
+def feature_layout(feature_names):
+    """FeatureLayout partagé pour une liste de features (construit une seule fois)."""
+    return _layout(tuple(feature_names))
@@ -0,0 +1,169 @@
+"""
+=============================================================================
+P14 - Accès indexé aux catalogues KOI / TESS TOI
+=============================================================================
+CatalogTable est construite une seule fois, au chargement d'un catalogue
+(et après chaque rafraîchissement) :
+
+- index de hachage valeur → première ligne (kepid, tid, toi, nom de
+  système Kepler) et index trié pour les requêtes par intervalle
+  (TOI 104 → premier candidat 104.xx) ;
+- matrice float64 de toutes les colonnes numériques, complétée par glon /
+  glat (un seul SkyCoord vectorisé pour tout le catalogue) et, pour le
+  catalogue KOI, par les features dérivées (log_koi_period, duty_cycle,
+  snr_proxy...) ;
+- feature_dict(i) / row(i) : dict d'une ligne sans masque booléen ni
+  Series pandas.
+
+Les valeurs sont celles que produisait le calcul ligne à ligne : colonnes
+numériques en float, NaN omis, mêmes formules pour les dérivées.
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+
+EPS = 1e-9
+EARTH_RADII_PER_SOLAR = 109.076
+
+# Préfixe de système dans kepler_name : "Kepler-10 b" → "kepler-10"
+_KEPLER_SYSTEM_RE = re.compile(r"(Kepler-\d+)(\s|$)", re.IGNORECASE)
+
+
+def galactic_coordinates(ra, dec):
+    """(glon, glat) en degrés pour des tableaux ra/dec ICRS ; NaN si coordonnée absente."""
+    ra = np.asarray(ra, dtype=float)
+    dec = np.asarray(dec, dtype=float)
+    glon = np.full(ra.shape, np.nan)
+    glat = np.full(ra.shape, np.nan)
+    ok = np.isfinite(ra) & np.isfinite(dec)
+    if ok.any():
+        try:
+            from astropy.coordinates import SkyCoord
+            import astropy.units as u
+            gal = SkyCoord(ra=ra[ok] * u.deg, dec=dec[ok] * u.deg, frame="icrs").galactic
+            glon[ok] = gal.l.degree
+            glat[ok] = gal.b.degree
+        except Exception:
+            pass
+    return glon, glat
+
+
+def derived_koi_features(f):
+    """Features dérivées du catalogue KOI, colonne par colonne (NaN si une entrée manque)."""
+    period, depth, duration = f.get("koi_period"), f.get("koi_depth"), f.get("koi_duration")
+    prad, srad, kepmag = f.get("koi_prad"), f.get("koi_srad"), f.get("koi_kepmag")
+    out = {}
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        if period is not None:
+            out["log_koi_period"] = np.log1p(np.maximum(period, 0))
+        if depth is not None:
+            out["log_koi_depth"] = np.log1p(np.maximum(depth, 0))
+        if prad is not None:
+            out["log_koi_prad"] = np.log1p(np.maximum(prad, 0))
+        if period is not None and duration is not None:
+            out["duty_cycle"] = duration / (period * 24 + EPS)
+        if prad is not None and srad is not None:
+            out["ratio_prad_srad"] = prad / (srad * EARTH_RADII_PER_SOLAR + EPS)
+        if depth is not None and srad is not None:
+            out["depth_per_srad"] = depth / (srad + EPS)
+        if depth is not None and kepmag is not None:
+            # Puissance en float Python (pow de la libm C) : np.power peut différer d'un ulp
+            exponent = np.asarray(kepmag / 2.5 + EPS, dtype=float)
+            scale = np.fromiter((10 ** e for e in exponent.ravel().tolist()), float, exponent.size)
+            snr_p = depth / scale.reshape(exponent.shape)
+            out["snr_proxy"] = snr_p
+            out["log_snr_proxy"] = np.log1p(np.maximum(snr_p, 0))
+    return out
+
+
+class CatalogTable:
+    """Vue indexée d'un DataFrame de catalogue (lecture seule)."""
+
+    def __init__(self, df, keys=(), derived=False):
+        self.df = df
+        self.n_rows = len(df)
+        self.columns = list(df.columns)
+        self._arrays = [df[c].to_numpy() for c in self.columns]
+
+        # Matrice des features numériques (+ glon/glat, + dérivées KOI)
+        numeric = [c for c in self.columns
+                   if pd.api.types.is_numeric_dtype(df[c]) and not pd.api.types.is_bool_dtype(df[c])]
+        features = {c: df[c].to_numpy(dtype=float) for c in numeric}
+        if "ra" in features and "dec" in features:
+            features["glon"], features["glat"] = galactic_coordinates(features["ra"], features["dec"])
+        if derived:
+            features.update(derived_koi_features(features))
+        self.feature_names = list(features)
+        self.features = (np.column_stack([features[c] for c in self.feature_names])
+                         if features and self.n_rows else np.zeros((self.n_rows, len(features))))
+
+        self._hash = {}
+        self._sorted = {}
+        for key in keys:
+            if key in df.columns:
+                self._index(key, df[key].to_numpy())
+        if "kepler_name" in df.columns:
+            systems = df["kepler_name"].map(
+                lambda v: m.group(1).lower() if isinstance(v, str) and (m := _KEPLER_SYSTEM_RE.match(v)) else None)
+            self._index("kepler_system", systems.to_numpy(dtype=object))
+
+    def _index(self, key, values):
+        positions = pd.Series(np.arange(len(values)), index=values)
+        positions = positions[positions.index.notna()]
+        first = positions[~positions.index.duplicated()]
+        self._hash[key] = dict(zip(first.index.tolist(), first.tolist()))
+        if values.dtype.kind in "iuf":
+            order = np.argsort(values, kind="stable")
+            order = order[~np.isnan(values[order].astype(float))]
+            self._sorted[key] = (values[order], order)
+
+    # ── Recherche ───────────────────────────────────────────────────────────
+
+    def position(self, key, value):
+        """Première ligne où `key` vaut `value`, ou None."""
+        index = self._hash.get(key)
+        if index is None or value is None:
+            return None
+        return index.get(value)
+
+    def first_in_range(self, key, low, high):
+        """Première ligne (ordre du catalogue) avec low <= key < high, ou None."""
+        if key not in self._sorted:
+            return None
+        values, order = self._sorted[key]
+        lo, hi = np.searchsorted(values, [low, high], side="left")
+        return int(order[lo:hi].min()) if hi > lo else None
+
+    def first_positions(self, key):
+        """Première ligne de chaque valeur distincte de `key`, dans l'ordre du catalogue."""
+        return sorted(self._hash.get(key, {}).values())
+
+    def kepler_system_position(self, name):
+        """Première ligne dont kepler_name est 'Kepler-N' ou 'Kepler-N <lettre>'."""
+        return self.position("kepler_system", name.lower())
+
+    # ── Lignes ──────────────────────────────────────────────────────────────
+
+    def feature_dict(self, i):
+        """Features numériques de la ligne i (float, NaN omis), glon/glat et dérivées comprises."""
+        return {c: v for c, v in zip(self.feature_names, self.features[i].tolist()) if v == v}
+
+    def feature_column(self, name):
+        """Colonne float64 (NaN = absent) de la matrice des features, ou None."""
+        try:
+            return self.features[:, self.feature_names.index(name)]
+        except ValueError:
+            return None
+
+    def column(self, name):
+        """Colonne brute (valeurs du DataFrame), ou None."""
+        try:
+            return self._arrays[self.columns.index(name)]
+        except ValueError:
+            return None
+
+    def row(self, i):
+        """Toutes les colonnes brutes de la ligne i (équivalent de df.iloc[i])."""
+        return {c: a[i] for c, a in zip(self.columns, self._arrays)}
@@ -0,0 +1,270 @@
+"""
+=============================================================================
+P15 - Index colonnaire du catalogue d'étoiles (/api/catalog/stars)
+=============================================================================
+StarIndex est construit une fois par reconstruction de l'index du
+catalogue, à partir de la liste d'entrées (dicts) de _build_catalog_index :
+
+- colonnes typées NumPy : mission (code), label, bls_snr, period,
+  bls_depth_ppm, bls_score (NaN = absent) ;
+- pour chaque clé de tri et chaque sens, une permutation précalculée
+  (même ordre que sorted(key=(valeur is None, valeur or 0)), stable), son
+  rang inverse, et sa restriction à chaque catégorie (mission × label)
+  avec les rangs correspondants ;
+- tableaux triés de bls_snr et period pour les filtres d'intervalle
+  (np.searchsorted) ;
+- compteurs par catégorie et statistiques globales calculés une seule fois.
+
+Une page sans filtre coûte O(taille de page) ; avec des filtres mission /
+label, O(taille de page + log n) : la page est lue dans la fusion des
+permutations par catégorie, son début trouvé par bissection sur le rang.
+Les filtres d'intervalle partent d'une bissection et ne touchent que les
+lignes dans l'intervalle ; le filtre `search` passe par l'index n-grammes
+(src.p16_search_index), copié depuis l'index précédent et mis à jour par
+différence à chaque reconstruction.
+"""
+
+import numpy as np
+
+from src.p16_search_index import SearchIndex
+
+SORT_KEYS = {"snr": "bls_snr", "period": "period", "depth": "bls_depth_ppm", "score": "bls_score"}
+DEFAULT_SORT = "snr"
+RANGE_KEYS = {"snr": "bls_snr", "period": "period"}
+
+
+def _float_column(entries, key):
+    return np.array([np.nan if e.get(key) is None else float(e[key]) for e in entries], dtype=float)
+
+
+def _sort_permutation(values, descending):
+    """Permutation stable de clé (absent, valeur or 0), comme sorted(..., reverse=descending)."""
+    missing = np.isnan(values).astype(np.int8)
+    filled = np.where(np.isnan(values), 0.0, values)
+    if descending:
+        # sorted(reverse=True) reste stable : on trie sur les clés opposées
+        return np.lexsort((-filled, -missing)).astype(np.int64)
+    return np.lexsort((filled, missing)).astype(np.int64)
+
+
+def _merged_slice(parts, start, stop):
+    """
+    Positions [start, stop) de la fusion, par rang croissant, de listes
+    (positions, rangs croissants) aux rangs disjoints. Le début est trouvé
+    par bissection sur le rang : O(k · log² n + k · (stop - start)).
+    """
+    if stop <= start:
+        return np.zeros(0, dtype=np.int64)
+    if len(parts) == 1:
+        return parts[0][0][start:stop]
+
+    def before(r):
+        return sum(int(np.searchsorted(ranks, r)) for _, ranks in parts)
+
+    # Plus petit rang r tel que `start` éléments ont un rang < r
+    lo, hi = 0, max((int(ranks[-1]) + 1 for _, ranks in parts if len(ranks)), default=0)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if before(mid) >= start:
+            hi = mid
+        else:
+            lo = mid + 1
+    size = stop - start
+    positions, ranks = [], []
+    for p, r in parts:
+        i = int(np.searchsorted(r, lo))
+        positions.append(p[i:i + size])
+        ranks.append(r[i:i + size])
+    positions, ranks = np.concatenate(positions), np.concatenate(ranks)
+    return positions[np.argsort(ranks, kind="stable")[:size]]
+
+
+class StarIndex:
+    """Index en lecture seule ; une reconstruction crée un nouvel objet."""
+
+    def __init__(self, entries, search_index=None, previous=None):
+        """
+        previous : index de la version précédente. Les entrées reprises telles
+        quelles (mêmes objets) réutilisent ses colonnes et ses documents de
+        recherche ; seules les nouvelles entrées sont relues.
+        """
+        self.entries = list(entries)
+        self.n = len(self.entries)
+        if previous is not None:
+            where = {id(e): i for i, e in enumerate(previous.entries)}
+            reused = np.fromiter((where.get(id(e), -1) for e in self.entries), np.int64, self.n)
+        else:
+            reused = np.full(self.n, -1, dtype=np.int64)
+        kept = np.flatnonzero(reused >= 0)
+        fresh = np.flatnonzero(reused < 0)
+        fresh_entries = [self.entries[i] for i in fresh.tolist()]
+
+        self.missions = sorted({e.get("mission", "") for e in self.entries})
+        mission_code = {m: i for i, m in enumerate(self.missions)}
+        self.mission = np.array([mission_code[e.get("mission", "")] for e in self.entries], dtype=np.int16)
+        self.label = np.array([1 if e["label"] == 1 else 0 for e in self.entries], dtype=np.int8)
+        # Catégorie = mission × (label == 1)
+        self.category = self.mission.astype(np.int32) * 2 + self.label
+        self._category_counts = np.bincount(self.category, minlength=2 * len(self.missions))
+
+        self.columns = {}
+        for key in SORT_KEYS.values():
+            column = np.empty(self.n, dtype=float)
+            if len(kept):
+                column[kept] = previous.columns[key][reused[kept]]
+            column[fresh] = _float_column(fresh_entries, key)
+            self.columns[key] = column
+
+        self._perm = {}
+        self._rank = {}
+        self._category_perm = {}    # (clé, sens) → {catégorie: (positions, rangs croissants)}
+        for key in SORT_KEYS.values():
+            for descending in (False, True):
+                perm = _sort_permutation(self.columns[key], descending)
+                rank = np.empty(self.n, dtype=np.int64)
+                rank[perm] = np.arange(self.n)
+                self._perm[key, descending] = perm
+                self._rank[key, descending] = rank
+                category_sorted = self.category[perm]
+                by_category = {}
+                for cat in range(len(self._category_counts)):
+                    ranks = np.flatnonzero(category_sorted == cat)
+                    by_category[cat] = (perm[ranks], ranks)
+                self._category_perm[key, descending] = by_category
+
+        # Tableaux triés pour les filtres d'intervalle (valeurs présentes seulement)
+        self._ranges = {}
+        for key in RANGE_KEYS.values():
+            values = self.columns[key]
+            order = np.flatnonzero(~np.isnan(values))
+            order = order[np.argsort(values[order], kind="stable")]
+            self._ranges[key] = (values[order], order)
+
+        # Filtre `search` : sous-chaîne de kepid, target_id ou name. L'index de
+        # la version précédente est copié (copie sur écriture) puis mis à jour
+        # par différence : les requêtes en cours continuent de lire l'original.
+        self.search_index = search_index.copy() if search_index is not None else SearchIndex()
+        self._documents = [None] * self.n
+        for i, j in zip(kept.tolist(), reused[kept].tolist()):
+            self._documents[i] = previous._documents[j]
+        for i, document in zip(fresh.tolist(), list(self._search_documents(fresh_entries))):
+            self._documents[i] = document
+        doc_ids, self.search_changed, self.search_removed = self.search_index.sync(self._documents, keyed=True)
+        self._position_of_doc = np.full(max(doc_ids, default=-1) + 1, -1, dtype=np.int64)
+        self._position_of_doc[doc_ids] = np.arange(self.n)
+
+        n_planets = int(self.label.sum())
+        snr = self.columns["bls_snr"]
+        snrs = snr[~np.isnan(snr)].tolist()
+        self.stats = {
+            "total_stars": self.n,
+            "n_planets": n_planets,
+            "n_non_planets": self.n - n_planets,
+            "avg_snr": round(sum(snrs) / len(snrs), 2) if snrs else 0,
+        }
+        self.n_kepler = int((self.mission == mission_code["Kepler"]).sum()) if "Kepler" in mission_code else 0
+        self.n_tess = int((self.mission == mission_code["TESS"]).sum()) if "TESS" in mission_code else 0
+
+    # ── Filtres ─────────────────────────────────────────────────────────────
+
+    def _allowed_categories(self, mission=None, label="all"):
+        """Catégories autorisées (None = toutes) ; liste vide si aucune ne peut correspondre."""
+        if not mission and label not in ("0", "1"):
+            return None
+        allowed = []
+        for code, name in enumerate(self.missions):
+            if mission and name.lower() != mission.lower():
+                continue
+            for lab in (0, 1):
+                if label in ("0", "1") and str(lab) != label:
+                    continue
+                allowed.append(code * 2 + lab)
+        return allowed
+
+    def _range_candidates(self, ranges):
+        """Positions (ordre des entrées) satisfaisant tous les intervalles, ou None."""
+        candidates = None
+        for key, (low, high) in ranges.items():
+            if low is None and high is None:
+                continue
+            values, order = self._ranges[key]
+            lo = 0 if low is None else np.searchsorted(values, low, side="left")
+            hi = len(values) if high is None else np.searchsorted(values, high, side="right")
+            selected = order[lo:hi]
+            if candidates is None:
+                candidates = selected
+            else:
+                candidates = np.intersect1d(candidates, selected, assume_unique=True)
+        return candidates
+
+    def _search_documents(self, entries):
+        """
+        (clé unique, champs) des entrées ; la clé est stable d'une
+        reconstruction à l'autre. Les doublons exacts reçoivent le premier
+        numéro libre après ceux des documents déjà placés.
+        """
+        taken = {d[0] for d in self._documents if d is not None}
+        for e in entries:
+            base = (e.get("mission", ""), e.get("target_id", ""), e.get("name", ""), str(e.get("kepid", "")))
+            k = 0
+            while base + (k,) in taken:
+                k += 1
+            taken.add(base + (k,))
+            yield base + (k,), (str(e.get("kepid", "")), e.get("target_id", ""), e.get("name", ""))
+
+    def search_positions(self, search):
+        """Positions (ordre des entrées) dont kepid, target_id ou name contient `search`."""
+        ids = np.fromiter(self.search_index.match_ids(search), dtype=np.int64)
+        ids = ids[ids < len(self._position_of_doc)]
+        positions = self._position_of_doc[ids]
+        return positions[positions >= 0]
+
+    def query(self, page=1, limit=20, search="", label="all", sort_by=DEFAULT_SORT, sort_dir="desc",
+              min_snr=None, max_snr=None, min_period=None, max_period=None, mission=None):
+        """
+        Même résultat que les filtres + sorted() de l'ancienne implémentation.
+        Retourne (entrées de la page, total filtré, nombre de planètes filtrées).
+        """
+        key = SORT_KEYS.get(sort_by, SORT_KEYS[DEFAULT_SORT])
+        descending = sort_dir != "asc"
+        perm = self._perm[key, descending]
+        allowed = self._allowed_categories(mission, label)
+        offset = (page - 1) * limit
+        candidates = self._range_candidates({
+            "bls_snr": (min_snr, max_snr),
+            "period": (min_period, max_period),
+        })
+
+        if candidates is None:
+            if allowed is None and not search:
+                total = self.n
+                n_planets = int(self.label.sum())
+                return self._page(perm, offset, limit), total, n_planets
+            if search:
+                found = self.search_positions(search)
+                if allowed is not None:
+                    found = found[np.isin(self.category[found], allowed)]
+                ordered = found[np.argsort(self._rank[key, descending][found])]
+            else:
+                parts = [self._category_perm[key, descending][cat] for cat in allowed]
+                total = int(sum(len(positions) for positions, _ in parts))
+                n_planets = int(sum(self._category_counts[cat] for cat in allowed if cat % 2 == 1))
+                start, stop, _ = slice(offset, offset + limit).indices(total)
+                page = _merged_slice(parts, start, stop)
+                return [self.entries[i] for i in page.tolist()], total, n_planets
+        else:
+            keep = np.ones(len(candidates), dtype=bool)
+            if allowed is not None:
+                keep &= np.isin(self.category[candidates], allowed)
+            candidates = candidates[keep]
+            if search:
+                found = np.zeros(self.n, dtype=bool)
+                found[self.search_positions(search)] = True
+                candidates = candidates[found[candidates]]
+            ordered = candidates[np.argsort(self._rank[key, descending][candidates], kind="stable")]
+
+        return self._page(ordered, offset, limit), len(ordered), int(self.label[ordered].sum())
+
+    def _page(self, ordered, offset, limit):
+        # Découpage NumPy = découpage de liste Python (y compris offsets négatifs)
+        return [self.entries[i] for i in ordered[offset:offset + limit].tolist()]
@@ -0,0 +1,211 @@
+"""
+=============================================================================
+P16 - Index de recherche par sous-chaîne (KIC / TIC, noms Kepler, TOI)
+=============================================================================
+Chaque document est un tuple de champs en minuscules (ex. "10001368",
+"kic 10001368", "kepler-10 b"). L'index associe à chaque n-gramme de 1 à
+3 caractères, pris à l'intérieur d'un champ, l'ensemble des documents qui
+le contiennent :
+
+- requête de 1 à 3 caractères : la liste du n-gramme est exactement le
+  résultat ;
+- requête plus longue : intersection des listes de ses trigrammes (la plus
+  courte d'abord), puis vérification de la sous-chaîne sur les seuls
+  candidats.
+
+Une liste triée (champ, document) sert aux correspondances exactes et par
+préfixe (bissection). search() classe : champ égal à la requête, puis
+champ commençant par la requête (ordre lexicographique), puis sous-chaîne
+(ordre d'insertion). Les sous-chaînes sont lues dans la liste triée, gardée
+en cache, du n-gramme le plus rare de la requête, jusqu'à `limit`
+résultats : une requête courte (1 à 3 caractères), dont la liste peut
+couvrir tout l'index, ne parcourt que le début de cette liste.
+
+sync() met l'index à jour par différence avec la nouvelle liste de
+documents : seuls les documents ajoutés, retirés ou modifiés sont
+(dé)indexés, les autres gardent leur identifiant.
+
+copy() retourne un index indépendant dont les listes de n-grammes sont
+partagées avec l'original jusqu'à leur première modification : mettre à
+jour la copie coûte la taille du changement, et l'original (encore lu par
+les requêtes en cours) n'est pas touché.
+"""
+
+import bisect
+import threading
+from collections import defaultdict
+
+MAX_GRAM = 3
+
+
+def _grams(text):
+    n = len(text)
+    return {text[i:i + k] for k in range(1, MAX_GRAM + 1) for i in range(n - k + 1)}
+
+
+class SearchIndex:
+    """Index n-grammes incrémental, sûr pour des lectures concurrentes d'une mise à jour."""
+
+    def __init__(self):
+        self._docs = {}          # id → tuple de champs (minuscules)
+        self._ids = {}           # clé → id
+        self._keys = {}          # id → clé
+        self._postings = defaultdict(set)
+        self._ranked = {}            # n-gramme → liste triée de ses ids (cache, vidé à sa modification)
+        self._next_id = 0
+        self._sorted_fields = None   # [(champ, id)] trié, reconstruit à la demande
+        self._owned = None           # n-grammes copiés depuis le dernier copy() (None : tous)
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._docs)
+
+    def copy(self):
+        """Copie indépendante ; les listes de n-grammes sont copiées à leur première modification."""
+        with self._lock:
+            other = SearchIndex()
+            other._docs = dict(self._docs)
+            other._ids = dict(self._ids)
+            other._keys = dict(self._keys)
+            other._postings = defaultdict(set, self._postings)
+            other._ranked = dict(self._ranked)
+            other._next_id = self._next_id
+            other._sorted_fields = self._sorted_fields
+            # Les ensembles sont désormais partagés : aucun des deux index ne les possède
+            self._owned = set()
+            other._owned = set()
+            return other
+
+    def _writable(self, gram):
+        self._ranked.pop(gram, None)
+        posting = self._postings[gram]
+        if self._owned is not None and gram not in self._owned:
+            posting = self._postings[gram] = set(posting)
+            self._owned.add(gram)
+        return posting
+
+    # ── Mise à jour ─────────────────────────────────────────────────────────
+
+    def add(self, key, fields):
+        """Indexe (ou réindexe si ses champs ont changé) le document `key` ; retourne son id."""
+        fields = tuple(str(f).lower() for f in fields if f is not None)
+        with self._lock:
+            doc_id = self._ids.get(key)
+            if doc_id is not None:
+                if self._docs[doc_id] == fields:
+                    return doc_id
+                self.remove(key)
+            doc_id = self._next_id
+            self._next_id += 1
+            self._ids[key] = doc_id
+            self._keys[doc_id] = key
+            self._docs[doc_id] = fields
+            for gram in set().union(*map(_grams, fields)):
+                self._writable(gram).add(doc_id)
+            self._sorted_fields = None
+            return doc_id
+
+    def remove(self, key):
+        with self._lock:
+            doc_id = self._ids.pop(key, None)
+            if doc_id is None:
+                return
+            del self._keys[doc_id]
+            for gram in set().union(*map(_grams, self._docs.pop(doc_id))):
+                posting = self._writable(gram)
+                posting.discard(doc_id)
+                if not posting:
+                    del self._postings[gram]
+            self._sorted_fields = None
+
+    def sync(self, documents, keyed=False):
+        """
+        Aligne l'index sur `documents` (itérable de (clé, champs)) et retourne
+        la liste des ids dans le même ordre, plus (ajoutés/modifiés, retirés).
+        keyed : la clé détermine les champs ; un document déjà indexé sous sa
+                clé n'est pas recomparé.
+        """
+        documents = list(documents)
+        with self._lock:
+            wanted = {key for key, _ in documents}
+            removed = [key for key in self._ids if key not in wanted]
+            for key in removed:
+                self.remove(key)
+            ids, changed = [], 0
+            for key, fields in documents:
+                doc_id = self._ids.get(key)
+                if doc_id is None or not keyed:
+                    previous = self._docs.get(doc_id)
+                    doc_id = self.add(key, fields)
+                    if previous != self._docs[doc_id]:
+                        changed += 1
+                ids.append(doc_id)
+            return ids, changed, len(removed)
+
+    # ── Recherche ───────────────────────────────────────────────────────────
+
+    def key(self, doc_id):
+        return self._keys.get(doc_id)
+
+    def match_ids(self, query):
+        """Ids des documents dont un champ contient `query` (insensible à la casse)."""
+        q = query.lower()
+        with self._lock:
+            if not q:
+                return set(self._docs)
+            if len(q) <= MAX_GRAM:
+                return set(self._postings.get(q, ()))
+            postings = sorted((self._postings.get(q[i:i + MAX_GRAM], set())
+                               for i in range(len(q) - MAX_GRAM + 1)), key=len)
+            if not postings[0]:
+                return set()
+            candidates = postings[0].intersection(*postings[1:])
+            docs = self._docs
+            return {i for i in candidates if any(q in f for f in docs[i])}
+
+    def _ranked_posting(self, gram):
+        ranked = self._ranked.get(gram)
+        if ranked is None:
+            ranked = self._ranked[gram] = sorted(self._postings.get(gram, ()))
+        return ranked
+
+    def _sorted(self):
+        if self._sorted_fields is None:
+            self._sorted_fields = sorted((f, i) for i, fields in self._docs.items() for f in fields)
+        return self._sorted_fields
+
+    def search(self, query, limit=20):
+        """
+        Ids classés : champ égal à la requête, puis champ préfixé par la
+        requête, puis autre sous-chaîne ; au plus `limit` résultats.
+        """
+        q = query.lower()
+        if not q or limit <= 0:
+            return []
+        with self._lock:
+            ranked, seen = [], set()
+            fields = self._sorted()
+            # Exacts puis préfixes : plage contiguë de la liste triée
+            exact, prefix = [], []
+            for j in range(bisect.bisect_left(fields, (q,)), len(fields)):
+                f, i = fields[j]
+                if not f.startswith(q) or len(exact) + len(prefix) >= limit * 4:
+                    break
+                (exact if f == q else prefix).append(i)
+            for i in exact + prefix:
+                if i not in seen:
+                    seen.add(i)
+                    ranked.append(i)
+                    if len(ranked) == limit:
+                        return ranked
+            # Sous-chaînes, par id croissant : liste du n-gramme le plus rare
+            grams = [q[i:i + MAX_GRAM] for i in range(max(1, len(q) - MAX_GRAM + 1))]
+            rarest = min(grams, key=lambda g: len(self._postings.get(g, ())))
+            docs = self._docs
+            for i in self._ranked_posting(rarest):
+                if i in seen or (len(q) > MAX_GRAM and not any(q in f for f in docs[i])):
+                    continue
+                ranked.append(i)
+                if len(ranked) == limit:
+                    break
+            return ranked
@@ -0,0 +1,220 @@
+"""
+=============================================================================
+P17 - Index spatial du ciel (cone search, bandes de latitude galactique)
+=============================================================================
+Toutes les étoiles des catalogues (une par kepid / TIC) sont placées sur la
+sphère unité ; un KD-tree (scipy cKDTree) sur ces vecteurs répond aux
+requêtes de cône : un rayon angulaire r correspond à une corde
+2·sin(r/2), la recherche est donc exacte sans cas particulier aux pôles
+ni à la coupure RA = 0/360°.
+
+Les latitudes galactiques (précalculées par CatalogTable) sont aussi
+gardées triées : une bande [glat_min, glat_max] se lit par bissection.
+
+Utilisable depuis l'API (/api/catalog/sky) comme depuis Python
+(neighbours() pour estimer la contamination par des étoiles voisines).
+
+CombinedSkyIndex interroge plusieurs SkyIndex (un par catalogue) comme un
+seul : un rafraîchissement du catalogue TESS ne reconstruit que sa partie,
+le KD-tree Kepler est repris tel quel.
+"""
+
+import bisect
+import math
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+ARCSEC_PER_DEG = 3600.0
+
+
+def unit_vectors(ra_deg, dec_deg):
+    """Vecteurs unitaires (n, 3) depuis RA/Dec en degrés."""
+    ra = np.radians(np.asarray(ra_deg, dtype=float))
+    dec = np.radians(np.asarray(dec_deg, dtype=float))
+    cos_dec = np.cos(dec)
+    return np.column_stack([cos_dec * np.cos(ra), cos_dec * np.sin(ra), np.sin(dec)])
+
+
+def _chord(radius_deg):
+    return 2.0 * np.sin(np.radians(min(float(radius_deg), 180.0)) / 2.0)
+
+
+def _angle_deg(chord):
+    return np.degrees(2.0 * np.arcsin(np.clip(chord / 2.0, 0.0, 1.0)))
+
+
+class SkyIndex:
+    """Index en lecture seule ; un rafraîchissement de catalogue crée un nouvel objet."""
+
+    def __init__(self, records):
+        """records : dicts avec au moins ra, dec (degrés) ; glat optionnelle."""
+        self.records = [r for r in records
+                        if r.get("ra") is not None and r.get("dec") is not None
+                        and math.isfinite(r["ra"]) and math.isfinite(r["dec"])]
+        self.n = len(self.records)
+        self.ra = np.array([r["ra"] for r in self.records], dtype=float)
+        self.dec = np.array([r["dec"] for r in self.records], dtype=float)
+        self.glat = np.array([np.nan if r.get("glat") is None else r["glat"] for r in self.records], dtype=float)
+        self.xyz = unit_vectors(self.ra, self.dec) if self.n else np.zeros((0, 3))
+        self.tree = cKDTree(self.xyz) if self.n else None
+
+        known = np.flatnonzero(np.isfinite(self.glat))
+        order = known[np.argsort(self.glat[known], kind="stable")]
+        self._glat_sorted, self._glat_order = self.glat[order], order
+
+    @staticmethod
+    def table_records(table, key, mission):
+        """Records d'un catalogue : première ligne de chaque kepid (KOI) ou de chaque TIC (TOI)."""
+        if table is None:
+            return []
+        cols = {name: table.feature_column(name) for name in ("ra", "dec", "glon", "glat", "target_planet")}
+        if cols["ra"] is None or cols["dec"] is None:
+            return []
+        positions = table.first_positions(key)
+        ids = table.column(key)[positions].tolist()
+        names = table.column("kepler_name" if mission == "Kepler" else "toi")
+        names = names[positions].tolist() if names is not None else [None] * len(positions)
+        values = {c: [v if math.isfinite(v) else None for v in a[positions].tolist()] if a is not None
+                  else [None] * len(positions)
+                  for c, a in cols.items()}
+        records = []
+        for star_id, name, ra, dec, glon, glat, label in zip(
+                ids, names, values["ra"], values["dec"], values["glon"], values["glat"], values["target_planet"]):
+            star_id = int(star_id)
+            if mission == "Kepler":
+                name = name if isinstance(name, str) else f"KIC {star_id}"
+                target_id = f"KIC {star_id}"
+            else:
+                name = f"TOI {name}" if name is not None and np.isfinite(name) else f"TIC {star_id}"
+                target_id = f"TIC {star_id}"
+            records.append({
+                "target_id": target_id,
+                "name": name,
+                "mission": mission,
+                "ra": ra,
+                "dec": dec,
+                "glon": glon,
+                "glat": glat,
+                "label": int(label) if label is not None else None,
+            })
+        return records
+
+    @classmethod
+    def from_catalogs(cls, kepler_table=None, tess_table=None):
+        """Une entrée par étoile : première ligne de chaque kepid (KOI) et de chaque TIC (TOI)."""
+        return cls(cls.table_records(kepler_table, "kepid", "Kepler")
+                   + cls.table_records(tess_table, "tid", "TESS"))
+
+    # ── Requêtes ────────────────────────────────────────────────────────────
+
+    def cone(self, ra, dec, radius_deg, glat_min=None, glat_max=None, limit=None):
+        """
+        Positions des étoiles à moins de radius_deg de (ra, dec), triées par
+        distance, et distances en degrés. Filtre de bande galactique optionnel.
+        """
+        if self.tree is None:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        center = unit_vectors([ra], [dec])[0]
+        idx = np.asarray(self.tree.query_ball_point(center, _chord(radius_deg) + 1e-12), dtype=np.int64)
+        if glat_min is not None or glat_max is not None:
+            idx = idx[self._in_band(self.glat[idx], glat_min, glat_max)]
+        dist = _angle_deg(np.linalg.norm(self.xyz[idx] - center, axis=1))
+        keep = dist <= radius_deg
+        idx, dist = idx[keep], dist[keep]
+        order = np.argsort(dist, kind="stable")[:limit]
+        return idx[order], dist[order]
+
+    def nearest(self, ra, dec, k=1):
+        """Les k étoiles les plus proches de (ra, dec) : (positions, distances en degrés)."""
+        if self.tree is None:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        chord, idx = self.tree.query(unit_vectors([ra], [dec])[0], k=min(k, self.n))
+        return np.atleast_1d(idx).astype(np.int64), _angle_deg(np.atleast_1d(chord))
+
+    @staticmethod
+    def _in_band(glat, glat_min, glat_max):
+        ok = np.isfinite(glat)
+        if glat_min is not None:
+            ok &= glat >= glat_min
+        if glat_max is not None:
+            ok &= glat <= glat_max
+        return ok
+
+    def band(self, glat_min=None, glat_max=None, limit=None):
+        """Positions des étoiles avec glat_min <= glat <= glat_max, triées par latitude."""
+        lo = 0 if glat_min is None else np.searchsorted(self._glat_sorted, glat_min, side="left")
+        hi = len(self._glat_sorted) if glat_max is None else np.searchsorted(self._glat_sorted, glat_max, side="right")
+        idx = self._glat_order[lo:hi]
+        return idx[:limit] if limit is not None else idx
+
+    def neighbours(self, ra, dec, radius_arcsec, exclude_target=None):
+        """
+        Étoiles du catalogue à moins de radius_arcsec d'une position (contrôle
+        de contamination) : liste de records avec separation_arcsec.
+        """
+        idx, dist = self.cone(ra, dec, radius_arcsec / ARCSEC_PER_DEG)
+        out = []
+        for i, d in zip(idx.tolist(), dist.tolist()):
+            record = self.records[i]
+            if exclude_target is not None and record["target_id"] == exclude_target:
+                continue
+            out.append({**record, "separation_arcsec": round(d * ARCSEC_PER_DEG, 2)})
+        return out
+
+
+class _ChainedRecords:
+    """Records de plusieurs SkyIndex, vus comme une seule liste (sans copie)."""
+
+    def __init__(self, parts, offsets):
+        self._parts = parts
+        self._offsets = offsets
+
+    def __len__(self):
+        return self._offsets[-1]
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        part = bisect.bisect_right(self._offsets, i) - 1
+        return self._parts[part].records[i - self._offsets[part]]
+
+
+class CombinedSkyIndex:
+    """
+    Même interface que SkyIndex sur plusieurs parties ; les positions
+    suivent l'ordre des parties (celles de la première, puis de la
+    deuxième...). Chaque requête interroge chaque partie puis fusionne.
+    """
+
+    def __init__(self, parts):
+        self.parts = tuple(parts)
+        self._offsets = [0]
+        for part in self.parts:
+            self._offsets.append(self._offsets[-1] + part.n)
+        self.n = self._offsets[-1]
+        self.records = _ChainedRecords(self.parts, self._offsets)
+
+    def _merge(self, results, limit):
+        """results : (positions, clé de tri) par partie → positions globales et clés triées."""
+        idx = np.concatenate([np.zeros(0, np.int64)] + [i + off for (i, _), off in zip(results, self._offsets)])
+        keys = np.concatenate([np.zeros(0)] + [k for _, k in results])
+        order = np.argsort(keys, kind="stable")[:limit]
+        return idx[order], keys[order]
+
+    def cone(self, ra, dec, radius_deg, glat_min=None, glat_max=None, limit=None):
+        return self._merge([p.cone(ra, dec, radius_deg, glat_min, glat_max, limit) for p in self.parts], limit)
+
+    def nearest(self, ra, dec, k=1):
+        return self._merge([p.nearest(ra, dec, k) for p in self.parts], k)
+
+    def band(self, glat_min=None, glat_max=None, limit=None):
+        results = []
+        for p in self.parts:
+            idx = p.band(glat_min, glat_max, limit)
+            results.append((idx, p.glat[idx]))
+        return self._merge(results, limit)[0]
+
+    neighbours = SkyIndex.neighbours
@@ -0,0 +1,171 @@
+"""
+=============================================================================
+P18 - Instantanés binaires typés des catalogues CSV
+=============================================================================
+Le texte CSV d'un catalogue n'est analysé qu'une fois par version du
+fichier source (taille + date de modification) : load_catalog() écrit à
+côté un instantané typé, puis le relit à chaque chargement suivant.
+
+    data/catalog/_snapshots/<nom>-<version>/
+        columns.json        nom et type de chaque colonne (+ catégories)
+        <i>.npy             valeurs de la colonne i (codes pour une catégorie)
+        <i>.missing.npy     chaînes absentes (colonnes texte seulement)
+
+Chaque colonne est un tableau NumPy brut, ouvert en memory-map : seules
+les colonnes demandées sont lues, sans décodage ni tampon intermédiaire
+(un instantané Parquet chargeait le lecteur pyarrow et ses tampons : +35 Mo
+de mémoire résidente au démarrage de l'API).
+
+Types de l'instantané :
+- entiers réduits au plus petit type signé qui contient leurs valeurs
+  (kepid int32, drapeaux int8...) ;
+- flottants en float32 quand la conversion est exacte pour toute la
+  colonne (valeurs entières comme koi_teq, koi_steff), float64 sinon : les
+  features calculées depuis le catalogue (et donc les scores) restent
+  identiques au bit près ;
+- chaînes répétitives (dispositions, mission...) en catégories.
+
+L'écriture passe par un répertoire temporaire + os.replace ; les
+instantanés des versions précédentes du même fichier sont supprimés.
+"""
+
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+SNAPSHOT_DIRNAME = "_snapshots"
+CATEGORY_MAX_RATIO = 0.5    # au-delà de 50 % de valeurs distinctes, une catégorie n'économise rien
+COLUMNS_NAME = "columns.json"
+
+
+def source_version(csv_path):
+    st = os.stat(csv_path)
+    return f"{st.st_size:x}-{st.st_mtime_ns:x}"
+
+
+def _snapshot_prefix(csv_path):
+    directory, name = os.path.split(os.path.abspath(csv_path))
+    return os.path.join(directory, SNAPSHOT_DIRNAME, os.path.splitext(name)[0] + "-")
+
+
+def snapshot_path(csv_path):
+    return f"{_snapshot_prefix(csv_path)}{source_version(csv_path)}"
+
+
+def _exact_float32(values):
+    return np.array_equal(values.astype(np.float32).astype(np.float64), values, equal_nan=True)
+
+
+def optimize_dtypes(df):
+    """Copie du DataFrame aux types compacts décrits en tête de module."""
+    out = {}
+    for col in df.columns:
+        s = df[col]
+        if pd.api.types.is_integer_dtype(s) and not pd.api.types.is_bool_dtype(s):
+            s = pd.to_numeric(s, downcast="integer")
+        elif s.dtype == np.float64 and _exact_float32(s.to_numpy()):
+            s = s.astype(np.float32)
+        elif s.dtype == object and len(s):
+            n_unique = s.nunique(dropna=True)
+            if n_unique <= CATEGORY_MAX_RATIO * len(s) and s.dropna().map(type).eq(str).all():
+                s = s.astype("category")
+        out[col] = s
+    return pd.DataFrame(out, index=df.index)
+
+
+def _write_columns(df, directory):
+    columns = []
+    for i, col in enumerate(df.columns):
+        s = df[col]
+        spec = {"name": col}
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            spec["categories"] = s.cat.categories.tolist()
+            values = s.cat.codes.to_numpy()
+        elif s.dtype == object:
+            missing = s.isna().to_numpy()
+            if not s[~missing].map(type).eq(str).all():
+                raise ValueError(f"colonne {col!r} : valeurs non textuelles")
+            spec["text"] = True
+            values = s.where(~missing, "").to_numpy(dtype=str)
+            np.save(os.path.join(directory, f"{i}.missing.npy"), missing)
+        else:
+            values = s.to_numpy()
+        np.save(os.path.join(directory, f"{i}.npy"), values)
+        columns.append(spec)
+    with open(os.path.join(directory, COLUMNS_NAME), "w") as f:
+        json.dump(columns, f)
+
+
+def write_snapshot(df, csv_path):
+    """Écrit l'instantané de la version courante de csv_path ; retourne son chemin."""
+    path = snapshot_path(csv_path)
+    tmp = f"{path}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    try:
+        _write_columns(df, tmp)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp, path)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    prefix = _snapshot_prefix(csv_path)
+    directory = os.path.dirname(prefix)
+    for name in os.listdir(directory):
+        old = os.path.join(directory, name)
+        if old.startswith(prefix) and old != path and not old.endswith(".tmp"):
+            if os.path.isdir(old):
+                shutil.rmtree(old, ignore_errors=True)
+            else:
+                os.remove(old)      # instantanés Parquet des versions précédentes du module
+    return path
+
+
+def read_snapshot(path, columns=None):
+    """DataFrame d'un instantané ; columns : sous-ensemble à lire (les autres fichiers ne sont pas ouverts)."""
+    with open(os.path.join(path, COLUMNS_NAME)) as f:
+        specs = json.load(f)
+    wanted = None if columns is None else set(columns)
+    data = {}
+    for i, spec in enumerate(specs):
+        name = spec["name"]
+        if wanted is not None and name not in wanted:
+            continue
+        values = np.load(os.path.join(path, f"{i}.npy"), mmap_mode="r")
+        if "categories" in spec:
+            data[name] = pd.Categorical.from_codes(np.asarray(values), spec["categories"])
+        elif spec.get("text"):
+            missing = np.load(os.path.join(path, f"{i}.missing.npy"))
+            text = values.astype(object)
+            text[missing] = np.nan
+            data[name] = text
+        else:
+            data[name] = np.array(values)   # copie : le DataFrame ne garde pas le fichier ouvert
+    missing_columns = [] if wanted is None else sorted(wanted - set(data))
+    if missing_columns:
+        raise KeyError(f"Colonnes absentes de l'instantané : {missing_columns}")
+    order = [spec["name"] for spec in specs] if columns is None else list(columns)
+    return pd.DataFrame(data, columns=order)
+
+
+def load_catalog(csv_path, columns=None):
+    """
+    Catalogue typé depuis son instantané (créé au besoin depuis le CSV).
+    columns : sous-ensemble de colonnes à lire (projection).
+    """
+    path = snapshot_path(csv_path)
+    if os.path.isdir(path):
+        try:
+            return read_snapshot(path, columns)
+        except Exception as e:
+            print(f"[Catalog] Instantané illisible ({e}), relecture du CSV.")
+
+    df = optimize_dtypes(pd.read_csv(csv_path))
+    try:
+        write_snapshot(df, csv_path)
+    except (OSError, ValueError) as e:
+        print(f"[Catalog] Instantané non écrit ({e}).")
+    return df[columns] if columns is not None else df
@@ -0,0 +1,158 @@
+"""
+=============================================================================
+P19 - Version publiée des catalogues et différences entre versions
+=============================================================================
+CatalogState regroupe tout ce que lisent les requêtes : DataFrames KOI /
+TESS, leurs CatalogTable, l'index du ciel et l'index des étoiles, plus les
+entrées intermédiaires qui permettent une mise à jour partielle. Un état
+n'est jamais modifié : un rafraîchissement construit une copie modifiée
+(replace) et la publie par une seule affectation. Une requête voit donc
+l'ancienne version ou la nouvelle, jamais un mélange.
+
+diff_tables() compare deux versions d'une table par clé (TOI) et
+empreinte de ligne : lignes ajoutées, retirées, modifiées, et pour chaque
+ligne inchangée sa position dans l'ancienne version (réutilisation des
+entrées déjà construites).
+
+catalog_fingerprint() résume le contenu des catalogues publiés : il entre
+dans la clé des résultats d'analyse mis en cache (src.p23_result_cache),
+qui embarquent métadonnées et voisins issus des catalogues.
+"""
+
+import hashlib
+import json
+
+import numpy as np
+import pandas as pd
+
+
+def row_hashes(df, columns=None):
+    """
+    Empreinte (uint64) de chaque ligne. Les types compacts des instantanés
+    (int8/int32, float32, catégories) sont ramenés à int64 / float64 /
+    object : l'empreinte ne dépend que des valeurs.
+    """
+    columns = list(df.columns) if columns is None else list(columns)
+    raw = {}
+    for c in columns:
+        s = df[c]
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            s = s.astype(object)
+        elif pd.api.types.is_integer_dtype(s) and not pd.api.types.is_bool_dtype(s):
+            s = s.astype("int64")
+        elif pd.api.types.is_float_dtype(s):
+            s = s.astype("float64")
+        raw[c] = s
+    return pd.util.hash_pandas_object(pd.DataFrame(raw, index=df.index), index=False).to_numpy()
+
+
+def catalog_fingerprint(*frames):
+    """Empreinte courte (stable d'un redémarrage à l'autre) du contenu de DataFrames (None admis)."""
+    h = hashlib.sha1()
+    for df in frames:
+        if df is None:
+            h.update(b"none|")
+            continue
+        h.update(json.dumps([str(c) for c in df.columns]).encode())
+        h.update(row_hashes(df).tobytes())
+    return h.hexdigest()[:12]
+
+
+class TableDiff:
+    """Différence entre deux versions d'une table indexée par une clé."""
+
+    def __init__(self, added, removed, changed, old_positions, reordered=False):
+        self.added = added              # clés présentes seulement dans la nouvelle version
+        self.removed = removed          # clés présentes seulement dans l'ancienne
+        self.changed = changed          # clés communes dont la ligne a changé
+        self.old_positions = old_positions  # par ligne nouvelle : position ancienne si inchangée, sinon -1
+        self.reordered = reordered      # mêmes lignes, ordre différent
+
+    @property
+    def empty(self):
+        return not (self.added or self.removed or self.changed or self.reordered)
+
+    @property
+    def n_unchanged(self):
+        return int((self.old_positions >= 0).sum())
+
+    def summary(self):
+        return {"added": len(self.added), "removed": len(self.removed),
+                "changed": len(self.changed), "unchanged": self.n_unchanged}
+
+
+def _keys(df, key):
+    return [None if k != k else k for k in df[key].tolist()]   # NaN → None
+
+
+def diff_tables(old, new, key):
+    """
+    TableDiff de `old` vers `new` (DataFrames) sur la colonne `key`.
+    Sans ancienne version, ou si les colonnes ou l'unicité des clés
+    diffèrent, toutes les lignes sont considérées comme nouvelles ou modifiées.
+    """
+    new_keys = _keys(new, key)
+    if old is None:
+        return TableDiff([k for k in new_keys if k is not None], [], [],
+                         np.full(len(new), -1, dtype=np.int64))
+
+    old_keys = _keys(old, key)
+    old_index = {k: i for i, k in enumerate(old_keys) if k is not None}
+    new_set = {k for k in new_keys if k is not None}
+    removed = [k for k in old_index if k not in new_set]
+    added = [k for k in new_keys if k is not None and k not in old_index]
+
+    old_positions = np.full(len(new), -1, dtype=np.int64)
+    comparable = (list(old.columns) == list(new.columns)
+                  and len(old_index) == len(old) and len(new_set) == len(new))
+    if comparable:
+        old_hash, new_hash = row_hashes(old), row_hashes(new)
+        for i, k in enumerate(new_keys):
+            j = old_index.get(k)
+            if j is not None and old_hash[j] == new_hash[i]:
+                old_positions[i] = j
+    changed = [k for i, k in enumerate(new_keys)
+               if k is not None and k in old_index and old_positions[i] < 0]
+    reordered = not np.array_equal(old_positions, np.arange(len(old)))
+    return TableDiff(added, removed, changed, old_positions, reordered=reordered)
+
+
+class CatalogState:
+    """
+    Version immuable des catalogues servis. replace() retourne une nouvelle
+    version (numéro incrémenté, sauf `version` explicite) ; les champs non
+    cités sont partagés.
+    """
+
+    FIELDS = {
+        "catalog_df": None,         # DataFrame KOI
+        "tess_catalog_df": None,    # DataFrame TESS TOI
+        "kepler_catalog": None,     # CatalogTable (src.p14_catalog_index) de catalog_df
+        "tess_catalog": None,       # CatalogTable de tess_catalog_df
+        "kepler_sky_records": (),   # records SkyIndex des étoiles KOI
+        "tess_sky_records": (),     # records SkyIndex des étoiles TESS
+        "kepler_entries": (),       # entrées de l'index des étoiles : cache Lightkurve + KOI
+        "tess_entries": (),         # une par ligne de tess_catalog_df (None si tid absent)
+        "sky_index": None,          # CombinedSkyIndex (src.p17_sky_index) : Kepler, TESS
+        "star_index": None,         # StarIndex (src.p15_star_index)
+        "catalog_search": None,     # SearchIndex (src.p16_search_index) des lignes KOI et TESS
+        "cache_mtime": None,        # mtime du cache Lightkurve lu pour kepler_entries
+        "fingerprint": None,        # catalog_fingerprint(catalog_df, tess_catalog_df)
+        "version": 0,
+    }
+
+    def __init__(self, **fields):
+        unknown = set(fields) - set(self.FIELDS)
+        if unknown:
+            raise TypeError(f"Champs inconnus : {sorted(unknown)}")
+        for name, default in self.FIELDS.items():
+            object.__setattr__(self, name, fields.get(name, default))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("CatalogState est immuable : utiliser replace().")
+
+    def replace(self, **changes):
+        fields = {name: getattr(self, name) for name in self.FIELDS}
+        fields["version"] = self.version + 1
+        fields.update(changes)
+        return CatalogState(**fields)
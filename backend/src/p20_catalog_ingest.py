@@ -0,0 +1,225 @@
+"""
+=============================================================================
+P20 - Ingestion du catalogue TESS TOI (NASA Exoplanet Archive, TAP)
+=============================================================================
+Code commun au refresh de l'API (app._run_tess_refresh) et au script
+scripts/download_tess_toi.py :
+
+1. download() : requête TAP en flux (Accept-Encoding: gzip), écrite par
+   blocs dans <cache_dir>/toi.csv.gz. Les en-têtes ETag / Last-Modified
+   de la réponse sont gardés à côté (toi.meta.json) et renvoyés
+   (If-None-Match / If-Modified-Since) : un 304 réutilise le fichier local.
+2. parse_toi() : lecture par blocs de lignes du fichier compressé, en ne
+   gardant que les colonnes utiles, puis harmonisation au format KOI
+   (build_toi_catalog : dispositions → target_planet, renommage,
+   coercition numérique, médianes).
+3. ingest_toi() : enchaîne les deux et écrit le CSV final (tmp +
+   os.replace).
+
+Toutes les étapes acceptent un callback progress(stage, done, total)
+(octets reçus, puis lignes lues ; total None si inconnu).
+"""
+
+import gzip
+import json
+import os
+from urllib.parse import quote_plus
+
+import pandas as pd
+import requests
+
+TAP_SYNC_URL = "https://exoplanetarchive.ipac.caltech.edu/TAP/sync"
+
+# Colonnes demandées à la table toi
+TOI_COLUMNS = [
+    "tid", "toi", "tfopwg_disp",
+    "pl_orbper", "pl_orbpererr1", "pl_orbpererr2",
+    "pl_tranmid", "pl_tranmiderr1", "pl_tranmiderr2",
+    "pl_trandurh", "pl_trandurherr1", "pl_trandurherr2",
+    "pl_trandep", "pl_trandeperr1", "pl_trandeperr2",
+    "pl_rade", "pl_radeerr1", "pl_radeerr2",
+    "pl_eqt", "pl_eqterr1", "pl_eqterr2",
+    "pl_insol", "pl_insolerr1", "pl_insolerr2",
+    "st_teff", "st_tefferr1", "st_tefferr2",
+    "st_logg", "st_loggerr1", "st_loggerr2",
+    "st_rad", "st_raderr1", "st_raderr2",
+    "st_tmag", "ra", "dec",
+]
+
+# Noms de colonnes TESS → noms Kepler KOI
+COLUMN_MAP = {
+    "pl_orbper":      "koi_period",
+    "pl_orbpererr1":  "koi_period_err1",
+    "pl_orbpererr2":  "koi_period_err2",
+    "pl_tranmid":     "koi_time0bk",
+    "pl_tranmiderr1": "koi_time0bk_err1",
+    "pl_tranmiderr2": "koi_time0bk_err2",
+    "pl_trandurh":    "koi_duration",
+    "pl_trandurherr1":"koi_duration_err1",
+    "pl_trandurherr2":"koi_duration_err2",
+    "pl_trandep":     "koi_depth",
+    "pl_trandeperr1": "koi_depth_err1",
+    "pl_trandeperr2": "koi_depth_err2",
+    "pl_rade":        "koi_prad",
+    "pl_radeerr1":    "koi_prad_err1",
+    "pl_radeerr2":    "koi_prad_err2",
+    "pl_eqt":         "koi_teq",
+    "pl_insol":       "koi_insol",
+    "pl_insolerr1":   "koi_insol_err1",
+    "pl_insolerr2":   "koi_insol_err2",
+    "st_teff":        "koi_steff",
+    "st_tefferr1":    "koi_steff_err1",
+    "st_tefferr2":    "koi_steff_err2",
+    "st_logg":        "koi_slogg",
+    "st_loggerr1":    "koi_slogg_err1",
+    "st_loggerr2":    "koi_slogg_err2",
+    "st_rad":         "koi_srad",
+    "st_raderr1":     "koi_srad_err1",
+    "st_raderr2":     "koi_srad_err2",
+    "st_tmag":        "koi_kepmag",  # magnitude TESS ≈ magnitude Kepler
+}
+
+DISPOSITION_MAP = {
+    "CP": 1,   # Confirmed Planet
+    "KP": 1,   # Known Planet
+    "FP": 0,   # False Positive
+    "FA": 0,   # False Alarm
+}
+
+OUTPUT_COLUMNS = list(COLUMN_MAP.values()) + ["ra", "dec", "target_planet", "mission", "tid", "toi"]
+NON_NUMERIC = ("mission", "tid", "toi", "target_planet")
+
+DOWNLOAD_NAME = "toi.csv.gz"
+META_NAME = "toi.meta.json"
+BLOCK_SIZE = 1 << 16        # octets par bloc reçu
+CHUNK_ROWS = 2000           # lignes par bloc analysé
+TIMEOUT = 60
+
+
+def toi_query_url(base_url=TAP_SYNC_URL, columns=TOI_COLUMNS):
+    """URL TAP synchrone : SELECT <colonnes> FROM toi, format CSV."""
+    query = f"SELECT {','.join(columns)} FROM toi"
+    return f"{base_url}?query={quote_plus(query, safe=',')}&format=csv"
+
+
+# ── Téléchargement ──────────────────────────────────────────────────────────
+
+def _read_meta(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def download(url, cache_dir, progress=None, session=None, timeout=TIMEOUT):
+    """
+    Télécharge `url` dans <cache_dir>/toi.csv.gz (recompressé en gzip).
+    Retourne (chemin, modifié) ; modifié est False si le serveur a répondu
+    304 et que le fichier local est réutilisé.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, DOWNLOAD_NAME)
+    meta_path = os.path.join(cache_dir, META_NAME)
+
+    headers = {"Accept-Encoding": "gzip"}
+    meta = _read_meta(meta_path) if os.path.exists(path) else {}
+    if meta.get("url") == url:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    http = session or requests
+    with http.get(url, headers=headers, stream=True, timeout=timeout) as resp:
+        if resp.status_code == 304:
+            if progress:
+                progress("download", 0, 0)
+            return path, False
+        resp.raise_for_status()
+
+        # Octets reçus sur le réseau (compressés si Content-Encoding: gzip)
+        total = resp.headers.get("Content-Length")
+        total = int(total) if total and total.isdigit() else None
+        tmp = path + ".tmp"
+        with gzip.open(tmp, "wb", compresslevel=6) as out:
+            for block in resp.iter_content(chunk_size=BLOCK_SIZE):
+                out.write(block)
+                if progress:
+                    progress("download", resp.raw.tell(), total)
+        os.replace(tmp, path)
+
+        meta = {"url": url, "etag": resp.headers.get("ETag"),
+                "last_modified": resp.headers.get("Last-Modified")}
+    tmp = meta_path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp, meta_path)
+    return path, True
+
+
+# ── Analyse ─────────────────────────────────────────────────────────────────
+
+def build_toi_catalog(df):
+    """
+    Table TOI brute → format KOI : lignes CP/KP/FP/FA seulement,
+    target_planet binaire, colonnes renommées, valeurs numériques forcées
+    et complétées par la médiane de la colonne.
+    """
+    df_f = df[df["tfopwg_disp"].isin(set(DISPOSITION_MAP))].copy()
+    if len(df_f) == 0:
+        raise ValueError("Aucune entrée CP/KP/FP/FA dans la réponse NASA.")
+
+    df_f["target_planet"] = df_f["tfopwg_disp"].map(DISPOSITION_MAP)
+    df_f = df_f.rename(columns=COLUMN_MAP)
+    df_f["mission"] = "TESS"
+
+    df_out = df_f[[c for c in OUTPUT_COLUMNS if c in df_f.columns]].copy()
+    for col in [c for c in df_out.columns if c not in NON_NUMERIC]:
+        df_out[col] = pd.to_numeric(df_out[col], errors="coerce")
+        if df_out[col].isna().any():
+            df_out[col] = df_out[col].fillna(df_out[col].median())
+    return df_out
+
+
+def parse_toi(path, progress=None, chunksize=CHUNK_ROWS):
+    """
+    Lit le CSV TOI (compressé ou non) par blocs de `chunksize` lignes, en ne
+    gardant que TOI_COLUMNS, et retourne (table brute, table au format KOI).
+    """
+    wanted = set(TOI_COLUMNS)
+    chunks, rows = [], 0
+    with pd.read_csv(path, usecols=lambda c: c in wanted, chunksize=chunksize,
+                     compression="infer") as reader:
+        for chunk in reader:
+            chunks.append(chunk)
+            rows += len(chunk)
+            if progress:
+                progress("parse", rows, None)
+    raw = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=TOI_COLUMNS)
+    return raw, build_toi_catalog(raw)
+
+
+def write_csv(df, output_path):
+    tmp = f"{output_path}.tmp"
+    df.to_csv(tmp, index=False)
+    os.replace(tmp, output_path)
+
+
+def ingest_toi(output_path, cache_dir, url=None, progress=None, session=None, force=False):
+    """
+    Télécharge (si modifié), analyse et écrit le catalogue TOI au format KOI.
+    Retourne (DataFrame ou None, infos) ; DataFrame None si la source n'a
+    pas changé depuis le dernier téléchargement et que output_path existe
+    (sauf force=True).
+    """
+    url = url or toi_query_url()
+    path, modified = download(url, cache_dir, progress=progress, session=session)
+    info = {"modified": modified, "download_bytes": os.path.getsize(path)}
+    if not modified and not force and os.path.exists(output_path):
+        return None, info
+
+    raw, df_out = parse_toi(path, progress=progress)
+    info.update(n_raw=len(raw), dispositions=raw["tfopwg_disp"].value_counts().to_dict())
+    write_csv(df_out, output_path)
+    return df_out, info
@@ -0,0 +1,279 @@
+"""
+=============================================================================
+P21 - Client TAP NASA Exoplanet Archive (données stellaires /api/star_info)
+=============================================================================
+NasaTapClient.star_info(targets) résout plusieurs cibles à la fois :
+
+1. cache : une entrée par étoile hôte (nom en minuscules), gardée TTL
+   secondes dans un LRUCache (src.p22_lru_cache) borné à MAX_BYTES et dans
+   un fichier JSON (tmp + os.replace), donc conservée d'un redémarrage à
+   l'autre. Le fichier est réécrit au plus une fois par SAVE_DELAY secondes
+   (et par flush() à l'arrêt), pas à chaque lot. Les échecs réseau ne sont
+   gardés que ERROR_TTL secondes, en mémoire seulement.
+2. regroupement : une étoile déjà demandée par un autre thread n'est pas
+   redemandée ; on attend sa réponse.
+3. lots : les étoiles manquantes partent par lots de BATCH_SIZE dans une
+   seule requête ADQL `UPPER(hostname) IN (...)` sur la table ps, puis
+   une sur stellarhosts pour celles sans planète.
+
+Les requêtes passent par une requests.Session (connexions keep-alive
+réutilisées, pool de POOL_SIZE, reprises sur 502/503/504).
+"""
+
+import json
+import os
+import re
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from src.p22_lru_cache import LRUCache
+
+TAP_SYNC_URL = "https://exoplanetarchive.ipac.caltech.edu/TAP/sync"
+
+TTL = 3600 * 24         # 24 h
+ERROR_TTL = 300         # réponse vide après une erreur NASA : 5 min, non persistée
+BATCH_SIZE = 50         # étoiles par requête ADQL (longueur d'URL)
+POOL_SIZE = 8
+MAX_BYTES = 16 * 1024 * 1024  # cache mémoire ; les plus anciennes entrées sont évincées au-delà
+SAVE_DELAY = 5.0        # secondes entre deux réécritures du cache disque
+TIMEOUT = 8
+
+PLANET_COLUMNS = ("hostname, pl_name, pl_orbper, pl_rade, pl_eqt, pl_insol, "
+                  "st_teff, st_rad, st_mass, st_lum, sy_dist, sy_kmag, disc_year, disc_method")
+STAR_COLUMNS = "hostname, st_teff, st_rad, st_mass, st_lum, sy_dist, sy_kmag"
+
+
+def hostname_from_target(target):
+    """Retire le suffixe de planète éventuel (ex: 'Kepler-452b' → 'Kepler-452')."""
+    t = target.strip()
+    t = re.sub(r'(\d)\s*[b-z]$', r'\1', t, flags=re.IGNORECASE)
+    return t
+
+
+def adql_in(values):
+    """Liste ADQL de chaînes en majuscules : ('A', 'B''C')."""
+    return "(" + ", ".join("'" + v.upper().replace("'", "''") + "'" for v in values) + ")"
+
+
+def _stellar(row):
+    return {
+        "teff":        row.get("st_teff"),       # Température eff. (K)
+        "radius":      row.get("st_rad"),        # Rayon (R☉)
+        "mass":        row.get("st_mass"),       # Masse (M☉)
+        "luminosity":  row.get("st_lum"),        # Luminosité (log L☉)
+        "distance_pc": row.get("sy_dist"),       # Distance (pc)
+        "kmag":        row.get("sy_kmag"),       # Magnitude K
+    }
+
+
+def _planet(row):
+    return {
+        "name":         row.get("pl_name"),
+        "period_days":  row.get("pl_orbper"),
+        "radius_earth": row.get("pl_rade"),
+        "eq_temp":      row.get("pl_eqt"),
+        "insolation":   row.get("pl_insol"),
+        "disc_year":    row.get("disc_year"),
+        "disc_method":  row.get("disc_method"),
+    }
+
+
+class StarInfoCache:
+    """
+    Cache par clé d'étoile : LRUCache en mémoire (src.p22_lru_cache), dont
+    les entrées persist=True sont recopiées dans le fichier JSON `path`,
+    save_delay secondes après le premier ajout non encore écrit.
+    """
+
+    def __init__(self, path=None, ttl=TTL, max_bytes=MAX_BYTES, save_delay=SAVE_DELAY):
+        self.path = path
+        self.ttl = ttl
+        self.save_delay = save_delay
+        self._save_lock = threading.Lock()
+        self._timer_lock = threading.Lock()
+        self._timer = None              # réécriture programmée (threading.Timer)
+        self.lru = LRUCache("star_info", max_bytes=max_bytes, ttl=ttl)
+        if path and os.path.exists(path):
+            try:
+                with open(path) as f:
+                    saved = json.load(f)
+                now = time.time()
+                for key, e in saved.items():
+                    left = e.get("ttl", ttl) - (now - e["ts"])
+                    if left > 0:
+                        self.lru.put(key, e, ttl=left)
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                print(f"[star_info] Cache disque illisible ({e}), ignoré.")
+
+    def __len__(self):
+        return len(self.lru)
+
+    def __contains__(self, key):
+        return key in self.lru
+
+    def get(self, key):
+        entry = self.lru.get(key)
+        return None if entry is None else entry["data"]
+
+    def peek(self, key):
+        entry = self.lru.peek(key)
+        return None if entry is None else entry["data"]
+
+    def put_many(self, items, ttl=None, persist=True):
+        now = time.time()
+        ttl = self.ttl if ttl is None else ttl
+        for key, data in items.items():
+            self.lru.put(key, {"data": data, "ts": now, "ttl": ttl, "persist": persist}, ttl=ttl)
+        if persist and self.path:
+            self._schedule_save()
+
+    def _schedule_save(self):
+        with self._timer_lock:
+            if self._timer is not None:
+                return                  # les ajouts suivants partent avec l'écriture programmée
+            self._timer = threading.Timer(self.save_delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        """Écrit immédiatement les ajouts en attente (appelé par le timer et à l'arrêt)."""
+        with self._timer_lock:
+            timer, self._timer = self._timer, None
+        if timer is None:
+            return
+        timer.cancel()
+        self._save()
+
+    def _save(self):
+        with self._save_lock:
+            saved = {k: e for k, e in self.lru.items() if e["persist"]}
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp = f"{self.path}.tmp"
+            try:
+                with open(tmp, "w") as f:
+                    json.dump(saved, f)
+                os.replace(tmp, self.path)
+            except OSError as e:
+                print(f"[star_info] Cache disque non écrit ({e}).")
+
+
+class NasaTapClient:
+    def __init__(self, url=TAP_SYNC_URL, cache_path=None, ttl=TTL, batch_size=BATCH_SIZE,
+                 pool_size=POOL_SIZE, timeout=TIMEOUT, session=None):
+        self.url = url
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.cache = StarInfoCache(cache_path, ttl)
+        self.session = session or self._session(pool_size)
+        self._inflight = {}             # clé → threading.Event de la requête en cours
+        self._inflight_lock = threading.Lock()
+        self._counters_lock = threading.Lock()
+        self.counters = {"coalesced": 0, "queries": 0, "errors": 0}
+
+    def _count(self, name):
+        with self._counters_lock:
+            self.counters[name] += 1
+
+    @staticmethod
+    def _session(pool_size):
+        retry = Retry(total=2, backoff_factor=0.5, status_forcelist=(502, 503, 504),
+                      allowed_methods=("GET",))
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def query(self, adql):
+        """Lance une requête ADQL sur le TAP NASA et retourne la liste de dicts."""
+        self._count("queries")
+        resp = self.session.get(self.url, params={"query": adql, "format": "json"}, timeout=self.timeout)
+        resp.raise_for_status()
+        return resp.json() or []
+
+    # ── Étoiles hôtes ───────────────────────────────────────────────────────
+
+    def _fetch(self, hostnames):
+        """{clé: données} pour un lot d'étoiles (deux requêtes au plus)."""
+        keys = {h.upper(): h.lower() for h in hostnames}
+        found = {}
+        for r in self.query(f"SELECT {PLANET_COLUMNS} FROM ps "
+                            f"WHERE UPPER(hostname) IN {adql_in(keys)} AND default_flag = 1"):
+            key = keys.get(str(r.get("hostname", "")).upper())
+            if key is None:
+                continue
+            if key not in found:
+                found[key] = {"stellar": _stellar(r), "planets": [], "source": "NASA Exoplanet Archive"}
+            found[key]["planets"].append(_planet(r))
+
+        # Fallback : table stellarhosts (étoiles sans planète confirmée)
+        rest = [h for h, k in keys.items() if k not in found]
+        if rest:
+            for s in self.query(f"SELECT {STAR_COLUMNS} FROM stellarhosts "
+                                f"WHERE UPPER(hostname) IN {adql_in(rest)} AND default_flag = 1"):
+                key = keys.get(str(s.get("hostname", "")).upper())
+                if key is not None and key not in found:
+                    found[key] = {"stellar": _stellar(s), "planets": [],
+                                  "source": "NASA Exoplanet Archive (stellar hosts)"}
+
+        empty = {"stellar": None, "planets": [], "source": None}
+        return {k: found.get(k, empty) for k in keys.values()}
+
+    def _resolve(self, hostnames):
+        """Étoiles absentes du cache : lots ADQL, en regroupant avec les threads concurrents."""
+        owned, waiting = {}, []
+        with self._inflight_lock:
+            for h in hostnames:
+                key = h.lower()
+                if key in owned or key in self.cache:
+                    continue
+                event = self._inflight.get(key)
+                if event is None:
+                    owned[key] = h
+                    self._inflight[key] = threading.Event()
+                else:
+                    waiting.append(event)
+                    self._count("coalesced")
+
+        try:
+            names = list(owned.values())
+            for i in range(0, len(names), self.batch_size):
+                batch = names[i:i + self.batch_size]
+                try:
+                    self.cache.put_many(self._fetch(batch))
+                except Exception as exc:
+                    self._count("errors")
+                    print(f"[star_info] Erreur NASA API pour {batch}: {exc}")
+                    # On ne lève pas — résultat vide renvoyé proprement, redemandé après ERROR_TTL
+                    self.cache.put_many({h.lower(): {"stellar": None, "planets": [], "source": None}
+                                         for h in batch}, ttl=ERROR_TTL, persist=False)
+        finally:
+            with self._inflight_lock:
+                for key in owned:
+                    self._inflight.pop(key).set()
+
+        for event in waiting:
+            event.wait(self.timeout * 3)
+
+    def star_info(self, targets):
+        """{cible: {"target", "hostname", "stellar", "planets", "source"}} pour chaque cible."""
+        hostnames = {t: hostname_from_target(t) for t in targets}
+        unique = {h.lower(): h for h in hostnames.values()}
+        found = {key: self.cache.get(key) for key in unique}
+        missing = [unique[key] for key, data in found.items() if data is None]
+        if missing:
+            self._resolve(missing)
+            found.update((h.lower(), self.cache.peek(h.lower())) for h in missing)
+
+        empty = {"stellar": None, "planets": [], "source": None}
+        return {target: {"target": target, "hostname": hostname, **(found[hostname.lower()] or empty)}
+                for target, hostname in hostnames.items()}
+
+    def stats(self):
+        with self._counters_lock:
+            counters = dict(self.counters)
+        return {**self.cache.lru.stats(), **counters, "inflight": len(self._inflight)}
@@ -0,0 +1,162 @@
+"""
+=============================================================================
+P22 - Cache LRU borné (nombre d'entrées, octets, durée de vie)
+=============================================================================
+LRUCache remplace les dict utilisés comme caches dans l'API : l'entrée la
+moins récemment lue est évincée dès que le cache dépasse max_entries ou
+max_bytes, et une entrée plus vieille que son TTL n'est plus servie (elle
+est retirée à la lecture, à l'écriture si elle est en tête de l'ordre LRU,
+ou par purge_expired()).
+
+La taille d'une entrée est estimée une fois, à l'écriture, par deep_sizeof
+(sys.getsizeof récursif sur dict / list / tuple / set, objets partagés
+comptés une fois). stats() donne le nombre d'entrées, les octets occupés
+et les compteurs hits / misses / evictions / expirations.
+
+Thread-safe : toutes les opérations prennent le verrou du cache.
+"""
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+
+def deep_sizeof(obj):
+    """Taille mémoire approximative (octets) de obj et de son contenu."""
+    seen, stack, total = set(), [obj], 0
+    while stack:
+        o = stack.pop()
+        if id(o) in seen:
+            continue
+        seen.add(id(o))
+        total += sys.getsizeof(o)
+        if isinstance(o, dict):
+            stack.extend(o.keys())
+            stack.extend(o.values())
+        elif isinstance(o, (list, tuple, set, frozenset)):
+            stack.extend(o)
+    return total
+
+
+class LRUCache:
+    def __init__(self, name, max_entries=None, max_bytes=None, ttl=None, sizeof=deep_sizeof):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl                  # secondes, None : pas d'expiration
+        self._sizeof = sizeof
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # clé → (valeur, octets, expiration ou None), plus récente à la fin
+        self._bytes = 0
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and not self._expired(entry, time.time())
+
+    @staticmethod
+    def _expired(entry, now):
+        return entry[2] is not None and now >= entry[2]
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry, time.time()):
+                self._remove(key)
+                self.counters["expirations"] += 1
+                entry = None
+            if entry is None:
+                self.counters["misses"] += 1
+                return default
+            self._entries.move_to_end(key)
+            self.counters["hits"] += 1
+            return entry[0]
+
+    def peek(self, key, default=None):
+        """Comme get(), sans compter l'accès ni changer l'ordre LRU."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or self._expired(entry, time.time()):
+                return default
+            return entry[0]
+
+    def put(self, key, value, ttl=None):
+        """Ajoute ou remplace une entrée ; ttl remplace celui du cache pour cette entrée."""
+        ttl = self.ttl if ttl is None else ttl
+        size = self._sizeof(value)
+        expires = time.time() + ttl if ttl is not None else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, expires)
+            self._bytes += size
+            self._evict(keep=key)
+
+    def _evict(self, keep):
+        now = time.time()
+        while self._entries:            # expirées en tête (les moins récemment lues)
+            oldest = next(iter(self._entries))
+            if oldest == keep or not self._expired(self._entries[oldest], now):
+                break
+            self._remove(oldest)
+            self.counters["expirations"] += 1
+        while self._entries and (
+                (self.max_entries is not None and len(self._entries) > self.max_entries)
+                or (self.max_bytes is not None and self._bytes > self.max_bytes)):
+            oldest = next(iter(self._entries))
+            if oldest == keep:          # une entrée seule plus grosse que le budget reste servie
+                break
+            self._remove(oldest)
+            self.counters["evictions"] += 1
+
+    def pop(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                return default
+            value = self._entries[key][0]
+            self._remove(key)
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def purge_expired(self):
+        """Retire les entrées expirées ; retourne leur nombre."""
+        now = time.time()
+        with self._lock:
+            expired = [k for k, e in self._entries.items() if self._expired(e, now)]
+            for k in expired:
+                self._remove(k)
+            self.counters["expirations"] += len(expired)
+        return len(expired)
+
+    def items(self):
+        """[(clé, valeur)] des entrées valides, de la moins à la plus récemment lue."""
+        now = time.time()
+        with self._lock:
+            return [(k, e[0]) for k, e in self._entries.items() if not self._expired(e, now)]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["misses"]
+            return {
+                "name": self.name,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                **self.counters,
+                "hit_rate": round(self.counters["hits"] / lookups, 4) if lookups else None,
+            }
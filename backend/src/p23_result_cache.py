@@ -0,0 +1,246 @@
+"""
+=============================================================================
+P23 - Cache des résultats d'analyse à deux niveaux (mémoire → SQLite)
+=============================================================================
+Un seul cache pour /api/analyze et /api/analyze/stream :
+
+1. mémoire : LRUCache borné en octets (src.p22_lru_cache) ;
+2. disque : base SQLite locale, une ligne JSON par clé, avec sa date
+   d'écriture et son nombre de lectures. Une lecture trouvée sur disque
+   est recopiée en mémoire.
+
+Clé : ResultKey(vue, cible, mission, modèle, pipeline, catalogue)
+- vue : "analyze" ou "stream" (les deux routes n'ont pas le même format
+  de réponse) ;
+- cible normalisée (p06.normalize_target) ;
+- modèle : empreinte du modèle qui calcule le résultat
+  (ModelBundle.fingerprint du bundle lu par la requête) ;
+- pipeline : hash de la version du code de features, des paramètres de
+  prétraitement / BLS (p06) et de RESULT_SCHEMA_VERSION ;
+- catalogue : empreinte des catalogues KOI / TESS publiés
+  (p19.catalog_fingerprint) : les résultats embarquent métadonnées et
+  voisins tirés des catalogues, un rafraîchissement TESS les périme.
+
+Un changement de modèle, de pipeline ou de catalogue change donc la clé :
+les anciens verdicts ne sont plus servis, sans invalidation explicite. Les
+lignes des autres versions restent sur disque jusqu'à STORE_TTL (retour
+arrière sur une version précédente sans recalcul). En mémoire, une entrée
+vit au plus MEMORY_TTL.
+
+Chaque lecture compte pour la popularité d'une clé : celles servies par la
+mémoire sont cumulées puis reportées dans la colonne hits de SQLite par
+lots (HIT_FLUSH_EVERY lectures ou HIT_FLUSH_SECONDS). warm_up() recharge
+en mémoire, au démarrage, les clés les plus lues des versions courantes.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+from src.p06_feature_store import compute_code_version, normalize_target, params_hash
+from src.p22_lru_cache import LRUCache
+
+# À incrémenter si le format des résultats d'analyse change
+RESULT_SCHEMA_VERSION = 1
+
+MEMORY_MAX_BYTES = 128 * 1024 * 1024   # un résultat pèse ~0,2 Mo avec ses 800 points de courbe
+MEMORY_TTL = 600                       # 10 min
+STORE_TTL = 30 * 24 * 3600             # 30 jours
+WARM_UP_KEYS = 64
+HIT_FLUSH_EVERY = 64                   # lectures mémoire cumulées avant report dans SQLite
+HIT_FLUSH_SECONDS = 60
+
+
+def pipeline_hash():
+    payload = f"{compute_code_version()}|{params_hash()}|schema={RESULT_SCHEMA_VERSION}"
+    return hashlib.sha1(payload.encode()).hexdigest()[:12]
+
+
+class ResultKey(namedtuple("ResultKey", "view target mission model pipeline catalog")):
+    @property
+    def id(self):
+        return "|".join(str(part) for part in self)
+
+
+class ResultStore:
+    """Niveau disque : table SQLite results (une connexion partagée, protégée par un verrou)."""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                " key TEXT PRIMARY KEY, view TEXT, target TEXT, mission TEXT,"
+                " model TEXT, pipeline TEXT, catalog TEXT, value TEXT,"
+                " created_at REAL, accessed_at REAL, hits INTEGER DEFAULT 0)")
+            columns = {row[1] for row in self._db.execute("PRAGMA table_info(results)")}
+            if "catalog" not in columns:    # base créée avant la colonne catalog
+                self._db.execute("ALTER TABLE results ADD COLUMN catalog TEXT")
+            self._db.execute("DROP INDEX IF EXISTS results_hot")
+            self._db.execute("CREATE INDEX IF NOT EXISTS results_hot_v2 ON results (model, pipeline, catalog, hits)")
+
+    def get(self, key, max_age=None):
+        now = time.time()
+        with self._lock, self._db:
+            row = self._db.execute("SELECT value, created_at FROM results WHERE key = ?",
+                                   (key.id,)).fetchone()
+            if row is None or (max_age is not None and now - row[1] >= max_age):
+                return None
+            self._db.execute("UPDATE results SET hits = hits + 1, accessed_at = ? WHERE key = ?",
+                             (now, key.id))
+        return json.loads(row[0])
+
+    def put(self, key, value):
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO results"
+                " (key, view, target, mission, model, pipeline, catalog, value, created_at, accessed_at, hits)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 0)",
+                (key.id, *[str(part) for part in key], json.dumps(value), now, now))
+
+    def add_hits(self, hits, accessed_at=None):
+        """Reporte des lectures servies ailleurs (mémoire) : {key.id: nombre}."""
+        now = accessed_at or time.time()
+        with self._lock, self._db:
+            self._db.executemany("UPDATE results SET hits = hits + ?, accessed_at = ? WHERE key = ?",
+                                 [(n, now, key_id) for key_id, n in hits.items()])
+
+    def hot(self, model, pipeline, catalog, limit, max_age=None):
+        """[(ResultKey, valeur)] des `limit` clés les plus lues pour ces versions."""
+        since = time.time() - max_age if max_age is not None else 0
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT view, target, mission, model, pipeline, catalog, value FROM results"
+                " WHERE model = ? AND pipeline = ? AND catalog = ? AND created_at > ?"
+                " ORDER BY hits DESC, accessed_at DESC LIMIT ?",
+                (str(model), str(pipeline), str(catalog), since, limit)).fetchall()
+        return [(ResultKey(*row[:6]), json.loads(row[6])) for row in rows]
+
+    def purge(self, max_age):
+        with self._lock, self._db:
+            return self._db.execute("DELETE FROM results WHERE created_at <= ?",
+                                    (time.time() - max_age,)).rowcount
+
+    def clear(self):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM results")
+
+    def stats(self):
+        with self._lock:
+            rows, size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM results").fetchone()
+        return {"path": self.path, "rows": rows, "bytes": size}
+
+
+class TieredResultCache:
+    def __init__(self, store_path, memory_max_bytes=MEMORY_MAX_BYTES, store_ttl=STORE_TTL,
+                 memory_ttl=MEMORY_TTL):
+        self.memory = LRUCache("results", max_bytes=memory_max_bytes, ttl=memory_ttl)
+        self.store = ResultStore(store_path)
+        self.store_ttl = store_ttl
+        self.model = None
+        self.catalog = None
+        self.pipeline = pipeline_hash()
+        self._lock = threading.Lock()
+        self.counters = {"memory_hits": 0, "store_hits": 0, "misses": 0}
+        self._pending_hits = {}         # key.id → lectures mémoire pas encore reportées dans SQLite
+        self._n_pending = 0
+        self._last_flush = time.time()
+
+    def set_model(self, fingerprint):
+        """Modèle servi ; les entrées mémoire de l'ancien modèle ne sont plus joignables."""
+        if fingerprint != self.model:
+            self.model = fingerprint
+            self.memory.clear()
+
+    def set_catalog(self, fingerprint):
+        """Catalogues publiés ; les entrées mémoire de l'ancienne version ne sont plus joignables."""
+        if fingerprint != self.catalog:
+            self.catalog = fingerprint
+            self.memory.clear()
+
+    def key(self, view, target, mission, model, catalog):
+        """
+        Clé d'un résultat calculé par `model` (empreinte du ModelBundle que
+        l'analyse utilise, None sans modèle) sur les catalogues `catalog`
+        (CatalogState.fingerprint lu par la requête), avec le pipeline courant.
+        """
+        return ResultKey(view, normalize_target(target), mission, model, self.pipeline, catalog)
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _count_memory_hit(self, key):
+        with self._lock:
+            self.counters["memory_hits"] += 1
+            self._pending_hits[key.id] = self._pending_hits.get(key.id, 0) + 1
+            self._n_pending += 1
+            due = (self._n_pending >= HIT_FLUSH_EVERY
+                   or time.time() - self._last_flush >= HIT_FLUSH_SECONDS)
+        if due:
+            self.flush_hits()
+
+    def flush_hits(self):
+        """Reporte dans SQLite les lectures servies par la mémoire depuis le dernier report."""
+        with self._lock:
+            pending, self._pending_hits, self._n_pending = self._pending_hits, {}, 0
+            self._last_flush = time.time()
+        if not pending:
+            return 0
+        try:
+            self.store.add_hits(pending)
+        except sqlite3.Error as e:
+            print(f"[Cache] Lectures non reportées ({e}).")
+        return sum(pending.values())
+
+    def get(self, key):
+        value = self.memory.get(key.id)
+        if value is not None:
+            self._count_memory_hit(key)
+            return value
+        value = self.store.get(key, max_age=self.store_ttl)
+        if value is None:
+            self._count("misses")
+            return None
+        self._count("store_hits")
+        self.memory.put(key.id, value)
+        return value
+
+    def put(self, key, value):
+        self.memory.put(key.id, value)
+        try:
+            self.store.put(key, value)
+        except sqlite3.Error as e:
+            print(f"[Cache] Résultat non persisté ({e}).")
+
+    def warm_up(self, limit=WARM_UP_KEYS):
+        """Charge en mémoire les clés les plus lues du modèle, du pipeline et des catalogues courants."""
+        self.flush_hits()
+        self.store.purge(self.store_ttl)
+        hot = self.store.hot(self.model, self.pipeline, self.catalog, limit, max_age=self.store_ttl)
+        for key, value in reversed(hot):     # la plus lue en dernier : la plus récente pour le LRU
+            self.memory.put(key.id, value)
+        return len(hot)
+
+    def clear(self):
+        with self._lock:
+            self._pending_hits, self._n_pending = {}, 0
+        self.memory.clear()
+        self.store.clear()
+
+    def stats(self):
+        self.flush_hits()
+        with self._lock:
+            counters = dict(self.counters)
+        return {"model": self.model, "pipeline": self.pipeline, "catalog": self.catalog, **counters,
+                "memory": self.memory.stats(), "store": self.store.stats()}
@@ -0,0 +1,92 @@
+"""
+Micro-batching de l'inférence (src/p11_batching) : un lot part dès
+max_batch demandes ou à la fin de la fenêtre, chaque appelant reçoit son
+propre score, les contextes ne sont jamais mélangés.
+
+Usage :
+    cd backend && python -m pytest -q test_batching.py
+"""
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from src.p11_batching import MicroBatcher
+
+
+class _Recorder:
+    """score_batch factice : score = somme de la ligne ; mémorise la taille et le contexte de chaque lot."""
+
+    def __init__(self):
+        self.batches = []
+        self._lock = threading.Lock()
+
+    def __call__(self, X, context):
+        with self._lock:
+            self.batches.append((len(X), context))
+        return X.sum(axis=1)
+
+
+def _score_concurrently(batcher, rows, contexts=None):
+    contexts = contexts or [None] * len(rows)
+    results = [None] * len(rows)
+
+    def call(i):
+        results[i] = batcher.score(rows[i], contexts[i])
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(len(rows))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def test_flushes_when_batch_is_full():
+    recorder = _Recorder()
+    batcher = MicroBatcher(recorder, window_ms=5000, max_batch=4)
+    rows = [np.full(3, i, dtype=np.float32) for i in range(8)]
+    started = time.perf_counter()
+    results = _score_concurrently(batcher, rows)
+    # Sans le plafond, la fenêtre de 5 s serait attendue
+    assert time.perf_counter() - started < 2.0
+    assert results == [3.0 * i for i in range(8)]
+    assert [n for n, _ in recorder.batches] == [4, 4]
+    assert batcher.stats()["batch_size"]["count"] == 2
+
+
+def test_flushes_when_window_ends():
+    recorder = _Recorder()
+    batcher = MicroBatcher(recorder, window_ms=50, max_batch=64)
+    started = time.perf_counter()
+    assert batcher.score(np.ones(3)) == 3.0
+    elapsed = time.perf_counter() - started
+    assert 0.04 <= elapsed < 1.0
+    assert recorder.batches == [(1, None)]
+    assert batcher.stats()["queue_wait_ms"]["count"] == 1
+
+
+def test_batches_never_mix_contexts():
+    recorder = _Recorder()
+    batcher = MicroBatcher(recorder, window_ms=100, max_batch=64)
+    model_a, model_b = object(), object()
+    rows = [np.full(2, i, dtype=np.float32) for i in range(10)]
+    contexts = [model_a if i % 2 else model_b for i in range(10)]
+    results = _score_concurrently(batcher, rows, contexts)
+    assert results == [2.0 * i for i in range(10)]
+    assert sum(n for n, _ in recorder.batches) == 10
+    assert {ctx for _, ctx in recorder.batches} == {model_a, model_b}
+
+
+def test_disabled_scores_inline_and_errors_reach_caller():
+    recorder = _Recorder()
+    batcher = MicroBatcher(recorder, window_ms=0)
+    assert batcher.score(np.ones(4)) == 4.0 and batcher._worker is None
+
+    def failing(X, context):
+        raise ValueError("model unavailable")
+
+    batcher = MicroBatcher(failing, window_ms=1, max_batch=8)
+    with pytest.raises(ValueError, match="model unavailable"):
+        batcher.score(np.ones(4))
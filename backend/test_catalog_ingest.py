@@ -0,0 +1,143 @@
+"""
+Ingestion du catalogue TESS TOI (src/p20_catalog_ingest) contre un serveur
+HTTP local qui imite le TAP de la NASA : même table que l'ancien
+pd.read_csv(TAP_URL) + harmonisation, transfert gzip, requêtes
+conditionnelles (ETag / Last-Modified → 304) et suivi de progression.
+
+Usage :
+    cd backend && python -m pytest -q test_catalog_ingest.py
+"""
+import gzip
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.p20_catalog_ingest import (COLUMN_MAP, DISPOSITION_MAP, TOI_COLUMNS, ingest_toi,
+                                    toi_query_url)
+
+LAST_MODIFIED = "Mon, 05 Oct 2026 08:00:00 GMT"
+
+
+def _synthetic_toi_csv(n=5000, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({c: rng.normal(100, 30, n) for c in TOI_COLUMNS})
+    df["tid"] = rng.integers(1_000_000, 400_000_000, n)
+    df["toi"] = np.round(np.arange(n) / 100 + 101.01, 2)
+    df["tfopwg_disp"] = rng.choice(["CP", "KP", "FP", "FA", "PC", "APC"], n)
+    for col in ("pl_eqt", "st_logg", "pl_insolerr1"):
+        df.loc[rng.random(n) < 0.1, col] = np.nan
+    df["extra_column"] = "ignored"     # colonne non demandée : projetée à la lecture
+    return df.to_csv(index=False).encode()
+
+
+class _TapStandIn(BaseHTTPRequestHandler):
+    body = b""
+    requests_seen = []
+
+    def do_GET(self):
+        type(self).requests_seen.append(dict(self.headers))
+        etag = '"' + hashlib.sha1(self.body).hexdigest() + '"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        payload, encoding = self.body, None
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            payload, encoding = gzip.compress(self.body), "gzip"
+        self.send_response(200)
+        self.send_header("Content-Type", "text/csv")
+        self.send_header("Content-Length", str(len(payload)))
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", LAST_MODIFIED)
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def tap_server():
+    _TapStandIn.body = _synthetic_toi_csv()
+    _TapStandIn.requests_seen = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _TapStandIn)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield toi_query_url(f"http://127.0.0.1:{server.server_port}/TAP/sync")
+    server.shutdown()
+    server.server_close()
+
+
+def _legacy_refresh(url):
+    """Ancien _run_tess_refresh : lecture complète de la réponse puis harmonisation."""
+    df = pd.read_csv(url)
+    df_f = df[df["tfopwg_disp"].isin(set(DISPOSITION_MAP.keys()))].copy()
+    df_f["target_planet"] = df_f["tfopwg_disp"].map(DISPOSITION_MAP)
+    df_f = df_f.rename(columns=COLUMN_MAP)
+    df_f["mission"] = "TESS"
+    kepler_cols = list(COLUMN_MAP.values()) + ["ra", "dec", "target_planet", "mission", "tid", "toi"]
+    df_out = df_f[[c for c in kepler_cols if c in df_f.columns]].copy()
+    for col in [c for c in df_out.columns if c not in ("mission", "tid", "toi", "target_planet")]:
+        df_out[col] = pd.to_numeric(df_out[col], errors="coerce")
+        if df_out[col].isna().any():
+            df_out[col] = df_out[col].fillna(df_out[col].median())
+    return df_out
+
+
+def test_ingest_matches_legacy_read(tap_server, tmp_path):
+    out = tmp_path / "tess_toi_binary.csv"
+    df, info = ingest_toi(str(out), str(tmp_path / "dl"), url=tap_server)
+
+    expected = _legacy_refresh(tap_server)
+    pd.testing.assert_frame_equal(df.reset_index(drop=True), expected.reset_index(drop=True))
+    pd.testing.assert_frame_equal(pd.read_csv(out), pd.read_csv(pd.io.common.StringIO(expected.to_csv(index=False))))
+    assert info["modified"] and info["n_raw"] == 5000
+    assert "extra_column" not in df.columns
+
+
+def test_download_is_compressed(tap_server, tmp_path):
+    ingest_toi(str(tmp_path / "out.csv"), str(tmp_path / "dl"), url=tap_server)
+
+    assert "gzip" in _TapStandIn.requests_seen[0]["Accept-Encoding"]
+    cached = (tmp_path / "dl" / "toi.csv.gz").read_bytes()
+    assert gzip.decompress(cached) == _TapStandIn.body
+    assert len(cached) < len(_TapStandIn.body) / 2
+
+
+def test_conditional_request_reuses_download(tap_server, tmp_path):
+    out, dl = str(tmp_path / "out.csv"), str(tmp_path / "dl")
+    first, _ = ingest_toi(out, dl, url=tap_server)
+
+    df, info = ingest_toi(out, dl, url=tap_server)
+    headers = _TapStandIn.requests_seen[-1]
+    assert headers["If-None-Match"].startswith('"') and headers["If-Modified-Since"] == LAST_MODIFIED
+    assert df is None and info["modified"] is False
+
+    # force : nouvelle analyse du fichier local, sans retéléchargement
+    forced, info = ingest_toi(out, dl, url=tap_server, force=True)
+    pd.testing.assert_frame_equal(forced, first)
+    assert info["modified"] is False
+
+    # La table change côté serveur : nouvel ETag, nouveau téléchargement
+    _TapStandIn.body = _synthetic_toi_csv(n=4000, seed=1)
+    df, info = ingest_toi(out, dl, url=tap_server)
+    assert info["modified"] and info["n_raw"] == 4000
+
+
+def test_progress_reports_bytes_and_rows(tap_server, tmp_path):
+    events = []
+    ingest_toi(str(tmp_path / "out.csv"), str(tmp_path / "dl"), url=tap_server,
+               progress=lambda stage, done, total: events.append((stage, done, total)))
+
+    download = [e for e in events if e[0] == "download"]
+    parse = [e for e in events if e[0] == "parse"]
+    sent = len(gzip.compress(_TapStandIn.body))
+    assert download and download[-1][1] == sent and download[-1][2] == sent
+    assert [d for _, d, _ in download] == sorted(d for _, d, _ in download)
+    assert len(parse) == 3 and parse[-1][1] == 5000
@@ -0,0 +1,65 @@
+"""
+Instantanés typés des catalogues (src/p18_catalog_snapshot) : relecture
+identique aux valeurs du CSV, float32 seulement sans perte, projection de
+colonnes, remplacement à chaque nouvelle version du fichier source.
+
+Usage :
+    cd backend && python -m pytest -q test_catalog_snapshot.py
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from src.p18_catalog_snapshot import SNAPSHOT_DIRNAME, load_catalog, snapshot_path
+from src.p19_catalog_state import row_hashes
+
+
+def _csv(tmp_path, n=400, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "kepid": rng.integers(1_000_000, 12_000_000, n),
+        "koi_period": rng.uniform(0.5, 400, n),             # décimales : float64
+        "koi_teq": rng.integers(200, 3000, n).astype(float),  # entiers : float32 exact
+        "koi_disposition": rng.choice(["CONFIRMED", "FALSE POSITIVE"], n),
+        "kepler_name": [f"Kepler-{i} b" if i % 3 == 0 else None for i in range(n)],
+        "flag": rng.integers(0, 2, n),
+    })
+    df.loc[::7, "koi_teq"] = np.nan
+    path = tmp_path / "catalog.csv"
+    df.to_csv(path, index=False)
+    return str(path)
+
+
+def test_snapshot_round_trip(tmp_path):
+    path = _csv(tmp_path)
+    raw = pd.read_csv(path)
+    first = load_catalog(path)                  # écrit l'instantané
+    assert os.path.isdir(snapshot_path(path))
+    second = load_catalog(path)                 # relu depuis l'instantané
+    pd.testing.assert_frame_equal(first, second)
+
+    assert second["koi_teq"].dtype == np.float32
+    assert second["koi_period"].dtype == np.float64
+    assert isinstance(second["koi_disposition"].dtype, pd.CategoricalDtype)
+    assert second["kepler_name"].isna().sum() == raw["kepler_name"].isna().sum()
+    for col in ("koi_period", "koi_teq"):
+        assert np.array_equal(second[col].to_numpy(dtype=float), raw[col].to_numpy(), equal_nan=True)
+    assert (row_hashes(second) == row_hashes(raw)).all()
+
+    projected = load_catalog(path, columns=["koi_teq", "kepid"])
+    assert list(projected.columns) == ["koi_teq", "kepid"]
+    pd.testing.assert_frame_equal(projected, second[["koi_teq", "kepid"]])
+
+
+def test_new_source_version_replaces_snapshot(tmp_path):
+    path = _csv(tmp_path)
+    load_catalog(path)
+    old = snapshot_path(path)
+
+    pd.read_csv(path).head(10).to_csv(path, index=False)
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 10**9))
+    assert len(load_catalog(path)) == 10
+    assert len(load_catalog(path)) == 10
+    assert os.listdir(tmp_path / SNAPSHOT_DIRNAME) == [os.path.basename(snapshot_path(path))]
+    assert not os.path.exists(old)
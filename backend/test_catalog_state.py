@@ -0,0 +1,101 @@
+"""
+Versions publiées des catalogues (src/p19_catalog_state) : empreintes de
+lignes indépendantes des types compacts, différence entre deux versions
+d'une table, CatalogState immuable publié par une seule affectation.
+
+Usage :
+    cd backend && python -m pytest -q test_catalog_state.py
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.p18_catalog_snapshot import optimize_dtypes
+from src.p19_catalog_state import CatalogState, catalog_fingerprint, diff_tables, row_hashes
+
+
+def _toi(n=50, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "toi": np.round(101.01 + np.arange(n), 2),
+        "tid": rng.integers(1_000_000, 400_000_000, n),
+        "koi_period": rng.uniform(0.5, 30, n),
+        "koi_teq": rng.integers(300, 2500, n).astype(float),
+        "target_planet": rng.integers(0, 2, n),
+        "mission": "TESS",
+    })
+
+
+def test_row_hashes_ignore_compact_dtypes():
+    df = _toi()
+    compact = optimize_dtypes(df)
+    assert compact["tid"].dtype != df["tid"].dtype and compact["koi_teq"].dtype == np.float32
+    assert (row_hashes(df) == row_hashes(compact)).all()
+    assert catalog_fingerprint(df, None) == catalog_fingerprint(compact, None)
+
+    changed = df.copy()
+    changed.loc[3, "koi_period"] += 1e-9
+    hashes = row_hashes(changed) != row_hashes(df)
+    assert np.flatnonzero(hashes).tolist() == [3]
+    assert catalog_fingerprint(changed, None) != catalog_fingerprint(df, None)
+
+
+def test_diff_tables_classifies_rows():
+    old = _toi()
+    new = old.drop(index=[0, 1]).copy()
+    new.loc[5, "koi_period"] = 99.0
+    new = pd.concat([new, _toi(2, seed=1).assign(toi=[900.01, 901.01])], ignore_index=True)
+
+    diff = diff_tables(old, new, key="toi")
+    assert sorted(diff.added) == [900.01, 901.01]
+    assert sorted(diff.removed) == [101.01, 102.01]
+    assert diff.changed == [106.01]
+    # Lignes inchangées : position dans l'ancienne version ; ajoutées ou modifiées : -1
+    expected = [i + 2 if i + 2 != 5 else -1 for i in range(len(old) - 2)] + [-1, -1]
+    assert diff.old_positions.tolist() == expected
+    assert diff.summary() == {"added": 2, "removed": 2, "changed": 1, "unchanged": len(old) - 3}
+
+    assert diff_tables(old, old.copy(), key="toi").empty
+    reordered = diff_tables(old, old.iloc[::-1].reset_index(drop=True), key="toi")
+    assert reordered.reordered and not (reordered.added or reordered.removed or reordered.changed)
+
+    first = diff_tables(None, new, key="toi")
+    assert len(first.added) == len(new) and (first.old_positions == -1).all()
+
+    # Colonnes différentes : aucune ligne n'est reprise
+    widened = diff_tables(old, old.assign(extra=1), key="toi")
+    assert (widened.old_positions == -1).all() and len(widened.changed) == len(old)
+
+
+def test_catalog_state_is_immutable_and_swapped_whole():
+    state = CatalogState(tess_catalog_df=_toi(), tess_entries=("a",))
+    with pytest.raises(AttributeError):
+        state.tess_entries = ()
+    with pytest.raises(TypeError):
+        CatalogState(unknown=1)
+
+    nxt = state.replace(tess_entries=("b",))
+    assert (state.version, nxt.version) == (0, 1)
+    assert nxt.tess_catalog_df is state.tess_catalog_df      # champs non cités partagés
+    assert state.tess_entries == ("a",)
+    assert state.replace(version=7).version == 7
+
+    # Un lecteur qui garde sa référence voit un état cohérent pendant les publications
+    published = {"state": CatalogState(tess_entries=(0,), version=0)}
+    mismatches, stop = [], threading.Event()
+
+    def reader():
+        while not stop.is_set():
+            s = published["state"]
+            if s.tess_entries != (s.version,):
+                mismatches.append(s.version)
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    for v in range(1, 2000):
+        published["state"] = published["state"].replace(tess_entries=(v,))
+    stop.set()
+    thread.join()
+    assert mismatches == [] and published["state"].version == 1999
@@ -0,0 +1,111 @@
+"""
+Construction du dataset d'entraînement (src/p05_dataset_manager) : reprise
+de build_dataset après interruption, et mise à jour incrémentale
+d'update_dataset (réutilisation, recalcul, retraits). Le calcul d'une ligne
+est remplacé par une fonction instantanée qui compte ses appels.
+
+Usage :
+    cd backend && python -m pytest -q test_dataset_manager.py
+"""
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from src import p05_dataset_manager
+from src.p05_dataset_manager import (build_dataset, load_dataset, load_partitioned_dataset,
+                                     update_dataset)
+
+
+class _Interrupted(BaseException):
+    """Interruption (Ctrl-C, arrêt du processus) : non rattrapée comme un échec."""
+
+
+def _lc(seed):
+    rng = np.random.default_rng(seed)
+    return SimpleNamespace(time=np.arange(100.0), flux=1 + rng.normal(0, 1e-3, 100))
+
+
+def _samples(ids, seeds=None):
+    seeds = seeds or {}
+    return [(sid, _lc(seeds.get(sid, i)), i % 2) for i, sid in enumerate(ids)]
+
+
+@pytest.fixture
+def processed(monkeypatch):
+    """Remplace le calcul d'une ligne ; processed.calls liste les échantillons calculés."""
+    state = SimpleNamespace(calls=[], fail_at=None)
+
+    def fake_process(sample_id, lc, label, extra=None):
+        if state.fail_at is not None and len(state.calls) == state.fail_at:
+            raise _Interrupted()
+        state.calls.append(sample_id)
+        row = {"target_id": sample_id, "sci_mean": float(np.mean(lc.flux)), "period": 1.0,
+               "mission": "Kepler", "target_label": label}
+        row.update(extra or {})
+        return sample_id, row
+
+    monkeypatch.setattr(p05_dataset_manager, "_process_sample", fake_process)
+    return state
+
+
+def test_build_dataset_resumes_after_interruption(tmp_path, processed):
+    out = str(tmp_path / "staging")
+    samples = _samples([f"KIC {i}" for i in range(7)])
+
+    processed.fail_at = 5
+    with pytest.raises(_Interrupted):
+        build_dataset(samples, output_dir=out, n_workers=1, chunk_size=2)
+    # Deux chunks de 2 écrits et marqués terminés ; le 5e échantillon est perdu
+    assert len(load_dataset(out)) == 4
+
+    processed.fail_at = None
+    processed.calls.clear()
+    assert build_dataset(samples, output_dir=out, n_workers=1, chunk_size=2) == 3
+    assert processed.calls == ["KIC 4", "KIC 5", "KIC 6"]
+    assert sorted(load_dataset(out)["target_id"]) == sorted(s[0] for s in samples)
+
+    processed.calls.clear()
+    assert build_dataset(samples, output_dir=out, n_workers=1, chunk_size=2, resume=False) == 7
+    assert len(processed.calls) == 7 and len(load_dataset(out)) == 7
+
+
+def test_update_dataset_recomputes_only_changed_inputs(tmp_path, processed):
+    out = str(tmp_path / "dataset")
+    ids = [f"KIC {i}" for i in range(6)]
+
+    report = update_dataset(_samples(ids), output_dir=out, n_workers=1)
+    assert (report["recomputed"], report["reused"]) == (6, 0)
+
+    processed.calls.clear()
+    report = update_dataset(_samples(ids), output_dir=out, n_workers=1)
+    assert processed.calls == [] and report["recomputed"] == 0
+
+    # Une courbe modifiée, une retirée
+    report = update_dataset(_samples(ids[:5], seeds={"KIC 2": 99}), output_dir=out, n_workers=1)
+    assert processed.calls == ["KIC 2"]
+    assert (report["reused"], report["recomputed"], report["removed"]) == (4, 1, 1)
+    df = load_partitioned_dataset(out)
+    assert sorted(df["target_id"]) == ids[:5]
+    changed = df.loc[df["target_id"] == "KIC 2", "sci_mean"].item()
+    assert changed == pytest.approx(np.mean(_lc(99).flux))
+
+
+def test_update_dataset_writes_removals_without_new_rows(tmp_path, processed):
+    out = str(tmp_path / "dataset")
+    ids = [f"KIC {i}" for i in range(4)]
+    update_dataset(_samples(ids), output_dir=out, n_workers=1)
+
+    processed.calls.clear()
+    report = update_dataset(_samples(ids[:2]), output_dir=out, n_workers=1)
+    assert processed.calls == [] and report["removed"] == 2
+    assert sorted(load_partitioned_dataset(out)["target_id"]) == ids[:2]
+
+    report = update_dataset([], output_dir=out, n_workers=1)
+    assert report["removed"] == 2
+    assert load_partitioned_dataset(out).empty
+
+    # Le dataset vide reste un point de départ valide
+    report = update_dataset(_samples(ids[:1]), output_dir=out, n_workers=1)
+    assert report["recomputed"] == 1
+    assert list(load_partitioned_dataset(out)["target_id"]) == ids[:1]
@@ -0,0 +1,105 @@
+"""
+Non-régression du résumé statistique partagé (src/p07_flux_stats.FluxSummary) :
+mêmes valeurs que les calculs numpy/scipy d'origine, et un nombre de
+parcours du flux borné quel que soit le nombre de consommateurs.
+
+Usage :
+    cd backend && python -m pytest -q test_flux_stats.py
+"""
+import numpy as np
+import lightkurve as lk
+from scipy import stats
+
+from src.p02_preprocessing import get_period_hint
+from src.p04_features import extract_scientific_features
+from src.p07_flux_stats import FluxSummary, StreamingFluxStats, stream_flux_stats
+
+
+def _synthetic_lc(n=3000, seed=0):
+    rng = np.random.default_rng(seed)
+    time = np.arange(n) * 0.02
+    flux = 1.0 + rng.normal(0, 2e-4, n)
+    flux[(time % 3.3) < 0.1] -= 2e-3
+    return lk.LightCurve(time=time, flux=flux)
+
+
+def _legacy_features(flux):
+    median_flux = np.median(flux)
+    std_flux = np.std(flux)
+    mad = np.median(np.abs(flux - median_flux))
+    threshold = median_flux - 3 * mad
+    return {
+        'sci_std_dev': std_flux,
+        'sci_skewness': stats.skew(flux),
+        'sci_kurtosis': stats.kurtosis(flux),
+        'sci_mad': mad,
+        'sci_amplitude': np.ptp(flux),
+        'sci_transit_depth_p1': median_flux - np.percentile(flux, 1),
+        'sci_transit_depth_p5': median_flux - np.percentile(flux, 5),
+        'sci_transit_depth_min': median_flux - np.min(flux),
+        'sci_rms': np.sqrt(np.mean(flux ** 2)),
+        'sci_iqr': np.percentile(flux, 75) - np.percentile(flux, 25),
+        'sci_below_above_ratio': np.sum(flux < median_flux) / np.sum(flux >= median_flux),
+        'sci_transit_fraction': np.sum(flux < threshold) / len(flux),
+        'sci_low_cluster_mean_gap': np.mean(np.diff(np.where(flux < threshold)[0])),
+    }
+
+
+def test_summary_matches_numpy_order_statistics():
+    flux = np.array(_synthetic_lc().flux.value, dtype=float)
+    s = FluxSummary(flux)
+    assert s.median() == np.median(flux)
+    for p in (1, 5, 25, 75, 99):
+        assert s.percentile(p) == np.percentile(flux, p)
+    assert s.std == np.std(flux)
+    assert s.count_below(s.median()) == np.sum(flux < np.median(flux))
+
+
+def test_features_unchanged():
+    lc = _synthetic_lc()
+    feats = extract_scientific_features(lc)
+    legacy = _legacy_features(np.array(lc.flux.value, dtype=float))
+    for key, expected in legacy.items():
+        assert np.isclose(feats[key], expected, rtol=1e-9, atol=0), key
+
+
+def test_shared_summary_bounds_full_passes():
+    lc = _synthetic_lc()
+    summary = FluxSummary(lc)
+
+    # Les trois consommateurs d'une analyse : BLS, features, caractérisation
+    get_period_hint(lc, flux_summary=summary)
+    extract_scientific_features(lc, flux_summary=summary)
+    summary.median(), summary.percentile(1), summary.std
+
+    # Copie hors NaN + tri + moments + MAD, au lieu d'une quinzaine de
+    # parcours (médianes, percentiles, std, skew, kurtosis…) auparavant.
+    assert summary.passes == 4
+
+
+def test_streaming_sketch_matches_numpy_on_large_gaussian():
+    rng = np.random.default_rng(1)
+    flux = rng.normal(1.0, 0.01, 3_000_000)
+    st = stream_flux_stats(flux)
+
+    for q in (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99):
+        expected = np.quantile(flux, q)
+        assert abs(st.quantile(q) - expected) <= 2 * st.relative_accuracy * abs(expected), q
+    mad = np.median(np.abs(flux - np.median(flux)))
+    assert np.isclose(st.mad(), mad, rtol=0.03)
+    assert np.isclose(st.std, np.std(flux), rtol=1e-9)
+    assert abs(st.count_below(np.median(flux)) - len(flux) / 2) < 0.01 * len(flux)
+
+
+def test_streaming_sketch_collapses_low_magnitude_buckets():
+    rng = np.random.default_rng(2)
+    flux = rng.normal(1.0, 0.01, 200_000)
+    # ~500 buckets nécessaires, 300 couvrent la médiane → max (~5 sigma)
+    st = StreamingFluxStats(max_bins=300)
+    for i in range(0, len(flux), 1 << 14):
+        st.update(flux[i:i + (1 << 14)])
+
+    assert len(st._pos.keys) == 300
+    for q in (0.5, 0.75, 0.99):              # le haut de la distribution reste précis
+        expected = np.quantile(flux, q)
+        assert abs(st.quantile(q) - expected) <= 2 * st.relative_accuracy * abs(expected), q
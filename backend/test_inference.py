@@ -0,0 +1,70 @@
+"""
+Inférence compilée (src/p10_inference.CompiledModel) : probabilités
+identiques bit à bit à XGBClassifier.predict_proba.
+
+Usage :
+    cd backend && python -m pytest -q test_inference.py
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from src.p10_inference import CompiledModel
+
+MODEL_PATH = os.path.join(os.path.dirname(__file__), "..", "models", "exoplanet_model.json")
+
+
+def _random_rows(n_features, n=2000, seed=1):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n, n_features)) * np.abs(rng.normal(size=n_features) * 100)
+    X[rng.random(X.shape) < 0.05] = np.nan
+    return X.astype(np.float32)
+
+
+def test_production_model_bit_exact():
+    reference = xgb.XGBClassifier()
+    reference.load_model(MODEL_PATH)
+    compiled = CompiledModel.load(MODEL_PATH)
+
+    X = _random_rows(compiled.n_features)
+    expected = reference.predict_proba(pd.DataFrame(X, columns=compiled.feature_names))
+    assert np.array_equal(compiled.predict_proba(X), expected)
+    assert compiled.predict_one(X[0]) == float(expected[0, 1])
+
+
+def test_early_stopping_and_split_thresholds(tmp_path):
+    rng = np.random.default_rng(3)
+    X = rng.normal(size=(3000, 9)).astype(np.float32)
+    y = (X[:, 0] + rng.normal(size=3000) > 0.8).astype(int)
+    X[rng.random(X.shape) < 0.1] = np.nan
+    clf = xgb.XGBClassifier(n_estimators=300, early_stopping_rounds=10, max_depth=5)
+    clf.fit(X[:2000], y[:2000], eval_set=[(X[2000:], y[2000:])], verbose=False)
+    path = str(tmp_path / "model.json")
+    clf.save_model(path)
+
+    reference = xgb.XGBClassifier()
+    reference.load_model(path)
+    compiled = CompiledModel.load(path)
+
+    # Valeurs égales aux seuils de split : la comparaison `x < seuil` doit être la même
+    on_split = np.where(rng.random(X.shape) < 0.5,
+                        compiled.threshold[rng.integers(0, len(compiled.threshold), X.shape)], X)
+    for rows in (X, on_split):
+        assert np.array_equal(compiled.predict_proba(rows), reference.predict_proba(rows))
+
+
+def test_staged_margins_match_iteration_range():
+    reference = xgb.XGBClassifier()
+    reference.load_model(MODEL_PATH)
+    booster = reference.get_booster()
+    compiled = CompiledModel.load(MODEL_PATH)
+
+    X = _random_rows(compiled.n_features, n=500)
+    dmatrix = xgb.DMatrix(pd.DataFrame(X, columns=compiled.feature_names))
+    staged = compiled.staged_margins(X)
+    for j, p in enumerate((0.25, 0.50, 0.75, 1.0)):
+        k = max(1, int(compiled.n_trees * p))
+        expected = booster.predict(dmatrix, iteration_range=(0, k), output_margin=True)
+        assert np.array_equal(staged[:, j], expected)
@@ -0,0 +1,80 @@
+"""
+Cache LRU borné (src/p22_lru_cache) : éviction par nombre d'entrées et par
+octets dans l'ordre des lectures, expiration par TTL, accès concurrents.
+
+Usage :
+    cd backend && python -m pytest -q test_lru_cache.py
+"""
+import threading
+import time
+
+from src.p22_lru_cache import LRUCache, deep_sizeof
+
+
+def test_evicts_least_recently_read_over_byte_budget():
+    cache = LRUCache("test", max_bytes=300, sizeof=lambda v: 100)
+    for k in "abc":
+        cache.put(k, k.upper())
+    cache.get("a")                      # b devient la moins récemment lue
+    cache.put("d", "D")
+    assert "b" not in cache
+    assert [k for k, _ in cache.items()] == ["c", "a", "d"]
+    stats = cache.stats()
+    assert (stats["bytes"], stats["evictions"]) == (300, 1)
+
+    # Une entrée seule plus grosse que le budget évince les autres mais reste servie
+    cache = LRUCache("test", max_bytes=300, sizeof=len)
+    cache.put("a", "x" * 100)
+    cache.put("huge", "x" * 1000)
+    assert "a" not in cache and cache.peek("huge") == "x" * 1000
+
+
+def test_entry_budget_and_deep_sizeof():
+    cache = LRUCache("test", max_entries=2)
+    for k in range(5):
+        cache.put(k, [k] * 10)
+    assert [k for k, _ in cache.items()] == [3, 4]
+    assert cache.stats()["bytes"] == 2 * deep_sizeof([0] * 10)
+
+    shared = list(range(100))
+    assert deep_sizeof({"a": shared, "b": shared}) < deep_sizeof({"a": shared, "b": list(range(100))})
+
+
+def test_ttl_expiration():
+    cache = LRUCache("test", ttl=0.05)
+    cache.put("short", 1)
+    cache.put("long", 2, ttl=60)
+    assert "short" in cache and cache.peek("short") == 1
+    time.sleep(0.1)
+    assert "short" not in cache and cache.peek("short") is None
+    assert cache.get("short") is None
+    assert cache.get("long") == 2
+    assert cache.stats()["expirations"] == 1
+
+    cache.put("other", 3)
+    time.sleep(0.1)
+    assert cache.purge_expired() == 1
+    assert [k for k, _ in cache.items()] == ["long"]
+    assert cache.stats()["bytes"] == deep_sizeof(2)
+
+
+def test_concurrent_access_keeps_byte_count():
+    cache = LRUCache("test", max_entries=50, ttl=0.01, sizeof=lambda v: 8)
+
+    def worker(seed):
+        for i in range(2000):
+            k = (seed * 7 + i) % 120
+            cache.put(k, i)
+            cache.get(k)
+            k in cache                  # noqa: B015 — lecture concurrente
+            cache.peek(k + 1)
+            if i % 100 == 0:
+                cache.purge_expired()
+
+    threads = [threading.Thread(target=worker, args=(s,)) for s in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(cache) <= 50
+    assert cache.stats()["bytes"] == 8 * len(cache)
@@ -0,0 +1,125 @@
+"""
+Registre de modèles (src/p12_model_registry) : enregistrement de versions,
+promotion et modèle shadow par pointeurs atomiques, chargement d'un
+ModelBundle et agrégation du scoring en ombre.
+
+Usage :
+    cd backend && python -m pytest -q test_model_registry.py
+"""
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import pytest
+import xgboost as xgb
+
+from src.p12_model_registry import ModelRegistry, ShadowScorer
+
+FEATURES = ["bls_snr", "period", "bls_depth_ppm"]
+
+
+def _model_files(tmp_path, name, seed):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(200, len(FEATURES)))
+    y = (X[:, 0] + rng.normal(0, 0.5, 200) > 0).astype(int)
+    model = xgb.XGBClassifier(n_estimators=5, max_depth=2, random_state=seed)
+    model.fit(X, y)
+    model_path = tmp_path / f"{name}.json"
+    model.save_model(model_path)
+    features_path = tmp_path / f"{name}_features.json"
+    features_path.write_text(json.dumps(FEATURES))
+    metrics_path = tmp_path / f"{name}_metrics.json"
+    metrics_path.write_text(json.dumps({"seed": seed}))
+    return str(model_path), str(features_path), str(metrics_path)
+
+
+def test_register_promote_and_shadow(tmp_path):
+    registry = ModelRegistry(tmp_path / "registry")
+    assert registry.active_version() is None and registry.list_versions() == []
+
+    v1 = registry.register(*_model_files(tmp_path, "a", 1), version="v1", source="test")
+    v2 = registry.register(*_model_files(tmp_path, "b", 2))
+    # Même modèle : pas de doublon, la version existante est retournée
+    assert registry.register(*_model_files(tmp_path, "a", 1)) == v1
+    assert [m["version"] for m in registry.list_versions()] == [v1, v2]
+    assert not [d for d in os.listdir(registry.versions_dir) if d.endswith(".tmp")]
+
+    registry.promote(v1)
+    registry.set_shadow(v2)
+    assert (registry.active_version(), registry.shadow_version()) == (v1, v2)
+    registry.set_shadow(None)
+    assert registry.shadow_version() is None
+
+    with pytest.raises(KeyError):
+        registry.promote("missing")
+    with pytest.raises(ValueError):
+        registry.register(*_model_files(tmp_path, "c", 3), version="../outside")
+    assert registry.active_version() == v1
+
+    bundle = registry.load(v1)
+    assert (bundle.version, bundle.features, bundle.metrics) == (v1, FEATURES, {"seed": 1})
+    assert bundle.fingerprint != registry.load(v2).fingerprint
+    reference = bundle.model.predict_proba(np.array([[1.0, 2.0, 3.0]]))[0][1]
+    assert bundle.score({"bls_snr": 1.0, "period": 2.0, "bls_depth_ppm": 3.0}) == pytest.approx(reference, abs=1e-6)
+
+
+def test_promotion_is_atomic_for_readers(tmp_path):
+    registry = ModelRegistry(tmp_path / "registry")
+    versions = [registry.register(*_model_files(tmp_path, f"m{i}", i), version=f"v{i}") for i in range(3)]
+    registry.promote(versions[0])
+
+    seen, stop = set(), threading.Event()
+
+    def reader():
+        while not stop.is_set():
+            seen.add(registry.active_version())
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    for i in range(300):
+        registry.promote(versions[i % 3])
+    stop.set()
+    thread.join()
+    # Un lecteur ne voit jamais de pointeur vide ou tronqué
+    assert seen <= set(versions)
+
+
+class _Bundle:
+    version = "candidate"
+
+    def score(self, values):
+        if values.get("fail"):
+            raise ValueError("bad row")
+        return values["x"] * 0.5
+
+
+def test_shadow_scorer_aggregates_and_drops_when_full():
+    shadow = ShadowScorer(_Bundle(), queue_size=1000, window=100)
+    for x in (0.2, 0.6, 1.0, 1.6):
+        shadow.submit({"x": x}, active_score=x)
+    shadow.submit({"x": 0.0, "fail": True}, active_score=0.0)
+    deadline = time.time() + 5
+    while shadow.stats()["scored"] + shadow.stats()["errors"] < 5 and time.time() < deadline:
+        time.sleep(0.01)
+    stats = shadow.stats()
+    assert (stats["scored"], stats["errors"], stats["dropped"]) == (4, 1, 0)
+    assert stats["mean_abs_diff"] == pytest.approx(np.mean([0.1, 0.3, 0.5, 0.8]))
+    assert stats["decision_agreement"] == pytest.approx(0.75)    # seul 0.6 (→ 0.3) change de côté
+    shadow.stop()
+
+    # File pleine : les vecteurs en trop sont abandonnés sans bloquer
+    blocked = threading.Event()
+
+    class _Slow(_Bundle):
+        def score(self, values):
+            blocked.wait(5)
+            return 0.0
+
+    slow = ShadowScorer(_Slow(), queue_size=2)
+    for _ in range(10):
+        slow.submit({"x": 1.0}, active_score=1.0)
+    assert slow.stats()["dropped"] >= 7
+    blocked.set()
+    slow.stop()
@@ -0,0 +1,102 @@
+"""
+Client TAP NASA (src/p21_nasa_tap) avec une session factice : lots ADQL,
+regroupement des demandes concurrentes, compteurs exacts entre threads et
+réécriture différée du cache disque.
+
+Usage :
+    cd backend && python -m pytest -q test_nasa_tap.py
+"""
+import json
+import re
+import threading
+import time
+
+from src.p21_nasa_tap import NasaTapClient, StarInfoCache
+
+
+class _Response:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.rows
+
+
+class _FakeTap:
+    """Répond aux requêtes ps : une planète par étoile demandée."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def get(self, url, params=None, timeout=None):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        query = params["query"]
+        if "FROM ps" not in query:
+            return _Response([])
+        names = re.findall(r"'([^']+)'", query)
+        return _Response([{"hostname": n, "pl_name": n + " b", "st_teff": 5000} for n in names])
+
+
+def test_batches_and_coalesces_concurrent_requests():
+    session = _FakeTap(delay=0.05)
+    client = NasaTapClient(cache_path=None, batch_size=10, session=session)
+    targets = [f"Kepler-{i}b" for i in range(25)]
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(client.star_info(targets)))
+               for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert all(r["Kepler-3b"]["planets"][0]["name"] == "KEPLER-3 b" for r in results)
+    stats = client.stats()
+    # Chaque étoile n'est demandée qu'une fois : 3 lots, compteurs cohérents
+    assert stats["queries"] == session.calls == 3
+    assert stats["coalesced"] > 0
+    client.star_info(targets)
+    assert client.stats()["queries"] == 3
+
+
+def test_counters_are_exact_across_threads():
+    client = NasaTapClient(cache_path=None, session=_FakeTap())
+    threads = [threading.Thread(target=lambda: [client._count("errors") for _ in range(5000)])
+               for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert client.stats()["errors"] == 40000
+
+
+def test_disk_writes_are_debounced(tmp_path, monkeypatch):
+    path = str(tmp_path / "star_info.json")
+    cache = StarInfoCache(path, save_delay=0.2)
+    writes = []
+    real_dump = json.dump
+    monkeypatch.setattr(json, "dump", lambda obj, f: (writes.append(len(obj)), real_dump(obj, f)))
+
+    for i in range(50):
+        cache.put_many({f"star-{i}": {"stellar": None, "planets": [], "source": "x"}})
+    cache.put_many({"failed": {"stellar": None, "planets": [], "source": None}}, persist=False)
+    assert writes == []
+    time.sleep(0.5)
+    assert writes == [50]              # une seule réécriture pour les 50 lots
+
+    cache.put_many({"late": {"stellar": None, "planets": [], "source": "x"}})
+    cache.flush()                       # écriture immédiate à l'arrêt
+    assert writes == [50, 51]
+    time.sleep(0.3)
+    assert writes == [50, 51]
+
+    reloaded = StarInfoCache(path)
+    assert len(reloaded) == 51 and reloaded.peek("late")["source"] == "x"
+    assert reloaded.peek("failed") is None
@@ -0,0 +1,95 @@
+"""
+Cache des résultats d'analyse (src/p23_result_cache) : clé liée au modèle,
+au pipeline et aux catalogues, repli mémoire → SQLite, TTL mémoire,
+lectures mémoire reportées dans SQLite et préchargement des clés chaudes.
+
+Usage :
+    cd backend && python -m pytest -q test_result_cache.py
+"""
+import time
+
+from src import p23_result_cache
+from src.p23_result_cache import TieredResultCache
+
+
+def _cache(tmp_path, **kwargs):
+    cache = TieredResultCache(str(tmp_path / "results.sqlite"), **kwargs)
+    cache.set_model("model-a")
+    cache.set_catalog("catalog-1")
+    return cache
+
+
+def test_key_separates_model_and_catalog(tmp_path):
+    cache = _cache(tmp_path)
+    key = cache.key("analyze", " Kepler-10 ", "Kepler", "model-a", "catalog-1")
+    assert key == cache.key("analyze", "kepler-10", "Kepler", "model-a", "catalog-1")
+    cache.put(key, {"score": 0.9})
+
+    assert cache.get(cache.key("analyze", "Kepler-10", "Kepler", "model-b", "catalog-1")) is None
+    assert cache.get(cache.key("analyze", "Kepler-10", "Kepler", "model-a", "catalog-2")) is None
+    assert cache.get(cache.key("stream", "Kepler-10", "Kepler", "model-a", "catalog-1")) is None
+    assert cache.get(key) == {"score": 0.9}
+
+
+def test_store_serves_after_memory_is_lost(tmp_path):
+    cache = _cache(tmp_path)
+    key = cache.key("analyze", "KIC 1", "Kepler", "model-a", "catalog-1")
+    cache.put(key, {"score": 0.1})
+
+    reopened = _cache(tmp_path)
+    assert reopened.get(key) == {"score": 0.1}
+    assert reopened.counters["store_hits"] == 1
+    assert reopened.get(key) == {"score": 0.1}
+    assert reopened.counters["memory_hits"] == 1
+
+
+def test_memory_tier_expires(tmp_path):
+    cache = _cache(tmp_path, memory_ttl=0.05)
+    key = cache.key("analyze", "KIC 2", "Kepler", "model-a", "catalog-1")
+    cache.put(key, {"score": 0.2})
+    time.sleep(0.1)
+    assert cache.memory.get(key.id) is None
+    assert cache.get(key) == {"score": 0.2}     # relu depuis SQLite
+    assert cache.counters["store_hits"] == 1
+
+
+def test_warm_up_ranks_memory_hits(tmp_path, monkeypatch):
+    monkeypatch.setattr(p23_result_cache, "HIT_FLUSH_EVERY", 10)
+    cache = _cache(tmp_path)
+    keys = [cache.key("analyze", f"KIC {i}", "Kepler", "model-a", "catalog-1") for i in range(3)]
+    for i, key in enumerate(keys):
+        cache.put(key, {"i": i})
+    # KIC 2 n'est lu que depuis la mémoire : ses lectures doivent compter
+    for _ in range(25):
+        cache.get(keys[2])
+    cache.get(keys[1])
+    other = cache.key("analyze", "KIC 9", "Kepler", "model-b", "catalog-1")
+    cache.put(other, {"i": 9})
+
+    cache.flush_hits()
+    hot = cache.store.hot("model-a", cache.pipeline, "catalog-1", limit=2)
+    assert [k.target for k, _ in hot] == ["kic 2", "kic 1"]
+
+    reopened = _cache(tmp_path)
+    assert reopened.warm_up(limit=2) == 2
+    assert reopened.memory.peek(keys[2].id) == {"i": 2}
+    assert reopened.memory.peek(other.id) is None
+
+
+def test_memory_hits_are_flushed_in_batches(tmp_path, monkeypatch):
+    monkeypatch.setattr(p23_result_cache, "HIT_FLUSH_EVERY", 5)
+    cache = _cache(tmp_path)
+    key = cache.key("analyze", "KIC 3", "Kepler", "model-a", "catalog-1")
+    cache.put(key, {"score": 0.3})
+
+    def stored_hits():
+        return cache.store._db.execute("SELECT hits FROM results WHERE key = ?", (key.id,)).fetchone()[0]
+
+    for _ in range(4):
+        cache.get(key)
+    assert stored_hits() == 0
+    cache.get(key)
+    assert stored_hits() == 5
+    cache.get(key)
+    cache.stats()
+    assert stored_hits() == 6
@@ -0,0 +1,75 @@
+"""
+Index de recherche par sous-chaîne (src/p16_search_index) : classement
+identique à un parcours complet, mises à jour par différence, copies
+indépendantes et requêtes courtes limitées au début de leur liste.
+
+Usage :
+    cd backend && python -m pytest -q test_search_index.py
+"""
+from src.p16_search_index import SearchIndex
+
+
+def _documents(n):
+    for i in range(n):
+        kepid = 10_000_000 + i * 37
+        yield ("Kepler", i), (str(kepid), f"kic {kepid}", f"K{i:05d}.01", f"Kepler-{i} b" if i % 7 == 0 else None)
+
+
+def _reference(documents, query, limit):
+    """Classement attendu : champ égal, préfixe (ordre lexicographique), sous-chaîne (ordre d'insertion)."""
+    q = query.lower()
+    docs = [(key, [str(f).lower() for f in fields if f is not None]) for key, fields in documents]
+    exact = sorted((f, n) for n, (_, fs) in enumerate(docs) for f in fs if f == q)
+    prefix = sorted((f, n) for n, (_, fs) in enumerate(docs) for f in fs if f.startswith(q) and f != q)
+    ranked = []
+    for _, n in exact + prefix:
+        if n not in ranked:
+            ranked.append(n)
+    ranked += [n for n, (_, fs) in enumerate(docs) if n not in ranked and any(q in f for f in fs)]
+    return [docs[n][0] for n in ranked[:limit]]
+
+
+def test_search_matches_full_scan():
+    documents = list(_documents(3000))
+    index = SearchIndex()
+    index.sync(documents)
+    for query in ["1", "k", "0", "kic", "kic 1", "K00042", "kepler-7", "01", "b", "zz", "10000037"]:
+        got = [index.key(i) for i in index.search(query, limit=15)]
+        assert got == _reference(documents, query, 15), query
+    assert index.match_ids("") == set(range(3000))
+
+
+def test_sync_and_copy_keep_rankings_current():
+    documents = list(_documents(500))
+    index = SearchIndex()
+    index.sync(documents)
+    index.search("7", limit=10)             # remplit le cache des listes triées
+
+    copy = index.copy()
+    toi = (("TESS", 101.01), ("231663901", "tic 231663901", "101.01", "toi 101.01"))
+    updated = [d for d in documents if d[0][1] % 3] + [toi]
+    _, changed, removed = copy.sync(updated)
+    assert (changed, removed) == (1, 167)
+    for query in ["7", "toi", "kic 100003"]:
+        assert [copy.key(i) for i in copy.search(query, 10)] == _reference(updated, query, 10)
+        assert [index.key(i) for i in index.search(query, 10)] == _reference(documents, query, 10)
+
+
+def test_short_query_reads_only_the_head_of_its_posting():
+    index = SearchIndex()
+    index.sync(_documents(20_000))
+    index.search("1", limit=20)
+
+    consumed = []
+    ranked_posting = index._ranked_posting
+
+    def counting(gram):
+        for i in ranked_posting(gram):
+            consumed.append(i)
+            yield i
+
+    index._ranked_posting = counting
+    for query in ["1", "k", "ic", "0"]:
+        consumed.clear()
+        assert len(index.search(query, limit=20)) == 20
+        assert len(consumed) <= 20 + 4 * 20     # limit + exacts / préfixes déjà retenus (au plus 4 × limit)
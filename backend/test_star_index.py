@@ -0,0 +1,91 @@
+"""
+Index du catalogue d'étoiles (src/p15_star_index) : mêmes pages que les
+filtres + sorted() de l'ancienne implémentation, et filtres mission / label
+servis sans parcourir tout l'index.
+
+Usage :
+    cd backend && python -m pytest -q test_star_index.py
+"""
+import numpy as np
+import pytest
+
+from src import p15_star_index
+from src.p15_star_index import SORT_KEYS, StarIndex
+
+
+def _entries(n, seed=0):
+    rng = np.random.default_rng(seed)
+    entries = []
+    for i in range(n):
+        entries.append({
+            "kepid": str(1000 + i),
+            "target_id": f"KIC {1000 + i}",
+            "name": f"Star {i}",
+            "mission": str(rng.choice(["Kepler", "TESS", "K2"])),
+            "label": int(rng.random() < 0.3),
+            "bls_snr": None if rng.random() < 0.1 else float(np.round(rng.normal(10, 5), 1)),
+            "period": float(rng.uniform(0.5, 50)),
+            "bls_depth_ppm": float(rng.integers(50, 500)),   # ex aequo fréquents : ordre stable
+            "bls_score": float(rng.random()),
+        })
+    return entries
+
+
+def _reference(entries, page, limit, label, sort_by, sort_dir, mission):
+    rows = [e for e in entries
+            if (label == "all" or str(e["label"]) == label)
+            and (not mission or e["mission"].lower() == mission.lower())]
+    key = SORT_KEYS[sort_by]
+    rows = sorted(rows, key=lambda e: (e[key] is None, e[key] or 0), reverse=sort_dir == "desc")
+    offset = (page - 1) * limit
+    return rows[offset:offset + limit], len(rows), sum(e["label"] for e in rows)
+
+
+@pytest.mark.parametrize("sort_by", sorted(SORT_KEYS))
+@pytest.mark.parametrize("sort_dir", ["asc", "desc"])
+def test_filtered_pages_match_reference(sort_by, sort_dir):
+    entries = _entries(500)
+    index = StarIndex(entries)
+    for mission, label in [("Kepler", "all"), ("tess", "1"), (None, "0"), ("K2", "0"), ("Absent", "all")]:
+        for page, limit in [(1, 20), (3, 17), (9, 60), (30, 20), (0, 20)]:
+            got, total, n_planets = index.query(page=page, limit=limit, label=label, sort_by=sort_by,
+                                                sort_dir=sort_dir, mission=mission)
+            want, want_total, want_planets = _reference(entries, page, limit, label, sort_by,
+                                                        sort_dir, mission)
+            assert (total, n_planets) == (want_total, want_planets)
+            assert [e["kepid"] for e in got] == [e["kepid"] for e in want]
+
+
+class _BoundedNumpy:
+    """np restreint : hors bissections, aucun tableau de plus de `bound` éléments."""
+
+    def __init__(self, bound):
+        self.bound = bound
+        self.largest = 0
+
+    def __getattr__(self, name):
+        attr = getattr(np, name)
+        if not callable(attr) or isinstance(attr, type) or name == "searchsorted":
+            return attr
+
+        def checked(*args, **kwargs):
+            for a in list(args) + list(kwargs.values()):
+                for x in (a if isinstance(a, (list, tuple)) else [a]):
+                    if isinstance(x, np.ndarray):
+                        self.largest = max(self.largest, x.size)
+            assert self.largest <= self.bound, f"np.{name} sur {self.largest} éléments"
+            return attr(*args, **kwargs)
+        return checked
+
+
+def test_filtered_query_stays_within_page_bound(monkeypatch):
+    index = StarIndex(_entries(20_000, seed=1))
+    limit = 25
+    bounded = _BoundedNumpy(bound=3 * 2 * limit)      # k catégories × taille de page
+    monkeypatch.setattr(p15_star_index, "np", bounded)
+    for mission, label in [("Kepler", "all"), (None, "1"), ("TESS", "0")]:
+        for page in (1, 250, 400):
+            rows, total, _ = index.query(page=page, limit=limit, label=label, sort_by="period",
+                                         mission=mission)
+            assert len(rows) == min(limit, max(0, total - (page - 1) * limit))
+    assert 0 < bounded.largest <= 3 * 2 * limit